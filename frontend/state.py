@@ -4,7 +4,7 @@ import io
 import streamlit as st
 
 from dotenv import load_dotenv
-from pipeline.science.pipeline.doc_processor import extract_document_from_file
+from pipeline.science.pipeline.doc_processor import extract_document_from_file, process_pdf_file
 from pipeline.science.pipeline.chat_history_manager import create_session_id
 from pipeline.science.pipeline.session_manager import ChatSession, ChatMode
 
@@ -120,12 +120,8 @@ def state_process_pdf_file(file_path):
             - doc: Contains the complete PDF structure including pages, formatting, and visual elements
             - file_path: List of file paths for the processed document
     """
-    # Process the document
-    file = open(file_path, 'rb')
-    with open(file_path, 'rb') as file:
-        file_bytes = file.read()  # Read the file content as bytes
-        document = extract_document_from_file(file_path)
-        doc = fitz.open(stream=io.BytesIO(file_bytes), filetype="pdf")
+    # Process the document, parsed once per process; doc is this session's own fitz.Document
+    document, doc = process_pdf_file(file_path)
     
     # Store everything in session state
     st.session_state.document = document
@@ -0,0 +1,108 @@
+"""
+Benchmark the vector index types selectable in config.json ("vector_index").
+
+Measures build time, recall@k against the exact flat index and per-query latency
+on synthetic clustered vectors, to size libraries of many documents.
+
+Usage:
+    python pipeline/science/features_lab/ann_index_benchmark.py --n 100000 --dim 3072 --k 10
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.embeddings import create_faiss_index, apply_index_search_params
+
+
+def synthetic_vectors(n: int, dim: int, n_clusters: int, seed: int) -> np.ndarray:
+    """
+    Clustered unit vectors, closer to real chunk embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def benchmark_index(name: str, index_config: dict, vectors: np.ndarray, queries: np.ndarray, ground_truth: np.ndarray, k: int) -> dict:
+    start = time.perf_counter()
+    index = create_faiss_index(vectors.shape[1], len(vectors), index_config)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+    apply_index_search_params(index, index_config)
+
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        results[i] = ids[0]
+
+    start = time.perf_counter()
+    index.search(queries, k)
+    batch_seconds = time.perf_counter() - start
+
+    recall = np.mean([len(set(results[i]) & set(ground_truth[i])) / k for i in range(len(queries))])
+    return {
+        "name": name,
+        "index": type(index).__name__,
+        "build_s": build_seconds,
+        f"recall@{k}": recall,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "batch_qps": len(queries) / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark of the configurable FAISS index types")
+    parser.add_argument("--n", type=int, default=50000, help="Number of stored vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="Vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--clusters", type=int, default=200, help="Number of synthetic clusters")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n, args.dim, args.clusters, args.seed)
+    queries = synthetic_vectors(args.queries, args.dim, args.clusters, args.seed + 1)
+
+    base_config = load_config().get("vector_index", {})
+    flat_config = dict(base_config, type="flat", min_vectors=0)
+    flat = create_faiss_index(args.dim, args.n, flat_config)
+    flat.add(vectors)
+    _, ground_truth = flat.search(queries, args.k)
+
+    configs = [("flat", flat_config)]
+    for ef_search in (32, 64, 128, 256):
+        hnsw = dict(base_config.get("hnsw", {}), ef_search=ef_search)
+        configs.append((f"hnsw ef_search={ef_search}", dict(base_config, type="hnsw", min_vectors=0, hnsw=hnsw)))
+    for nprobe in (8, 32, 128):
+        ivfpq = dict(base_config.get("ivfpq", {}), nprobe=nprobe)
+        configs.append((f"ivfpq nprobe={nprobe}", dict(base_config, type="ivfpq", min_vectors=0, ivfpq=ivfpq)))
+
+    print(f"n={args.n} dim={args.dim} queries={args.queries} k={args.k}")
+    for name, index_config in configs:
+        result = benchmark_index(name, index_config, vectors, queries, ground_truth, args.k)
+        print(
+            f"{result['name']:<24} {result['index']:<14} build {result['build_s']:7.2f}s  "
+            f"recall@{args.k} {result[f'recall@{args.k}']:.3f}  "
+            f"p50 {result['p50_ms']:7.3f}ms  p95 {result['p95_ms']:7.3f}ms  batch {result['batch_qps']:9.0f} q/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
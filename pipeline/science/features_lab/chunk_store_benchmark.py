@@ -0,0 +1,127 @@
+"""
+Compare cold-start load time and RSS of the legacy pickle docstore (index.pkl)
+against the versioned chunk store (chunks.sqlite).
+
+Each measurement runs in a fresh Python process so imports and allocator state
+do not leak between formats.
+
+Usage:
+    python pipeline/science/features_lab/chunk_store_benchmark.py --chunks 20000 --dim 3072
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+import faiss
+
+from pipeline.science.pipeline.chunk_store import save_chunk_store
+
+LOADER_SNIPPET = """
+import json, resource, sys, time
+sys.path.insert(0, {project_root!r})
+start = time.perf_counter()
+from langchain_community.vectorstores import FAISS
+from pipeline.science.pipeline.chunk_store import load_vector_store
+imported = time.perf_counter()
+if {fmt!r} == "pickle":
+    db = FAISS.load_local({folder!r}, None, allow_dangerous_deserialization=True)
+else:
+    db = load_vector_store({folder!r}, None)
+loaded = time.perf_counter()
+# Touch the documents a typical retrieval returns
+for position in range(0, len(db.index_to_docstore_id), max(1, len(db.index_to_docstore_id) // 10))[:10]:
+    db.docstore.search(db.index_to_docstore_id[position])
+searched = time.perf_counter()
+print(json.dumps({{
+    "load_s": loaded - imported,
+    "first_reads_s": searched - loaded,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def synthetic_store(chunks: int, dim: int, pages: int) -> FAISS:
+    """
+    A store shaped like the page index built by create_searchable_chunks.
+    """
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.standard_normal((chunks, dim)).astype(np.float32))
+    docs = {}
+    index_to_docstore_id = {}
+    per_page = max(1, chunks // pages)
+    for i in range(chunks):
+        page, chunk_index = divmod(i, per_page)
+        total_blocks = per_page + 3
+        doc_id = str(uuid.uuid4())
+        docs[doc_id] = Document(
+            page_content=" ".join(f"token{(i * 7 + j) % 997}" for j in range(120)),
+            metadata={
+                "page": page,
+                "source": f"page_{page + 1}",
+                "chunk_index": chunk_index,
+                "block_bbox": (72.0, 100.0 + chunk_index, 540.0, 120.0 + chunk_index),
+                "total_blocks_in_page": total_blocks,
+                "relative_position": chunk_index / total_blocks,
+            },
+        )
+        index_to_docstore_id[i] = doc_id
+    return FAISS(embedding_function=None, index=index, docstore=InMemoryDocstore(docs), index_to_docstore_id=index_to_docstore_id)
+
+
+def measure(fmt: str, folder: str, repeats: int) -> dict:
+    results = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, "-c", LOADER_SNIPPET.format(project_root=str(project_root), fmt=fmt, folder=folder)],
+            text=True,
+        )
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: float(np.median([r[key] for r in results])) for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loader benchmark: pickle docstore vs chunk store")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    db = synthetic_store(args.chunks, args.dim, args.pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_folder = os.path.join(tmp, "pickle")
+        chunk_store_folder = os.path.join(tmp, "chunk_store")
+        db.save_local(pickle_folder)
+        os.makedirs(chunk_store_folder)
+        faiss.write_index(db.index, os.path.join(chunk_store_folder, "index.faiss"))
+        save_chunk_store(db, chunk_store_folder)
+
+        print(f"chunks={args.chunks} dim={args.dim} pages={args.pages}")
+        print(f"index.pkl     {os.path.getsize(os.path.join(pickle_folder, 'index.pkl')) / 1e6:8.2f} MB")
+        print(f"chunks.sqlite {os.path.getsize(os.path.join(chunk_store_folder, 'chunks.sqlite')) / 1e6:8.2f} MB")
+        for fmt, folder in (("pickle", pickle_folder), ("chunk_store", chunk_store_folder)):
+            result = measure(fmt, folder, args.repeats)
+            print(
+                f"{fmt:<12} load {result['load_s'] * 1000:8.1f} ms  "
+                f"first reads {result['first_reads_s'] * 1000:6.2f} ms  "
+                f"max RSS {result['max_rss_mb']:8.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
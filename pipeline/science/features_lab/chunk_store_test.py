@@ -0,0 +1,161 @@
+from pathlib import Path
+import logging
+import os
+import sys
+import numpy as np
+import faiss
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from pipeline.science.pipeline import chunk_store
+from pipeline.science.pipeline.helper.chunk_store_migration import chunk_differences, migrate_index_folder
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def round_trip(metadatas: list[dict]) -> list[dict]:
+    """
+    Encode metadatas into chunk store columns and decode them back, sharing the
+    string and page tables like save_chunk_store does.
+    """
+    strings, pages = {}, {}
+    rows = [chunk_store._encode_metadata(metadata, strings, pages) for metadata in metadatas]
+    sources = {string_id: value for value, string_id in strings.items()}
+    return [
+        chunk_store._decode_metadata(
+            page, sources.get(source), chunk_index, bbox, flags, extra_json, pages.get(page),
+        )
+        for page, source, chunk_index, bbox, flags, extra_json in rows
+    ]
+
+
+def test_page_chunk_metadata_round_trips_exactly():
+    metadatas = [
+        {
+            "page": 0,
+            "source": "page_1",
+            "chunk_index": chunk_index,
+            "block_bbox": (72.0, 100.0 + chunk_index, 540.0, 120.0),
+            "total_blocks_in_page": 4,
+            "relative_position": chunk_index / 4,
+        }
+        for chunk_index in range(4)
+    ]
+    assert round_trip(metadatas) == metadatas
+
+
+def test_missing_keys_are_not_added():
+    metadatas = [{}, {"source": "markdown"}, {"page": 2}, {"page": 2, "chunk_index": 1}]
+    assert round_trip(metadatas) == metadatas
+
+
+@pytest.mark.parametrize("page", ["3", 2.0, None, True, -1])
+def test_non_int_pages_keep_their_type(page):
+    decoded = round_trip([{"page": page, "source": "page_3"}])[0]
+    assert decoded == {"page": page, "source": "page_3"}
+    assert type(decoded["page"]) is type(page)
+
+
+def test_sequences_keep_their_type_where_possible():
+    metadatas = [
+        # PyMuPDF bounding boxes are tuples of floats and come back as tuples
+        {"page": 1, "block_bbox": (1.5, 2.0, 3.0, 4.25)},
+        # Lists are stored as JSON and come back as lists
+        {"page": 1, "block_bbox": [1.5, 2.0, 3.0, 4.25], "tags": ["a", "b"]},
+        {"page": 1, "block_bbox": (1, 2, 3, 4)},
+    ]
+    decoded = round_trip(metadatas)
+    assert decoded[0] == metadatas[0] and type(decoded[0]["block_bbox"]) is tuple
+    assert decoded[1] == metadatas[1] and type(decoded[1]["block_bbox"]) is list
+    # Other tuples go through JSON: same values, as a list
+    assert decoded[2]["block_bbox"] == [1, 2, 3, 4]
+    assert chunk_differences(Document(page_content="x", metadata=metadatas[2]),
+                             Document(page_content="x", metadata=decoded[2])) == []
+
+
+def test_inconsistent_page_fields_are_kept_per_chunk():
+    metadatas = [
+        {"page": 0, "chunk_index": 0, "total_blocks_in_page": 2, "relative_position": 0.0},
+        # Same page, a different total: kept in the chunk's own metadata
+        {"page": 0, "chunk_index": 1, "total_blocks_in_page": 3, "relative_position": 0.9},
+    ]
+    assert round_trip(metadatas) == metadatas
+
+
+def test_chunk_differences_compares_values_and_content():
+    source = Document(page_content="text", metadata={"page": 1, "source": "page_2"})
+    assert chunk_differences(source, Document(page_content="text", metadata={"page": 1, "source": "page_2"})) == []
+    assert chunk_differences(source, Document(page_content="text", metadata={"page": 2, "source": "page_2"}))
+    assert chunk_differences(source, Document(page_content="other", metadata={"page": 1, "source": "page_2"}))
+    assert chunk_differences(source, Document(page_content="text", metadata={"page": 1}))
+
+
+def _save_pickle_store(folder, metadatas: list[dict]) -> None:
+    index = faiss.IndexFlatL2(4)
+    index.add(np.eye(len(metadatas), 4, dtype=np.float32))
+    docs = {f"id_{i}": Document(page_content=f"chunk {i}", metadata=metadata) for i, metadata in enumerate(metadatas)}
+    index_to_docstore_id = {i: f"id_{i}" for i in range(len(metadatas))}
+    FAISS(embedding_function=None, index=index, docstore=InMemoryDocstore(docs),
+          index_to_docstore_id=index_to_docstore_id).save_local(str(folder))
+
+
+def test_migration_verifies_metadata_values(tmp_path):
+    _save_pickle_store(tmp_path, [{"page": 0, "source": "page_1"}, {"page": "2", "tags": ("a",)}])
+
+    assert migrate_index_folder(tmp_path) == "migrated"
+    assert not os.path.exists(tmp_path / chunk_store.PICKLE_DOCSTORE_FILE)
+
+
+def test_migration_keeps_the_pickle_when_values_change(tmp_path):
+    # A set is stored as its string form: the migration must notice and back out
+    _save_pickle_store(tmp_path, [{"page": 0, "labels": {"x"}}])
+
+    with pytest.raises(ValueError, match="labels"):
+        migrate_index_folder(tmp_path)
+    assert os.path.exists(tmp_path / chunk_store.PICKLE_DOCSTORE_FILE)
+    assert not os.path.exists(tmp_path / chunk_store.CHUNK_STORE_FILE)
+
+
+def _flat_store(texts: list[str]) -> FAISS:
+    index = faiss.IndexFlatL2(4)
+    index.add(np.eye(len(texts), 4, dtype=np.float32))
+    docs = {f"id_{i}": Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)}
+    return FAISS(embedding_function=None, index=index, docstore=InMemoryDocstore(docs),
+                 index_to_docstore_id={i: f"id_{i}" for i in range(len(texts))})
+
+
+def test_failed_save_keeps_the_previous_pair(tmp_path, monkeypatch):
+    chunk_store.save_vector_store(_flat_store(["a", "b"]), tmp_path)
+
+    def fail(db, tmp_path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(chunk_store, "_write_chunk_store", fail)
+    with pytest.raises(OSError):
+        chunk_store.save_vector_store(_flat_store(["a", "b", "c"]), tmp_path)
+
+    db = chunk_store.load_vector_store(tmp_path, None, mmap=False)
+    assert db.index.ntotal == len(db.index_to_docstore_id) == 2
+    assert sorted(os.listdir(tmp_path)) == ["chunks.sqlite", "index.faiss"]
+
+
+def test_closed_docstore_reopens_on_read(tmp_path):
+    chunk_store.save_vector_store(_flat_store(["a", "b"]), tmp_path)
+    db = chunk_store.load_vector_store(tmp_path, None, mmap=False)
+
+    chunk_store.close_vector_store(db)
+
+    assert db.docstore._conn is None
+    assert db.docstore.search("id_1").page_content == "b"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
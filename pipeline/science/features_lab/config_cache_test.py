@@ -0,0 +1,96 @@
+from pathlib import Path
+import json
+import os
+import pickle
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.config import (
+    FrozenDict,
+    _ConfigCache,
+    freeze,
+    get_config,
+    load_config,
+    get_language_codes,
+    get_map_index_to_symbol,
+)
+
+
+def write_config(path: Path, config: dict, mtime_ns: int) -> None:
+    path.write_text(json.dumps(config), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_get_config_is_cached_and_read_only():
+    config = get_config()
+    assert get_config() is config
+    with pytest.raises(TypeError):
+        config["stream"] = False
+    with pytest.raises(TypeError):
+        config["llm"]["temperature"] = 1
+    # A copy of a section can be modified
+    para = dict(config["llm"], stream=True)
+    assert para["stream"] and "stream" not in config["llm"]
+
+
+def test_load_config_returns_a_mutable_copy():
+    config = load_config()
+    assert config == json.loads(json.dumps(get_config()))
+    assert type(config) is dict and type(config["llm"]) is dict
+    assert isinstance(config["image_extensions"], list)
+    config["llm"]["temperature"] = 0.7
+    config["image_extensions"].append(".heic")
+    # The shared config and later copies are unaffected
+    assert get_config()["llm"]["temperature"] == load_config()["llm"]["temperature"] != 0.7
+    assert ".heic" not in get_config()["image_extensions"]
+    assert ".heic" not in load_config()["image_extensions"]
+
+
+def test_frozen_config_round_trips():
+    config = freeze({"a": [1, {"b": 2}]})
+    assert config == {"a": (1, {"b": 2})}
+    assert isinstance(config["a"][1], FrozenDict)
+    assert pickle.loads(pickle.dumps(config)) == config
+    assert json.loads(json.dumps(config)) == {"a": [1, {"b": 2}]}
+
+
+def test_derived_maps():
+    config = get_config()
+    map_index_to_symbol = get_map_index_to_symbol()
+    for symbol, index in config["map_symbol_to_index"].items():
+        assert map_index_to_symbol[index] == symbol
+    for code, name in config["languages_short"].items():
+        assert get_language_codes()[name] == code
+
+
+def test_reload_on_change(tmp_path):
+    config_path = tmp_path / "config.json"
+    settings = {"check_interval_seconds": 0}
+    write_config(config_path, {"config_cache": settings, "inference_token_limit": 1}, 1_000_000_000)
+    cache = _ConfigCache(config_path)
+    assert cache.config()["inference_token_limit"] == 1
+
+    write_config(config_path, {"config_cache": settings, "inference_token_limit": 2}, 2_000_000_000)
+    assert cache.config()["inference_token_limit"] == 2
+
+    # A broken file keeps the last good config
+    config_path.write_text("{", encoding="utf-8")
+    os.utime(config_path, ns=(3_000_000_000, 3_000_000_000))
+    assert cache.config()["inference_token_limit"] == 2
+
+
+def test_no_reload_when_disabled(tmp_path):
+    config_path = tmp_path / "config.json"
+    settings = {"reload_on_change": False}
+    write_config(config_path, {"config_cache": settings, "inference_token_limit": 1}, 1_000_000_000)
+    cache = _ConfigCache(config_path)
+    assert cache.config()["inference_token_limit"] == 1
+
+    write_config(config_path, {"config_cache": settings, "inference_token_limit": 2}, 2_000_000_000)
+    assert cache.config()["inference_token_limit"] == 1
+    cache.invalidate()
+    assert cache.config()["inference_token_limit"] == 2
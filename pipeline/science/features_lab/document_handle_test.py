@@ -0,0 +1,201 @@
+from pathlib import Path
+import hashlib
+import logging
+import os
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pipeline.science.pipeline.document_handle as document_handle_module
+from pipeline.science.pipeline.utils import generate_file_id
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def counting_hash(tmp_path, monkeypatch):
+    """
+    Isolate the handle registry and hash cache, and count how often files are hashed.
+    """
+    monkeypatch.setenv("FILE_PATH_PREFIX", str(tmp_path))
+    monkeypatch.setattr(document_handle_module, "_handles", type(document_handle_module._handles)())
+    monkeypatch.setattr(document_handle_module, "_hash_caches", {})
+    calls = []
+    original_hash_file_digests = document_handle_module.hash_file_digests
+
+    def hash_file_digests(file_path, schemes, buffer_size=None):
+        calls.append(file_path)
+        return original_hash_file_digests(file_path, schemes, buffer_size)
+
+    monkeypatch.setattr(document_handle_module, "hash_file_digests", hash_file_digests)
+    return calls
+
+
+def test_file_is_hashed_once(tmp_path, counting_hash):
+    file_path = tmp_path / "paper.pdf"
+    file_path.write_bytes(b"%PDF-1.4 test content")
+
+    handle = document_handle_module.get_document_handle(str(file_path))
+    assert handle.file_id == hashlib.md5(file_path.read_bytes()).hexdigest()
+    assert generate_file_id(str(file_path)) == handle.file_id
+    assert generate_file_id(handle) == handle.file_id
+    assert document_handle_module.get_document_handle(handle) is handle
+    assert os.fspath(handle) == str(file_path)
+    assert len(counting_hash) == 1
+
+
+def test_hash_cache_survives_a_new_process(tmp_path, counting_hash, monkeypatch):
+    """
+    A fresh handle registry (as in a new process) reuses the persisted hash.
+    """
+    file_path = tmp_path / "paper.pdf"
+    file_path.write_bytes(b"%PDF-1.4 test content")
+    file_id = generate_file_id(str(file_path))
+
+    monkeypatch.setattr(document_handle_module, "_handles", type(document_handle_module._handles)())
+    monkeypatch.setattr(document_handle_module, "_hash_caches", {})
+    assert generate_file_id(str(file_path)) == file_id
+    assert len(counting_hash) == 1
+
+
+def test_changed_file_is_rehashed(tmp_path, counting_hash):
+    file_path = tmp_path / "paper.pdf"
+    file_path.write_bytes(b"%PDF-1.4 test content")
+    first_id = generate_file_id(str(file_path))
+
+    file_path.write_bytes(b"%PDF-1.4 other content, longer")
+    second_id = generate_file_id(str(file_path))
+
+    assert first_id != second_id
+    assert second_id == hashlib.md5(file_path.read_bytes()).hexdigest()
+    assert len(counting_hash) == 2
+
+
+def test_streaming_hash_matches_full_read(tmp_path):
+    file_path = tmp_path / "paper.pdf"
+    file_path.write_bytes(os.urandom(100_003))
+    digests = document_handle_module.hash_file_digests(str(file_path), ["md5", "blake2b"], buffer_size=4096)
+    assert digests["md5"] == hashlib.md5(file_path.read_bytes()).hexdigest()
+    assert digests["blake2b"] == "b2_" + hashlib.blake2b(file_path.read_bytes(), digest_size=16).hexdigest()
+
+
+@pytest.mark.parametrize("legacy_folder_exists", [True, False])
+def test_blake2b_scheme_keeps_legacy_md5_folders(tmp_path, counting_hash, monkeypatch, legacy_folder_exists):
+    monkeypatch.setattr(document_handle_module, "get_file_id_config", lambda: {
+        "scheme": "blake2b", "hash_buffer_bytes": 4096, "legacy_md5_lookup": True,
+    })
+    monkeypatch.setattr(document_handle_module, "legacy_blobs_exist",
+                        lambda legacy_file_id: pytest.fail("Ids are generated without Azure Blob Storage requests"))
+    file_path = tmp_path / "paper.pdf"
+    file_path.write_bytes(b"%PDF-1.4 test content")
+    legacy_id = hashlib.md5(file_path.read_bytes()).hexdigest()
+    if legacy_folder_exists:
+        (tmp_path / "embedded_content" / legacy_id).mkdir(parents=True)
+
+    file_id = generate_file_id(str(file_path))
+
+    if legacy_folder_exists:
+        assert file_id == legacy_id
+    else:
+        assert file_id.startswith("b2_")
+    # BLAKE2b, then md5 once for content without a recorded decision
+    assert len(counting_hash) == 2
+
+    # A copy of the same content is only hashed with BLAKE2b
+    copy_path = tmp_path / "copy.pdf"
+    copy_path.write_bytes(file_path.read_bytes())
+    assert generate_file_id(str(copy_path)) == file_id
+    assert len(counting_hash) == 3
+
+
+def test_registered_legacy_blob_ids_are_used(tmp_path, counting_hash, monkeypatch):
+    monkeypatch.setattr(document_handle_module, "get_file_id_config", lambda: {
+        "scheme": "blake2b", "hash_buffer_bytes": 4096, "legacy_md5_lookup": True,
+    })
+    file_path = tmp_path / "paper.pdf"
+    file_path.write_bytes(b"%PDF-1.4 indexed before the switch")
+    legacy_id = hashlib.md5(file_path.read_bytes()).hexdigest()
+    monkeypatch.setattr(document_handle_module, "legacy_blobs_exist", lambda legacy_file_id: legacy_file_id == legacy_id)
+
+    assert document_handle_module.register_legacy_file_id(str(file_path)) == legacy_id
+    assert generate_file_id(str(file_path)) == legacy_id
+
+
+def _write_pdf(file_path, pages: int = 2) -> None:
+    import fitz
+    doc = fitz.open()
+    for page_num in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {page_num} text")
+    doc.save(str(file_path))
+    doc.close()
+
+
+def test_each_thread_gets_its_own_document(tmp_path, counting_hash):
+    from concurrent.futures import ThreadPoolExecutor
+    file_path = tmp_path / "paper.pdf"
+    _write_pdf(file_path)
+    handle = document_handle_module.get_document_handle(str(file_path))
+
+    main_doc = handle.doc
+    assert handle.doc is main_doc
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        thread_doc = executor.submit(lambda: handle.doc).result()
+    assert thread_doc is not main_doc
+    assert handle.page_count == 2
+
+    handle.close()
+    assert main_doc.is_closed and thread_doc.is_closed
+    # Reopened on the next access
+    assert not handle.doc.is_closed
+
+
+def test_evicted_handles_are_closed(tmp_path, counting_hash, monkeypatch):
+    monkeypatch.setattr(document_handle_module, "get_config",
+                        lambda: {"file_hash_cache": {"enabled": False, "max_open_handles": 1}})
+    first_path, second_path = tmp_path / "first.pdf", tmp_path / "second.pdf"
+    _write_pdf(first_path)
+    _write_pdf(second_path, pages=3)
+
+    first_doc = document_handle_module.get_document_handle(str(first_path)).doc
+    second_doc = document_handle_module.get_document_handle(str(second_path)).doc
+
+    assert first_doc.is_closed
+    assert not second_doc.is_closed
+
+
+def test_evicted_handles_stay_open_while_in_use(tmp_path, counting_hash, monkeypatch):
+    monkeypatch.setattr(document_handle_module, "get_config",
+                        lambda: {"file_hash_cache": {"enabled": False, "max_open_handles": 1}})
+    first_path, second_path = tmp_path / "first.pdf", tmp_path / "second.pdf"
+    _write_pdf(first_path)
+    _write_pdf(second_path)
+
+    first_handle = document_handle_module.get_document_handle(str(first_path))
+    with first_handle.in_use():
+        first_doc = first_handle.doc
+        document_handle_module.get_document_handle(str(second_path))
+        # Evicted, but still in use
+        assert first_doc[0].get_text().strip() == "Page 0 text"
+    assert first_doc.is_closed
+
+
+def test_process_pdf_file_returns_a_caller_owned_document(tmp_path, counting_hash, monkeypatch):
+    from pipeline.science.pipeline import doc_processor
+    monkeypatch.setattr(document_handle_module, "get_config",
+                        lambda: {"file_hash_cache": {"enabled": False, "max_open_handles": 1}})
+    monkeypatch.setattr(doc_processor, "extract_document_from_file", lambda file_path: [])
+    first_path, second_path = tmp_path / "first.pdf", tmp_path / "second.pdf"
+    _write_pdf(first_path)
+    _write_pdf(second_path)
+
+    _, doc = doc_processor.process_pdf_file(str(first_path))
+    doc_processor.process_pdf_file(str(second_path))
+    doc_processor.get_parsed_document(str(second_path)).page_text(0)
+
+    assert not doc.is_closed
+    assert len(doc) == 2
+    doc.close()
@@ -0,0 +1,122 @@
+from pathlib import Path
+import asyncio
+import logging
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.embeddings import Embeddings
+
+from pipeline.science.pipeline.embedding_cache import CachedEmbeddings, EmbeddingCacheStore
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class CountingEmbeddings(Embeddings):
+    """
+    Deterministic embedding model that records the texts it embeds.
+    """
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    @staticmethod
+    def _vector(text: str) -> list[float]:
+        return [float(len(text)), float(sum(map(ord, text)) % 101)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.documents.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.queries.append(text)
+        return self._vector(text)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingCacheStore(str(tmp_path / "embedding_cache.sqlite"))
+
+
+def test_queries_are_read_through_without_being_stored(store):
+    model = CountingEmbeddings()
+    cached_embeddings = CachedEmbeddings(model, store, "test-model")
+    cached_embeddings.embed_documents(["a chunk"])
+
+    # A query matching a stored chunk is served from the cache
+    assert cached_embeddings.embed_query("a chunk") == CountingEmbeddings._vector("a chunk")
+    assert model.queries == []
+    # Other queries go to the model's query endpoint and are not stored
+    assert cached_embeddings.embed_query("a question") == CountingEmbeddings._vector("a question")
+    assert asyncio.run(cached_embeddings.aembed_query("a question")) == CountingEmbeddings._vector("a question")
+    assert model.queries == ["a question", "a question"]
+    assert store.get_many([EmbeddingCacheStore.make_key("test-model", "a question")]) == {}
+
+
+def test_queries_are_stored_when_enabled(store):
+    model = CountingEmbeddings()
+    cached_embeddings = CachedEmbeddings(model, store, "test-model", cache_queries=True)
+
+    cached_embeddings.embed_query("a question")
+    cached_embeddings.embed_query("a question")
+
+    assert model.documents == ["a question"]
+
+
+def test_repeated_texts_are_counted_once(store):
+    model = CountingEmbeddings()
+    cached_embeddings = CachedEmbeddings(model, store, "test-model")
+    cached_embeddings.embed_documents(["seen"])
+
+    vectors = cached_embeddings.embed_documents(["seen", "new", "new", "seen", "new"])
+
+    assert vectors[1] == vectors[2] == CountingEmbeddings._vector("new")
+    assert model.documents == ["seen", "new"]
+    stats = cached_embeddings.stats.to_dict()
+    # First call: one miss; second call: "seen" hit, "new" missed once
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_token_counts_are_stored_with_the_vectors(store, monkeypatch):
+    from pipeline.science.pipeline import embedding_cache
+    counted = []
+    monkeypatch.setattr(embedding_cache, "count_embedding_tokens", lambda text: counted.append(text) or len(text.split()))
+    model = CountingEmbeddings()
+    cached_embeddings = CachedEmbeddings(model, store, "test-model")
+    # A row written before token counts were kept
+    legacy_key = EmbeddingCacheStore.make_key("test-model", "old chunk text")
+    store.put_many("test-model", [(legacy_key, CountingEmbeddings._vector("old chunk text"), None)])
+
+    asyncio.run(cached_embeddings.aembed_documents(["a new chunk", "old chunk text"]))
+    assert counted == ["old chunk text", "a new chunk"]
+
+    counted.clear()
+    for _ in range(3):
+        asyncio.run(cached_embeddings.aembed_documents(["a new chunk", "old chunk text"]))
+    # Hits are not tokenized again
+    assert counted == []
+    assert model.documents == ["a new chunk"]
+    assert cached_embeddings.stats.to_dict()["tokens_saved"] == 3 + 3 * (3 + 3)
+
+
+def test_caches_without_token_counts_are_migrated(tmp_path):
+    import sqlite3
+    db_path = str(tmp_path / "embedding_cache.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)")
+    conn.commit()
+    conn.close()
+
+    store = EmbeddingCacheStore(db_path)
+    key = EmbeddingCacheStore.make_key("test-model", "a chunk")
+    store.put_many("test-model", [(key, [1.0, 2.0], 2)])
+
+    assert store.get_entries([key]) == {key: ([1.0, 2.0], 2)}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,79 @@
+from pathlib import Path
+import random
+import sys
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.history_window import ChatHistoryWindow
+from pipeline.science.pipeline.token_counter import count_tokens
+
+
+def reference_truncate(chat_history, max_tokens):
+    """The per-call loop truncate_chat_history used before ChatHistoryWindow."""
+    total_tokens = 0
+    truncated_history = []
+    for message in (chat_history[::-1])[1:]:
+        if message['role'] == 'assistant' or message['role'] == 'user':
+            temp_message = str({'role': message['role'], 'content': message['content']})
+            message_tokens = count_tokens(temp_message)
+            if total_tokens + message_tokens > max_tokens:
+                break
+            truncated_history.insert(0, temp_message)
+            total_tokens += message_tokens
+    return truncated_history
+
+
+def random_history(rng: random.Random, length: int) -> list:
+    words = ["photon", "energy", "matrix", "the", "of", "spin", "$E=mc^2$", "量子", "figure"]
+    return [
+        {
+            "role": rng.choice(["user", "assistant", "assistant", "system"]),
+            "content": " ".join(rng.choice(words) for _ in range(rng.randint(0, 60))),
+        }
+        for _ in range(length)
+    ]
+
+
+def test_window_matches_reference():
+    rng = random.Random(0)
+    for _ in range(50):
+        chat_history = random_history(rng, rng.randint(0, 30))
+        window = ChatHistoryWindow()
+        for max_tokens in (0, 20, 100, 500, 10_000):
+            assert window.truncate(chat_history, max_tokens) == reference_truncate(chat_history, max_tokens)
+
+
+def test_window_follows_appends_and_edits():
+    rng = random.Random(1)
+    chat_history = random_history(rng, 10)
+    window = ChatHistoryWindow()
+    window.truncate(chat_history, 300)
+
+    # Appended messages are counted on the next call
+    chat_history.extend(random_history(rng, 5))
+    assert window.truncate(chat_history, 300) == reference_truncate(chat_history, 300)
+    assert len(window) == 15
+
+    # An edited or removed earlier message invalidates the counts from there on
+    chat_history[3] = {"role": "user", "content": "edited " * 40}
+    assert window.truncate(chat_history, 300) == reference_truncate(chat_history, 300)
+    del chat_history[5:]
+    assert window.truncate(chat_history, 300) == reference_truncate(chat_history, 300)
+
+    # A new history entirely, e.g. after clear_history
+    chat_history = random_history(rng, 4)
+    assert window.truncate(chat_history, 300) == reference_truncate(chat_history, 300)
+
+
+def test_window_sees_edits_before_the_last_message():
+    rng = random.Random(2)
+    chat_history = random_history(rng, 8)
+    window = ChatHistoryWindow()
+    window.truncate(chat_history, 10_000)
+
+    # The last message is unchanged and a new one is appended, but an earlier one was edited
+    chat_history[2] = {"role": chat_history[2]["role"], "content": "edited " * 40}
+    chat_history.append({"role": "user", "content": "a new question"})
+    assert window.truncate(chat_history, 10_000) == reference_truncate(chat_history, 10_000)
@@ -0,0 +1,79 @@
+from pathlib import Path
+import asyncio
+import logging
+import sys
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.ingestion_pipeline import (
+    QUEUE_DONE,
+    feed_queue,
+    run_stage,
+    stream_messages,
+)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def test_stages_overlap_and_record_timings():
+    events = []
+    time_tracking = {}
+
+    async def upload(item):
+        events.append(("upload", item))
+        await asyncio.sleep(0.01)
+        return item
+
+    async def analyze(item):
+        events.append(("analyze", item))
+        await asyncio.sleep(0.01)
+
+    async def main():
+        upload_queue = asyncio.Queue(maxsize=2)
+        analysis_queue = asyncio.Queue(maxsize=2)
+        await asyncio.gather(
+            feed_queue(upload_queue, range(6)),
+            run_stage("image_upload", upload, upload_queue, analysis_queue, 1, time_tracking),
+            run_stage("image_analysis", analyze, analysis_queue, None, 2, time_tracking),
+        )
+
+    asyncio.run(main())
+    assert sorted(item for stage, item in events if stage == "analyze") == list(range(6))
+    # The first image is analyzed before the last one is uploaded
+    assert events.index(("analyze", 0)) < events.index(("upload", 5))
+    assert set(time_tracking) == {"image_upload", "image_analysis"}
+
+
+def test_failed_items_do_not_stop_a_stage():
+    results = []
+
+    async def handler(item):
+        if item == 1:
+            raise ValueError("bad item")
+        results.append(item)
+
+    async def main():
+        queue = asyncio.Queue(maxsize=1)
+        await asyncio.gather(feed_queue(queue, range(3)), run_stage("stage", handler, queue, None, 1, {}))
+        return await queue.get()
+
+    assert asyncio.run(main()) is QUEUE_DONE
+    assert results == [0, 2]
+
+
+def test_stream_messages_until_tasks_finish():
+    async def main():
+        messages = asyncio.Queue()
+
+        async def producer():
+            for i in range(3):
+                await messages.put(f"message {i}")
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(producer())
+        return [message async for message in stream_messages(messages, [task])]
+
+    assert asyncio.run(main()) == ["message 0", "message 1", "message 2"]
@@ -0,0 +1,77 @@
+from pathlib import Path
+import logging
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import pipeline.science.pipeline.embeddings as embeddings_module
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embedding model that records every call it receives.
+    """
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str) -> list[float]:
+        return [float((hash(text) >> shift) % 97) for shift in range(self.dim)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        return self._vector(text)
+
+
+def _save_store(folder: Path, texts: list[str]) -> None:
+    docs = [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)]
+    FAISS.from_documents(docs, FakeEmbeddings()).save_local(str(folder))
+
+
+def test_load_embeddings_reuses_saved_vectors(tmp_path, monkeypatch):
+    """
+    load_embeddings should merge saved indexes without calling the embedding model.
+    """
+    folders = [tmp_path / "file_0", tmp_path / "file_1"]
+    _save_store(folders[0], ["alpha chunk", "beta chunk", "gamma chunk"])
+    _save_store(folders[1], ["delta chunk", "epsilon chunk"])
+
+    fake_embeddings = FakeEmbeddings()
+    monkeypatch.setattr(embeddings_module, "get_embedding_models", lambda embedding_type, para: fake_embeddings)
+
+    db_merged = embeddings_module.load_embeddings([str(folder) for folder in folders], 'default')
+
+    assert fake_embeddings.calls == 0, "load_embeddings must not call the embedding model"
+    assert db_merged.index.ntotal == 5
+    assert len(db_merged.index_to_docstore_id) == 5
+
+    file_index_by_content = {
+        db_merged.docstore.search(doc_id).page_content: db_merged.docstore.search(doc_id).metadata["file_index"]
+        for doc_id in db_merged.index_to_docstore_id.values()
+    }
+    assert file_index_by_content["alpha chunk"] == 0
+    assert file_index_by_content["epsilon chunk"] == 1
+
+    # The stored vector of every chunk must still point at the right document
+    for position, doc_id in db_merged.index_to_docstore_id.items():
+        doc = db_merged.docstore.search(doc_id)
+        stored_vector = db_merged.index.reconstruct(position)
+        assert list(stored_vector) == pytest.approx(FakeEmbeddings()._vector(doc.page_content))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
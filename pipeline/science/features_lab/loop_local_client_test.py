@@ -0,0 +1,65 @@
+from pathlib import Path
+import asyncio
+import logging
+import sys
+import httpx
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.api_handler import LoopLocalAsyncClient
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def test_each_loop_gets_its_own_client():
+    client = LoopLocalAsyncClient()
+
+    async def loop_clients():
+        return await client._loop_client(), await client._loop_client()
+
+    first, again = asyncio.run(loop_clients())
+    second, _ = asyncio.run(loop_clients())
+
+    assert first is again
+    assert first is not second
+
+
+def test_loop_clients_are_closed_when_their_loop_shuts_down():
+    client = LoopLocalAsyncClient()
+
+    async def loop_client():
+        return await client._loop_client()
+
+    loop_client = asyncio.run(loop_client())
+
+    assert loop_client.is_closed
+    assert len(client._loop_clients) == 0
+
+
+def test_aclose_closes_the_client_of_the_running_loop():
+    client = LoopLocalAsyncClient()
+
+    async def close_loop_client():
+        loop_client = await client._loop_client()
+        await client.aclose()
+        return loop_client, await client._loop_client()
+
+    closed, reopened = asyncio.run(close_loop_client())
+
+    assert closed.is_closed
+    assert reopened is not closed and reopened.is_closed
+
+
+def test_the_shared_client_opens_no_pool_of_its_own():
+    client = LoopLocalAsyncClient()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(client._transport.handle_async_request(httpx.Request("GET", "https://example.com")))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,144 @@
+from pathlib import Path
+import asyncio
+import logging
+import sys
+import pytest
+from aiohttp import web
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.helper.marker_client import (
+    MarkerAPIError,
+    MarkerClient,
+    get_marker_config,
+    next_poll_delay,
+)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+TEST_CONFIG = {
+    **get_marker_config(),
+    "initial_poll_interval": 0.01,
+    "fast_polls": 2,
+    "backoff_factor": 2.0,
+    "max_poll_interval": 0.05,
+    "timeout_seconds": 5,
+    "max_poll_errors": 3,
+}
+
+
+class FakeMarkerServer:
+    """
+    Local stand-in for the Marker API: the conversion completes after a fixed number
+    of polls, and the first polls can be made to fail.
+    """
+    def __init__(self, polls_to_complete: int = 5, failing_polls: int = 0, success: bool = True):
+        self.polls_to_complete = polls_to_complete
+        self.failing_polls = failing_polls
+        self.success = success
+        self.polls = 0
+        self.upload = None
+        self.base_url = None
+        self._runner = None
+
+    async def submit(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        self.upload = {
+            "api_key": request.headers.get("X-Api-Key"),
+            "fields": {name: value for name, value in form.items() if name != "file"},
+            "file_bytes": form["file"].file.read(),
+        }
+        return web.json_response({"success": True, "request_check_url": f"{self.base_url}/check/1"})
+
+    async def check(self, request: web.Request) -> web.Response:
+        self.polls += 1
+        if self.polls <= self.failing_polls:
+            return web.Response(status=503, text="busy")
+        if self.polls < self.polls_to_complete:
+            progress = int(100 * self.polls / self.polls_to_complete)
+            return web.json_response({"status": "processing", "progress": progress})
+        return web.json_response({
+            "status": "complete",
+            "success": self.success,
+            "error": None if self.success else "conversion failed",
+            "markdown": "# Title\n\nBody",
+            "images": {},
+        })
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/api/v1/marker", self.submit)
+        app.router.add_get("/check/{request_id}", self.check)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._runner.cleanup()
+
+
+async def convert_with_fake_server(server: FakeMarkerServer, pdf_path: Path) -> dict:
+    async with server:
+        marker_config = {**TEST_CONFIG, "api_url": f"{server.base_url}/api/v1/marker"}
+        async with MarkerClient(api_key="test-key", marker_config=marker_config) as client:
+            result = await client.convert(pdf_path)
+            session = client.session
+        # The session opened by the client is closed with it
+        assert session.closed
+        return result
+
+
+def test_convert_uploads_and_polls_until_complete(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 fake")
+    server = FakeMarkerServer(polls_to_complete=5)
+
+    result = asyncio.run(convert_with_fake_server(server, pdf_path))
+
+    assert result["markdown"] == "# Title\n\nBody"
+    assert server.polls == 5
+    assert server.upload["api_key"] == "test-key"
+    assert server.upload["file_bytes"] == b"%PDF-1.4 fake"
+    assert server.upload["fields"]["output_format"] == "markdown"
+
+
+def test_polling_survives_transient_errors(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 fake")
+    server = FakeMarkerServer(polls_to_complete=4, failing_polls=2)
+
+    result = asyncio.run(convert_with_fake_server(server, pdf_path))
+    assert result["status"] == "complete"
+
+
+def test_failed_conversion_raises(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 fake")
+    server = FakeMarkerServer(polls_to_complete=2, success=False)
+
+    with pytest.raises(MarkerAPIError):
+        asyncio.run(convert_with_fake_server(server, pdf_path))
+
+
+def test_poll_delay_is_fast_then_backs_off():
+    config = {**TEST_CONFIG, "initial_poll_interval": 0.5, "fast_polls": 3, "backoff_factor": 2.0, "max_poll_interval": 10}
+    delays = []
+    delay = config["initial_poll_interval"]
+    for poll_index in range(8):
+        delay = next_poll_delay(poll_index, delay, elapsed=0, progress=0, marker_config=config)
+        delays.append(delay)
+    assert delays[:3] == [0.5, 0.5, 0.5]
+    assert delays[3:] == [1.0, 2.0, 4.0, 8.0, 10]
+
+
+def test_poll_delay_follows_estimated_remaining_time():
+    config = {**TEST_CONFIG, "initial_poll_interval": 0.5, "fast_polls": 0, "backoff_factor": 2.0, "max_poll_interval": 10}
+    # 90% done after 18 s: about 2 s left, so check again in 1 s instead of backing off to 10 s
+    assert next_poll_delay(10, 8.0, elapsed=18, progress=90, marker_config=config) == 1.0
@@ -0,0 +1,101 @@
+"""
+Count the model clients built for one chat turn, with and without the shared
+ModelRegistry in api_handler.
+
+A "turn" calls the helpers a basic-mode answer goes through: get_llm (basic,
+advanced, streaming advanced), get_embedding_models, truncate_chat_history,
+truncate_document per summary topic and get_translation_llm. No API request is
+sent; dummy credentials are used when none are configured. Each turn runs in its
+own asyncio.run loop, like a chat turn of the frontend.
+
+Usage:
+    python pipeline/science/features_lab/model_registry_benchmark.py --turns 20
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+for name, value in {
+    "AZURE_OPENAI_API_KEY": "dummy",
+    "AZURE_OPENAI_ENDPOINT": "https://example.openai.azure.com/",
+    "AZURE_OPENAI_API_KEY_BACKUP": "dummy",
+    "AZURE_OPENAI_ENDPOINT_BACKUP": "https://example.openai.azure.com/",
+    "AZURE_OPENAI_ENDPOINT_EMBEDDINGS": "https://example.openai.azure.com/",
+    "OPENAI_API_KEY_EMBEDDINGS": "dummy",
+    "OPENAI_API_VERSION": "2024-06-01",
+    "SAMBANOVA_API_KEY": "dummy",
+}.items():
+    os.environ.setdefault(name, value)
+
+from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.api_handler import ModelRegistry, get_model_registry
+from pipeline.science.pipeline.utils import get_llm, truncate_chat_history, truncate_document
+from pipeline.science.pipeline.embeddings import get_embedding_models
+from pipeline.science.pipeline.content_translator import get_translation_llm
+
+CHAT_HISTORY = [
+    {"role": "user", "content": "What is shown in Figure 2?"},
+    {"role": "assistant", "content": "Figure 2 shows the photon correlation function."},
+    {"role": "user", "content": "And the error bars?"},
+]
+
+
+def chat_turn(para: dict, topics: int) -> None:
+    get_llm('basic', para)
+    get_llm('advanced', para)
+    get_llm('advanced', para, stream=True)
+    get_embedding_models('default', para)
+    truncate_chat_history(CHAT_HISTORY)
+    for _ in range(topics):
+        truncate_document("The document text. " * 50)
+    get_translation_llm(para)
+
+
+async def chat_turn_in_loop(para: dict, topics: int) -> None:
+    chat_turn(para, topics)
+
+
+def run(label: str, turns: int, topics: int, use_registry: bool) -> None:
+    registry = get_model_registry()
+    registry.clear()
+    original_get_or_create = ModelRegistry.get_or_create
+    if not use_registry:
+        # Build every client, like ApiHandler did before the registry
+        def build_always(self, key, factory):
+            self.builds += 1
+            return factory()
+        ModelRegistry.get_or_create = build_always
+    try:
+        builds_before = registry.builds
+        start = time.perf_counter()
+        for _ in range(turns):
+            asyncio.run(chat_turn_in_loop(dict(load_config()['llm']), topics))
+        elapsed = time.perf_counter() - start
+    finally:
+        ModelRegistry.get_or_create = original_get_or_create
+    builds = registry.builds - builds_before
+    print(
+        f"{label:<16} {builds / turns:7.1f} clients built per turn  "
+        f"{elapsed / turns * 1000:8.1f} ms per turn  ({turns} turns, {builds} clients)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model clients built per chat turn, with and without the registry")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--topics", type=int, default=5, help="truncate_document calls per turn, as in generate_document_summary")
+    args = parser.parse_args()
+
+    run("no registry", args.turns, args.topics, use_registry=False)
+    run("model registry", args.turns, args.topics, use_registry=True)
+
+
+if __name__ == "__main__":
+    main()
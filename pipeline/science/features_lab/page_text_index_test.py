@@ -0,0 +1,57 @@
+from pathlib import Path
+import logging
+import random
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.utils import normalize_text
+from pipeline.science.pipeline.page_text_index import (
+    PageTextIndex,
+    normalize_text_with_offsets,
+)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+RAW_PAGES = [
+    "Quantum  states |  ↓ ⟩ and | ↑  ⟩\n\nare shown in [ 39 ] and [40].\n",
+    "  The energy E ∼ 10−3 eV\tis small.  ",
+    "",
+]
+
+
+@pytest.mark.parametrize("raw_text", RAW_PAGES)
+def test_normalization_matches_normalize_text(raw_text):
+    normalized_text, offsets = normalize_text_with_offsets(raw_text)
+    assert normalized_text == normalize_text(raw_text)
+    assert len(offsets) == len(normalized_text)
+
+
+def test_normalization_matches_on_random_text():
+    alphabet = list("ab c\n\t[]|↓↑⟩−∼39  x")
+    rng = random.Random(0)
+    for _ in range(2000):
+        raw_text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        normalized_text, offsets = normalize_text_with_offsets(raw_text)
+        assert normalized_text == normalize_text(raw_text)
+        for position, char in enumerate(normalized_text):
+            if char not in " -~":
+                assert raw_text[offsets[position]] == char
+
+
+def test_offset_maps_survive_save_and_load(tmp_path):
+    page_text_index = PageTextIndex.from_page_texts(RAW_PAGES, file_id="abc")
+    page_text_index.save(str(tmp_path))
+    loaded = PageTextIndex.load(str(tmp_path), file_id="abc")
+
+    assert loaded.pages == page_text_index.pages
+    assert PageTextIndex.load(str(tmp_path), file_id="other") is None
+
+    # "[39]" in the normalized text maps back to "[ 39 ]" in the raw text
+    start = loaded.pages[0].find("[39]")
+    raw_start, raw_end = loaded.raw_span(0, start, start + len("[39]"))
+    assert RAW_PAGES[0][raw_start:raw_end] == "[ 39 ]"
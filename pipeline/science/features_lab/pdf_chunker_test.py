@@ -0,0 +1,135 @@
+from pathlib import Path
+import logging
+import random
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.pdf_chunker import (
+    _ProgressReporter,
+    aextract_searchable_page_texts,
+    create_searchable_chunks,
+    searchable_page_text,
+    split_block_text,
+)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def previous_split(clean_text, chunk_size):
+    """
+    The splitting loop create_searchable_chunks used before, with repeated slices.
+    """
+    pieces = []
+    while len(clean_text) > 0:
+        end_pos = min(chunk_size, len(clean_text))
+        if end_pos < len(clean_text):
+            last_period = clean_text[:end_pos].rfind(". ")
+            if last_period > 0:
+                end_pos = last_period + 1
+            else:
+                last_space = clean_text[:end_pos].rfind(" ")
+                if last_space > 0:
+                    end_pos = last_space
+        chunk_text = clean_text[:end_pos].strip()
+        if chunk_text:
+            pieces.append(chunk_text)
+        clean_text = clean_text[end_pos:].strip()
+    return pieces
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 20, 100, 1000])
+def test_split_matches_previous_loop(chunk_size):
+    rng = random.Random(chunk_size)
+    words = ["ion", "photon.", "a", "entanglement", "state.", "x", "network"]
+    for _ in range(200):
+        clean_text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 80)))
+        assert split_block_text(clean_text, chunk_size) == previous_split(clean_text, chunk_size)
+
+
+def test_split_without_break_points():
+    assert split_block_text("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+
+
+class RawDictPage:
+    def __init__(self, blocks):
+        self.blocks = blocks
+
+    def get_text(self, option):
+        assert option == "rawdict"
+        return {"blocks": self.blocks}
+
+
+def text_block(*lines):
+    return {"type": 0, "lines": [
+        {"spans": [{"chars": [{"c": char} for char in line]}]} for line in lines
+    ]}
+
+
+def test_searchable_page_text_follows_block_layout():
+    page = RawDictPage([
+        text_block("Quantum networks", "of trapped ions"),
+        {"type": 1, "image": b""},
+        text_block(" ", ""),
+        text_block("Figure 1."),
+    ])
+    assert searchable_page_text(page) == "Quantum networks\nof trapped ions\n\nFigure 1.\n"
+
+
+def test_progress_is_rate_limited():
+    progress = _ProgressReporter(total_pages=200, step_percent=10, min_interval_seconds=0)
+    messages = [progress.update(done_pages) for done_pages in range(1, 201)]
+    reported = [message for message in messages if message]
+    assert len(reported) == 10
+    assert "100%" in reported[-1]
+
+
+def test_chunks_from_a_path_match_chunks_from_a_document(tmp_path):
+    import fitz
+    file_path = tmp_path / "paper.pdf"
+    doc = fitz.open()
+    for page_num in range(3):
+        doc.new_page().insert_text((72, 72), f"Page {page_num}. Trapped ions form a quantum network.")
+    doc.save(str(file_path))
+
+    from_doc = create_searchable_chunks(doc, chunk_size=20, max_workers=1)
+    from_path = create_searchable_chunks(str(file_path), chunk_size=20, max_workers=1)
+    doc.close()
+
+    assert [chunk.page_content for chunk in from_path] == [chunk.page_content for chunk in from_doc]
+    assert [chunk.metadata["page"] for chunk in from_path] == [chunk.metadata["page"] for chunk in from_doc]
+
+
+def test_serial_extraction_runs_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    import fitz
+    from pipeline.science.pipeline import pdf_chunker
+    file_path = tmp_path / "paper.pdf"
+    doc = fitz.open()
+    for page_num in range(5):
+        doc.new_page().insert_text((72, 72), f"Page {page_num}")
+    doc.save(str(file_path))
+    doc.close()
+
+    extraction_threads = set()
+    original_searchable_page_text = pdf_chunker.searchable_page_text
+
+    def searchable_page_text(page):
+        extraction_threads.add(threading.get_ident())
+        return original_searchable_page_text(page)
+
+    monkeypatch.setattr(pdf_chunker, "searchable_page_text", searchable_page_text)
+
+    async def extract():
+        items = [item async for item in aextract_searchable_page_texts(str(file_path), max_workers=1)]
+        return threading.get_ident(), items[-1]
+
+    loop_thread, page_texts = asyncio.run(extract())
+
+    assert [text.strip() for text in page_texts] == [f"Page {page_num}" for page_num in range(5)]
+    assert extraction_threads and loop_thread not in extraction_threads
@@ -0,0 +1,86 @@
+"""
+Benchmark create_searchable_chunks in pages per second, serially and on a process
+pool, and check that both produce the same chunks.
+
+Without --pdf a 200-page PDF of synthetic paragraphs is generated with fitz.
+
+Usage:
+    python pipeline/science/features_lab/pdf_chunking_benchmark.py --pages 200 --workers 1 2 4
+    python pipeline/science/features_lab/pdf_chunking_benchmark.py --pdf path/to/book.pdf --chunk-size 1000
+"""
+from pathlib import Path
+import argparse
+import random
+import sys
+import tempfile
+import time
+
+import fitz
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.pdf_chunker import create_searchable_chunks
+
+WORDS = (
+    "the of and to in a is that for it as with was on be by this are from at an which "
+    "ion photon chain transport entanglement quantum state beam mode crystal motion rate "
+    "measurement correlation function single multiplexed trap network node repeater heating"
+).split()
+
+
+def synthetic_pdf(path: str, pages: int, seed: int) -> None:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        y = 72
+        for _ in range(8):
+            paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))) + "."
+            rect = fitz.Rect(72, y, page.rect.width - 72, y + 80)
+            page.insert_textbox(rect, paragraph, fontsize=9)
+            y += 85
+    doc.save(path)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="create_searchable_chunks throughput benchmark")
+    parser.add_argument("--pdf", type=str, default=None, help="Chunk this PDF instead of a synthetic one")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = str(Path(tmp_dir) / "synthetic.pdf")
+            synthetic_pdf(pdf_path, args.pages, args.seed)
+        doc = fitz.open(pdf_path)
+        print(f"pdf={pdf_path} pages={len(doc)} chunk_size={args.chunk_size}")
+
+        reference = None
+        for max_workers in args.workers:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                chunks = create_searchable_chunks(doc, args.chunk_size, max_workers=max_workers)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            signature = [(chunk.page_content, chunk.metadata) for chunk in chunks]
+            if reference is None:
+                reference = signature
+            same = "same" if signature == reference else "DIFFERENT"
+            print(
+                f"workers={max_workers:<3} best {best * 1000:9.1f} ms  "
+                f"{len(doc) / best:9.1f} pages/s  chunks={len(chunks)}  output {same} as workers={args.workers[0]}"
+            )
+        doc.close()
+
+
+if __name__ == "__main__":
+    main()
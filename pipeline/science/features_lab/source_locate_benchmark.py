@@ -0,0 +1,164 @@
+"""
+Benchmark the fuzzy fallback of locate_chunk_in_pdf: the previous sliding-window
+SequenceMatcher scan against the shingle-index matcher (fuzzy_matcher.fuzzy_locate).
+
+Fixtures follow source_index_locate_test.py: chunks are cut from random page
+positions and then perturbed (dropped characters, changed words, broken spacing)
+so the exact pass misses them. Pages are synthetic by default; --pdf uses the
+page texts of a real document.
+
+Usage:
+    python pipeline/science/features_lab/source_locate_benchmark.py --pages 40 --chunks 20
+    python pipeline/science/features_lab/source_locate_benchmark.py --pdf path/to/paper.pdf
+"""
+from pathlib import Path
+from difflib import SequenceMatcher
+import argparse
+import random
+import re
+import sys
+import time
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.fuzzy_matcher import ShingleIndex, fuzzy_locate, get_fuzzy_matcher_config
+
+WORDS = (
+    "the of and to in a is that for it as with was on be by this are from at an which the the "
+    "ion photon chain transport entanglement quantum state beam mode crystal motion rate the "
+    "measurement correlation function single multiplexed trap network node repeater heating"
+).split()
+
+
+def normalize_text(text):
+    # Same steps as utils.normalize_text, kept local so the benchmark has no heavy imports
+    text = re.sub(r'\s+', ' ', text)
+    text = text.replace('−', '-')
+    text = text.replace('∼', '~')
+    text = re.sub(r'\|\s*↓\s*⟩', '|↓⟩', text)
+    text = re.sub(r'\|\s*↑\s*⟩', '|↑⟩', text)
+    text = re.sub(r'\s*\[\s*(\d+)\s*\]', r'[\1]', text)
+    return text.strip()
+
+
+def synthetic_pages(n_pages: int, words_per_page: int, rng: random.Random) -> list[str]:
+    pages = []
+    for _ in range(n_pages):
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        for i in range(0, len(words), rng.randint(8, 20)):
+            words[i] = words[i] + "."
+        pages.append(" ".join(words))
+    return pages
+
+
+def pdf_pages(pdf_path: str) -> list[str]:
+    import fitz
+    doc = fitz.open(pdf_path)
+    pages = [normalize_text(page.get_text()) for page in doc]
+    doc.close()
+    return pages
+
+
+def perturb(text: str, rng: random.Random, rate: float) -> str:
+    chars = list(text)
+    for i in range(len(chars)):
+        roll = rng.random()
+        if roll < rate / 2:
+            chars[i] = ""
+        elif roll < rate:
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return normalize_text("".join(chars))
+
+
+def make_fixtures(pages: list[str], n_chunks: int, rng: random.Random, rate: float) -> list[tuple[str, int, int]]:
+    fixtures = []
+    candidates = [i for i, page in enumerate(pages) if len(page) > 400]
+    while len(fixtures) < n_chunks and candidates:
+        page_num = rng.choice(candidates)
+        page = pages[page_num]
+        start = rng.randint(0, len(page) - 300)
+        # Start the chunk on a word boundary, like sources cut from chunks
+        start = page.find(" ", start) + 1
+        length = rng.randint(150, 600)
+        chunk = page[start:start + length]
+        fixtures.append((perturb(chunk, rng, rate), page_num, start))
+    return fixtures
+
+
+def sliding_window_locate(normalized_chunk: str, pages: list[str], similarity_threshold: float = 0.8):
+    """
+    The previous fallback of locate_chunk_in_pdf.
+    """
+    chunk_words = normalized_chunk.split()
+    for page_num, normalized_text in enumerate(pages):
+        best_similarity = 0
+        best_start = -1
+        first_words = " ".join(chunk_words[:10])
+        for match in re.finditer(re.escape(chunk_words[0]), normalized_text):
+            start_pos = match.start()
+            if start_pos + len(normalized_chunk) > len(normalized_text):
+                continue
+            window_size = min(len(normalized_chunk) + 100, len(normalized_text) - start_pos)
+            window_text = normalized_text[start_pos:start_pos + window_size]
+            window_start = window_text[:len(first_words)]
+            similarity = SequenceMatcher(None, first_words, window_start).ratio()
+            if similarity > 0.8:
+                chunk_similarity = SequenceMatcher(None, normalized_chunk, window_text[:len(normalized_chunk)]).ratio()
+                if chunk_similarity > best_similarity:
+                    best_similarity = chunk_similarity
+                    best_start = start_pos
+        if best_similarity > similarity_threshold:
+            return {"page_num": page_num, "start_char": best_start, "similarity": best_similarity}
+    return None
+
+
+def run(name: str, locate, fixtures: list[tuple[str, int, int]]) -> None:
+    latencies = []
+    found_page = 0
+    found_start = 0
+    for chunk, page_num, start in fixtures:
+        begin = time.perf_counter()
+        result = locate(chunk)
+        latencies.append(time.perf_counter() - begin)
+        if result is not None and result["page_num"] == page_num:
+            found_page += 1
+            if abs(result["start_char"] - start) <= 20:
+                found_start += 1
+    latencies.sort()
+    print(
+        f"{name:<16} total {sum(latencies) * 1000:9.1f} ms  "
+        f"p50 {latencies[len(latencies) // 2] * 1000:8.2f} ms  max {latencies[-1] * 1000:8.2f} ms  "
+        f"page {found_page}/{len(fixtures)}  start {found_start}/{len(fixtures)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzzy source locator benchmark: sliding window vs shingle index")
+    parser.add_argument("--pdf", type=str, default=None, help="Use the pages of this PDF instead of synthetic pages")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--words-per-page", type=int, default=700)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--perturbation", type=float, default=0.04, help="Fraction of characters changed per chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = pdf_pages(args.pdf) if args.pdf else synthetic_pages(args.pages, args.words_per_page, rng)
+    fixtures = make_fixtures(pages, args.chunks, rng, args.perturbation)
+    print(f"pages={len(pages)} chunks={len(fixtures)} perturbation={args.perturbation}")
+
+    matcher_config = get_fuzzy_matcher_config()
+    begin = time.perf_counter()
+    shingle_index = ShingleIndex(pages, matcher_config["shingle_size"])
+    print(f"shingle index build {(time.perf_counter() - begin) * 1000:.1f} ms ({len(shingle_index.postings)} shingles)")
+
+    run("shingle index", lambda chunk: fuzzy_locate(chunk, shingle_index), fixtures)
+    if not args.skip_baseline:
+        run("sliding window", lambda chunk: sliding_window_locate(chunk, pages), fixtures)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from pathlib import Path
+import logging
+import random
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.text_matcher import AhoCorasickMatcher
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def brute_force_matches(patterns, text):
+    matches = set()
+    for pattern_index, pattern in enumerate(patterns):
+        if not pattern:
+            continue
+        start = text.find(pattern)
+        while start != -1:
+            matches.add((pattern_index, start))
+            start = text.find(pattern, start + 1)
+    return matches
+
+
+@pytest.mark.parametrize("patterns, text", [
+    (["he", "she", "his", "hers"], "ushers"),
+    (["a", "aa", "aaa"], "aaaa"),
+    (["state |↓⟩", "[39]", "missing"], "the state |↓⟩ is shown in [39]."),
+    (["same", "same"], "the same text"),
+])
+def test_matches_equal_brute_force(patterns, text):
+    matcher = AhoCorasickMatcher(patterns)
+    assert set(matcher.iter_matches(text)) == brute_force_matches(patterns, text)
+
+
+def test_matches_equal_brute_force_on_random_text():
+    rng = random.Random(0)
+    for _ in range(300):
+        patterns = ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 8))]
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 60)))
+        matcher = AhoCorasickMatcher(patterns)
+        assert set(matcher.iter_matches(text)) == brute_force_matches(patterns, text)
+
+
+def test_first_matches_only_reports_requested_patterns():
+    matcher = AhoCorasickMatcher(["quantum", "photon", "ion"])
+    text = "an ion emits a photon, another ion emits a photon"
+    assert matcher.first_matches(text) == {2: 3, 1: 15}
+    assert matcher.first_matches(text, {1}) == {1: 15}
@@ -0,0 +1,57 @@
+from pathlib import Path
+import sys
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.documents import Document
+
+from pipeline.science.pipeline.token_counter import (
+    TOKEN_COUNT_KEY,
+    count_document_tokens,
+    count_tokens,
+    count_tokens_batch,
+    get_encoding,
+    get_token_count_memo,
+    with_token_counts,
+)
+
+TEXTS = [
+    "The photon correlation function g2(τ) drops below 1 at zero delay.",
+    "Antibunching is a signature of a single-photon source.",
+    "",
+    "数学公式 $E = mc^2$ 在量子力学中",
+]
+
+
+def test_encoding_is_cached():
+    assert get_encoding('gpt-4o') is get_encoding('gpt-4o')
+
+
+def test_batch_counts_match_single_counts():
+    assert count_tokens_batch(TEXTS) == [count_tokens(text) for text in TEXTS]
+
+
+def test_special_tokens_fall_back_to_single_counts():
+    texts = TEXTS + ["a <|fim_prefix|> b"]
+    assert count_tokens_batch(texts) == [count_tokens(text) for text in texts]
+
+
+def test_stored_counts_are_used_without_tokenizing():
+    metadatas = with_token_counts(TEXTS, [{"page": i} for i in range(len(TEXTS))])
+    assert [metadata["page"] for metadata in metadatas] == list(range(len(TEXTS)))
+    # Stored counts win over the text, which is not tokenized again
+    documents = [
+        Document(page_content=text, metadata={**metadata, TOKEN_COUNT_KEY: 1000 + i})
+        for i, (text, metadata) in enumerate(zip(TEXTS, metadatas))
+    ]
+    assert count_document_tokens(documents) == [1000 + i for i in range(len(TEXTS))]
+
+
+def test_counts_without_metadata_are_memoized():
+    get_token_count_memo().clear()
+    documents = [Document(page_content=text, metadata={}) for text in TEXTS]
+    assert count_document_tokens(documents) == count_tokens_batch(TEXTS)
+    encoding, _ = get_encoding('gpt-4o')
+    assert get_token_count_memo().get((encoding.name, TEXTS[0])) == count_tokens(TEXTS[0])
@@ -0,0 +1,125 @@
+from pathlib import Path
+import logging
+import os
+import sys
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import pipeline.science.pipeline.embeddings as embeddings_module
+from pipeline.science.pipeline.chunk_store import save_vector_store
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embedding model, so stores can be built without an API.
+    """
+    def _vector(self, text: str) -> list[float]:
+        return [float((hash(text) >> shift) % 97) for shift in range(8)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+def _save_store(folder: Path, texts: list[str]) -> None:
+    docs = [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)]
+    save_vector_store(FAISS.from_documents(docs, FakeEmbeddings()), str(folder))
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = embeddings_module.VectorStoreCache(max_bytes=1024 ** 2, max_entries=8)
+    monkeypatch.setattr(embeddings_module, "_vector_store_cache", cache)
+    monkeypatch.setattr(embeddings_module, "get_embedding_models", lambda embedding_type, para: FakeEmbeddings())
+    return cache
+
+
+def test_repeated_loads_hit_the_cache(tmp_path, cache):
+    _save_store(tmp_path / "file_0", ["alpha", "beta"])
+    folders = [str(tmp_path / "file_0")]
+
+    db = embeddings_module.load_embeddings(folders, 'default')
+    assert embeddings_module.load_embeddings(folders, 'default') is db
+    assert embeddings_module.load_embeddings(folders, 'lite') is not db
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_changed_index_files_are_not_served(tmp_path, cache):
+    folder = tmp_path / "file_0"
+    _save_store(folder, ["alpha", "beta"])
+    db = embeddings_module.load_embeddings([str(folder)], 'default')
+
+    _save_store(folder, ["alpha", "beta", "gamma"])
+    # Also catch a rewrite within the file system's timestamp resolution
+    stat = os.stat(folder / "index.faiss")
+    os.utime(folder / "index.faiss", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    reloaded = embeddings_module.load_embeddings([str(folder)], 'default')
+    assert reloaded is not db
+    assert reloaded.index.ntotal == 3
+
+
+def test_entries_are_evicted_to_stay_within_the_byte_budget():
+    cache = embeddings_module.VectorStoreCache(max_bytes=100, max_entries=8)
+    cache.put("a", "store a", 40)
+    cache.put("b", "store b", 40)
+    assert cache.get("a") == "store a"
+    cache.put("c", "store c", 40)
+
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "store a" and cache.get("c") == "store c"
+    assert cache.stats()["bytes"] == 80
+    assert cache.stats()["evictions"] == 1
+    # A store larger than the whole budget is not cached
+    cache.put("d", "store d", 101)
+    assert cache.get("d") is None
+
+
+def test_modified_stores_are_dropped_from_the_cache(tmp_path, cache):
+    folders = [str(tmp_path / "file_0"), str(tmp_path / "file_1")]
+    _save_store(Path(folders[0]), ["alpha", "beta"])
+    _save_store(Path(folders[1]), ["gamma"])
+    db_first = embeddings_module.load_embeddings(folders[:1], 'default')
+    db_both = embeddings_module.load_embeddings(folders, 'default')
+
+    embeddings_module._delete_from_vector_store(db_first, [db_first.index_to_docstore_id[0]])
+    assert embeddings_module.load_embeddings(folders[:1], 'default') is not db_first
+
+    assert cache.invalidate(folders[1]) == 1
+    assert embeddings_module.load_embeddings(folders, 'default') is not db_both
+
+
+def test_stores_leaving_the_cache_release_their_chunk_store(tmp_path, cache):
+    cache.max_entries = 1
+    _save_store(tmp_path / "file_0", ["alpha", "beta"])
+    _save_store(tmp_path / "file_1", ["gamma"])
+
+    db = embeddings_module.load_embeddings([str(tmp_path / "file_0")], 'default')
+    assert db.docstore._conn is not None
+    embeddings_module.load_embeddings([str(tmp_path / "file_1")], 'default')
+
+    # Evicted: the handle is released, and reopened for a caller still holding the store
+    assert db.docstore._conn is None
+    assert db.docstore.search(db.index_to_docstore_id[0]).page_content == "alpha"
+
+    current = embeddings_module.load_embeddings([str(tmp_path / "file_1")], 'default')
+    cache.invalidate(str(tmp_path / "file_1"))
+    assert current.docstore._conn is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,132 @@
+from pathlib import Path
+import logging
+import sys
+import numpy as np
+import faiss
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.embeddings import Embeddings
+
+import pipeline.science.pipeline.embeddings as embeddings_module
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DIM = 16
+IVFPQ_CONFIG = {
+    "type": "ivfpq",
+    "min_vectors": 0,
+    "ivfpq": {"nlist": 4, "nprobe": 4, "m": 4, "nbits": 6},
+}
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Embedding model that must not be called: stores are built from given vectors.
+    """
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        raise AssertionError("The embedding model must not be called")
+
+    def embed_query(self, text: str) -> list[float]:
+        raise AssertionError("The embedding model must not be called")
+
+
+@pytest.fixture
+def ivfpq_store(monkeypatch):
+    monkeypatch.setattr(embeddings_module, "get_config", lambda: {"vector_index": IVFPQ_CONFIG})
+    rng = np.random.default_rng(0)
+    vectors = (rng.standard_normal((400, DIM)) * 10).astype(np.float32)
+    ids = [f"chunk_{i}" for i in range(len(vectors))]
+    db = embeddings_module.faiss_from_vectors(
+        [f"text {i}" for i in range(len(vectors))],
+        vectors,
+        FakeEmbeddings(),
+        metadatas=[{"page": i} for i in range(len(vectors))],
+        ids=ids,
+    )
+    assert isinstance(db.index, faiss.IndexIVFPQ)
+    return db, dict(zip(ids, vectors))
+
+
+def _assert_consistent(db) -> None:
+    assert sorted(db.index_to_docstore_id) == list(range(db.index.ntotal))
+    assert len(set(db.index_to_docstore_id.values())) == db.index.ntotal
+
+
+def test_delete_then_search_on_ivfpq(ivfpq_store):
+    db, vectors = ivfpq_store
+    deleted = {f"chunk_{i}" for i in range(0, 400, 3)}
+
+    embeddings_module._delete_from_vector_store(db, list(deleted))
+
+    _assert_consistent(db)
+    remaining = set(db.index_to_docstore_id.values())
+    assert remaining == set(vectors) - deleted
+
+    # Every remaining chunk is found from its own vector, under its own docstore id
+    found = 0
+    for doc_id in sorted(remaining):
+        results = db.similarity_search_with_score_by_vector(vectors[doc_id].tolist(), k=5)
+        result_ids = [doc.metadata["page"] for doc, _ in results]
+        assert not {f"chunk_{page}" for page in result_ids} & deleted
+        found += f"chunk_{results[0][0].metadata['page']}" == doc_id
+    # IVF-PQ is approximate, but the nearest result is almost always the chunk itself
+    assert found >= 0.9 * len(remaining)
+
+
+def test_add_after_delete_on_ivfpq(ivfpq_store):
+    db, vectors = ivfpq_store
+    embeddings_module._delete_from_vector_store(db, ["chunk_1", "chunk_2"])
+    new_vector = np.full(DIM, 50.0, dtype=np.float32)
+
+    db.add_embeddings([("new text", new_vector.tolist())], metadatas=[{"page": 1000}], ids=["chunk_new"])
+
+    _assert_consistent(db)
+    assert db.index.ntotal == 399
+    doc, _ = db.similarity_search_with_score_by_vector(new_vector.tolist(), k=1)[0]
+    assert doc.metadata["page"] == 1000
+    # Deleting again works on an index that was read back once
+    embeddings_module._delete_from_vector_store(db, ["chunk_new"])
+    _assert_consistent(db)
+    assert "chunk_new" not in db.index_to_docstore_id.values()
+
+
+def test_legacy_image_contexts_are_rekeyed_without_embedding(tmp_path, monkeypatch):
+    import json
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from pipeline.science.pipeline.chunk_store import save_vector_store
+
+    monkeypatch.setattr(embeddings_module, "get_config", lambda: {"llm": {}, "vector_index": {"type": "flat"}})
+    monkeypatch.setattr(embeddings_module, "get_embedding_models", lambda embedding_type, para: FakeEmbeddings())
+    monkeypatch.setattr(embeddings_module, "_vector_store_cache", embeddings_module.VectorStoreCache(1024 ** 2, 8))
+    folder = tmp_path / "file_id"
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.eye(3, DIM, dtype=np.float32))
+    docs = {
+        "page_0": Document(page_content="page text", metadata={"page": 0}),
+        "page_1": Document(page_content="more page text", metadata={"page": 1}),
+        # Image context saved before chunk ids were used
+        "random_id": Document(page_content="Figure 1 context", metadata={"source": "figure_1.png", "page": 1}),
+    }
+    save_vector_store(FAISS(embedding_function=FakeEmbeddings(), index=index, docstore=InMemoryDocstore(docs),
+                            index_to_docstore_id={0: "page_0", 1: "page_1", 2: "random_id"}), folder)
+    (folder / "markdown").mkdir()
+    (folder / "markdown" / "image_context.json").write_text(json.dumps({"figure_1.png": ["Figure 1 context"]}))
+
+    result = embeddings_module.update_image_context_embeddings(folder)
+
+    assert (result["added"], result["removed"]) == (1, 1)
+    db = embeddings_module.load_vector_store(folder, FakeEmbeddings(), mmap=False)
+    chunk_id = embeddings_module.image_context_chunk_id("file_id", "figure_1.png", 0)
+    position = {doc_id: position for position, doc_id in db.index_to_docstore_id.items()}[chunk_id]
+    assert np.array_equal(db.index.reconstruct(position), np.eye(3, DIM, dtype=np.float32)[2])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
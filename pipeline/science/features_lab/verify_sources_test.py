@@ -0,0 +1,100 @@
+from pathlib import Path
+import logging
+import sys
+import fitz
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pipeline.science.pipeline.sources_retrieval as sources_retrieval
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+PAGES = [
+    "We measured the photon correlation at low temperature.",
+    "The photon correlation function is shown in Figure 2.",
+]
+
+
+@pytest.fixture
+def pdf_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("FILE_PATH_PREFIX", str(tmp_path))
+    file_path = tmp_path / "paper.pdf"
+    doc = fitz.open()
+    for text in PAGES:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(file_path))
+    doc.close()
+    return str(file_path)
+
+
+def test_sources_are_located_on_their_page(pdf_path, tmp_path):
+    sources_with_scores = {
+        "photon correlation function": 0.9,
+        "correlation at low temperature": 0.8,
+        "not in the document": 0.7,
+    }
+
+    verified_sources = sources_retrieval.verify_sources(sources_with_scores, [pdf_path], [str(tmp_path)])
+
+    assert set(verified_sources) == {"photon correlation function", "correlation at low temperature"}
+    assert verified_sources["photon correlation function"]["page_num"] == 1
+    assert verified_sources["correlation at low temperature"]["page_num"] == 0
+    for verified_source in verified_sources.values():
+        assert verified_source["rects"]
+        assert verified_source["file_index"] == 0
+
+
+def test_text_match_without_rects_falls_back_to_full_search(pdf_path, tmp_path, monkeypatch):
+    """
+    A source matched in the page text but not found by search_for on that page is
+    not accepted there; the full search places it on the page where it is found.
+    """
+    original_robust_search_for = sources_retrieval.robust_search_for
+
+    def robust_search_for(page, text):
+        if page.number == 0:
+            return []
+        return original_robust_search_for(page, text)
+
+    monkeypatch.setattr(sources_retrieval, "robust_search_for", robust_search_for)
+
+    verified_sources = sources_retrieval.verify_sources({"photon correlation": 0.9}, [pdf_path], [str(tmp_path)])
+
+    assert verified_sources["photon correlation"]["page_num"] == 1
+    assert verified_sources["photon correlation"]["rects"]
+
+
+def test_fallback_only_searches_candidate_pages(tmp_path, monkeypatch):
+    """
+    A source the text match misses is searched only on the pages sharing its
+    word shingles, not on every page.
+    """
+    monkeypatch.setenv("FILE_PATH_PREFIX", str(tmp_path))
+    file_path = tmp_path / "long_paper.pdf"
+    doc = fitz.open()
+    for text in [f"Unrelated page {page_num} about lattice models." for page_num in range(8)] + PAGES:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(file_path))
+    doc.close()
+
+    searched_pages = []
+
+    def robust_search_for(page, text):
+        searched_pages.append(page.number)
+        return [fitz.Rect(0, 0, 1, 1)] if page.number == 9 else []
+
+    monkeypatch.setattr(sources_retrieval, "robust_search_for", robust_search_for)
+
+    source = "The photon correlation function is plotted in Figure 2."
+    verified_sources = sources_retrieval.verify_sources({source: 0.9}, [str(file_path)], [str(tmp_path)])
+
+    assert verified_sources[source]["page_num"] == 9
+    assert set(searched_pages) <= {8, 9}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,4 +1,8 @@
 import os
+import asyncio
+import threading
+import weakref
+import httpx
 import openai
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
@@ -25,11 +29,145 @@ GRAPHRAG_API_KEY={api_key}
         env_file.write(env_content)
 
 
+class _UnusedTransport(httpx.AsyncBaseTransport):
+    """
+    Transport of the LoopLocalAsyncClient itself, which sends nothing on its own.
+    """
+    async def handle_async_request(self, request):
+        raise RuntimeError("LoopLocalAsyncClient sends requests through its per-loop clients")
+
+
+class LoopLocalAsyncClient(httpx.AsyncClient):
+    """
+    httpx.AsyncClient that sends each request through an AsyncClient of the running
+    event loop. Async connection pools are bound to the loop they were opened on, and
+    every chat turn and ingestion runs on its own asyncio.run loop, so this lets one
+    model client be shared by the whole process: only the async pool is per loop, and
+    it is closed when its loop shuts down.
+
+    The openai clients require an httpx.AsyncClient, so this is one, but its own
+    transport is a placeholder and opens no connection pool.
+    """
+    def __init__(self):
+        super().__init__(transport=_UnusedTransport())
+        # Event loop -> (client, closer) for that loop
+        self._loop_clients = weakref.WeakKeyDictionary()
+        self._loop_clients_lock = threading.Lock()
+
+    async def _close_on_loop_shutdown(self, client: httpx.AsyncClient):
+        """
+        Async generator parked at its yield. The running loop tracks it from its first
+        iteration, and loop.shutdown_asyncgens() (called by asyncio.run before closing
+        the loop) finalizes it, which closes the client of the loop.
+        """
+        try:
+            yield
+        finally:
+            with self._loop_clients_lock:
+                entry = self._loop_clients.get(asyncio.get_running_loop())
+                if entry is not None and entry[0] is client:
+                    del self._loop_clients[asyncio.get_running_loop()]
+            await client.aclose()
+
+    async def _loop_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._loop_clients_lock:
+            entry = self._loop_clients.get(loop)
+            if entry is not None and not entry[0].is_closed:
+                return entry[0]
+            # Same timeouts and limits as the client openai builds by default
+            client = openai.DefaultAsyncHttpxClient()
+            closer = self._close_on_loop_shutdown(client)
+            self._loop_clients[loop] = (client, closer)
+        # Start the closer so the loop finalizes it on shutdown
+        await closer.asend(None)
+        return client
+
+    async def send(self, request, **kwargs):
+        return await (await self._loop_client()).send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        with self._loop_clients_lock:
+            entry = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+
+class ModelRegistry:
+    """
+    Process-level registry of model clients. Each client is built once per
+    (provider, deployment, endpoint, temperature, stream) and shared by every
+    ApiHandler, in every thread and event loop: its sync HTTP pool is shared, and its
+    async requests go through the LoopLocalAsyncClient of the process.
+    """
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._async_http_client = None
+        self.builds = 0
+        self.hits = 0
+
+    @property
+    def async_http_client(self) -> LoopLocalAsyncClient:
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = LoopLocalAsyncClient()
+            return self._async_http_client
+
+    def get_or_create(self, key: tuple, factory):
+        """
+        Return the client registered under key, building it with factory() the first time.
+        """
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+        # Build outside the lock, factories use async_http_client
+        client = factory()
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self.builds += 1
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "hits": self.hits,
+                "clients": len(self._clients),
+            }
+
+
+_model_registry = ModelRegistry()
+_loaded_env_files = set()
+_loaded_env_files_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _model_registry
+
+
+def load_env_once(env_file) -> None:
+    """
+    load_dotenv for a key file, once per process instead of once per ApiHandler.
+    """
+    with _loaded_env_files_lock:
+        if env_file in _loaded_env_files:
+            return
+        load_dotenv(env_file)
+        _loaded_env_files.add(env_file)
+
+
 class ApiHandler:
     def __init__(self, para, stream=False):
-        load_dotenv(para['openai_key_dir'])
-        self.para = para
-        self.para['stream'] = stream
+        load_env_once(para['openai_key_dir'])
+        # The config is shared and read-only, keep a copy with the stream flag
+        self.para = dict(para, stream=stream)
         self.api_key = str(os.getenv("AZURE_OPENAI_API_KEY"))
         self.azure_endpoint = str(os.getenv("AZURE_OPENAI_ENDPOINT"))
         self.azure_endpoint_backup = str(os.getenv("AZURE_OPENAI_ENDPOINT_BACKUP"))
@@ -56,13 +194,22 @@ class ApiHandler:
         Returns:
             Language model instance configured for the specified platform
         """
+        key = ('chat', host, deployment_name, endpoint, api_version, api_key, temperature, stream)
+        return get_model_registry().get_or_create(
+            key,
+            lambda: self._build_model(api_key, temperature, deployment_name, endpoint, api_version, host, stream),
+        )
+
+
+    def _build_model(self, api_key, temperature, deployment_name, endpoint, api_version, host, stream):
         if host == 'openai':
             return ChatOpenAI(
                 streaming=stream,
                 api_key=api_key,
                 model_name=deployment_name,
                 temperature=temperature,
-                model_kwargs={"stream_options": {"include_usage": True}} if stream else {}
+                model_kwargs={"stream_options": {"include_usage": True}} if stream else {},
+                http_async_client=get_model_registry().async_http_client,
             )
         elif host == 'azure':
             return AzureChatOpenAI(
@@ -72,7 +219,8 @@ class ApiHandler:
                 azure_deployment=deployment_name,
                 temperature=temperature,
                 streaming=stream,
-                model_kwargs={"stream_options": {"include_usage": True}} if stream else {}
+                model_kwargs={"stream_options": {"include_usage": True}} if stream else {},
+                http_async_client=get_model_registry().async_http_client,
             )
         elif host == 'sambanova':
             return ChatSambaNovaCloud(
@@ -149,34 +297,27 @@ class ApiHandler:
         return models
 
 
-    def load_embedding_models(self):
-        embedding_model = AzureOpenAIEmbeddings(
-            deployment="text-embedding-3-large",
-            model="text-embedding-3-large",
-            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT_EMBEDDINGS'),
-            openai_api_key =os.getenv('OPENAI_API_KEY_EMBEDDINGS'),
-            openai_api_type="azure",
-            chunk_size=2000)
-        
-        lite_embedding_model = AzureOpenAIEmbeddings(
-            deployment="text-embedding-ada-002",
-            model="text-embedding-ada-002",
-            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT_EMBEDDINGS'),
-            openai_api_key =os.getenv('OPENAI_API_KEY_EMBEDDINGS'),
-            openai_api_type="azure",
-            chunk_size=2000)
-        
-        small_embedding_model = AzureOpenAIEmbeddings(
-            deployment="text-embedding-3-small",
-            model="text-embedding-3-small",
-            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT_EMBEDDINGS'),
-            openai_api_key =os.getenv('OPENAI_API_KEY_EMBEDDINGS'),
+    def get_embedding_model(self, deployment_name):
+        """
+        Shared Azure OpenAI embedding client of a deployment.
+        """
+        azure_endpoint = os.getenv('AZURE_OPENAI_ENDPOINT_EMBEDDINGS')
+        openai_api_key = os.getenv('OPENAI_API_KEY_EMBEDDINGS')
+        key = ('embedding', 'azure', deployment_name, azure_endpoint, openai_api_key)
+        return get_model_registry().get_or_create(key, lambda: AzureOpenAIEmbeddings(
+            deployment=deployment_name,
+            model=deployment_name,
+            azure_endpoint=azure_endpoint,
+            openai_api_key=openai_api_key,
             openai_api_type="azure",
-            chunk_size=2000)
+            chunk_size=2000,
+            http_async_client=get_model_registry().async_http_client))
+
 
+    def load_embedding_models(self):
         models = {
-            'default': {'instance': embedding_model},
-            'lite': {'instance': lite_embedding_model},
-            'small': {'instance': small_embedding_model},
+            'default': {'instance': self.get_embedding_model("text-embedding-3-large")},
+            'lite': {'instance': self.get_embedding_model("text-embedding-ada-002")},
+            'small': {'instance': self.get_embedding_model("text-embedding-3-small")},
         }
-        return models
\ No newline at end of file
+        return models
@@ -0,0 +1,365 @@
+import os
+import json
+import struct
+import sqlite3
+import threading
+from pathlib import Path
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.chunk_store")
+
+CHUNK_STORE_FILE = "chunks.sqlite"
+PICKLE_DOCSTORE_FILE = "index.pkl"
+
+# Version 1: one JSON metadata column per chunk.
+# Version 2: columnar metadata with a string table for sources, page-level fields
+# stored once per page and relative_position derived from chunk_index.
+CHUNK_STORE_VERSION = 2
+
+# Bits of chunks.flags telling which derived fields the original metadata carried
+_FLAG_PAGE_FIELDS = 1
+_FLAG_RELATIVE_POSITION = 2
+
+_BBOX_FORMAT = "<4d"
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _encode_metadata(metadata: dict, strings: dict, pages: dict) -> tuple:
+    """
+    Split chunk metadata into the columns of a version 2 chunk store.
+
+    Args:
+        metadata: Metadata of one document
+        strings: String table being built, value -> id
+        pages: Page table being built, page -> total_blocks_in_page
+
+    Returns:
+        tuple: (page, source, chunk_index, bbox, flags, extra) column values
+    """
+    extra = dict(metadata)
+    page = extra.pop("page") if _is_int(extra.get("page")) else None
+    source = None
+    if isinstance(extra.get("source"), str):
+        source = strings.setdefault(extra.pop("source"), len(strings) + 1)
+    chunk_index = extra.pop("chunk_index") if _is_int(extra.get("chunk_index")) else None
+    bbox = None
+    block_bbox = extra.get("block_bbox")
+    # Only tuples of floats (as PyMuPDF returns them) decode back to an equal value,
+    # anything else is kept as JSON
+    if isinstance(block_bbox, tuple) and len(block_bbox) == 4 and all(type(v) is float for v in block_bbox):
+        bbox = struct.pack(_BBOX_FORMAT, *extra.pop("block_bbox"))
+
+    flags = 0
+    total_blocks = extra.get("total_blocks_in_page")
+    if page is not None and _is_int(total_blocks) and pages.setdefault(page, total_blocks) == total_blocks:
+        extra.pop("total_blocks_in_page")
+        flags |= _FLAG_PAGE_FIELDS
+        if chunk_index is not None and total_blocks and extra.get("relative_position") == chunk_index / total_blocks:
+            extra.pop("relative_position")
+            flags |= _FLAG_RELATIVE_POSITION
+
+    extra_json = json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+    return page, source, chunk_index, bbox, flags, extra_json
+
+
+def _decode_metadata(page, source, chunk_index, bbox, flags, extra_json, total_blocks) -> dict:
+    metadata = {}
+    if page is not None:
+        metadata["page"] = page
+    if source is not None:
+        metadata["source"] = source
+    if chunk_index is not None:
+        metadata["chunk_index"] = chunk_index
+    if bbox is not None:
+        metadata["block_bbox"] = struct.unpack(_BBOX_FORMAT, bbox)
+    if flags & _FLAG_PAGE_FIELDS:
+        metadata["total_blocks_in_page"] = total_blocks
+    if flags & _FLAG_RELATIVE_POSITION:
+        metadata["relative_position"] = chunk_index / total_blocks
+    if extra_json:
+        metadata.update(json.loads(extra_json))
+    return metadata
+
+
+def read_chunk_store_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()
+    except sqlite3.OperationalError:
+        # Version 1 files have no meta table
+        return 1
+    return int(row[0]) if row else 1
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Read-on-demand docstore backed by the chunk store of a saved index.
+
+    Only the documents returned by a search are read from disk. Documents added or
+    deleted after loading (merges, incremental updates) are kept in memory until
+    the store is saved again with save_vector_store. close() releases the file
+    handle; the next read opens it again.
+    """
+    def __init__(self, db_path: str | Path, extra_metadata: dict = None):
+        self.db_path = str(db_path)
+        self.extra_metadata = extra_metadata or {}
+        self._conn = self._connect()
+        self._lock = threading.Lock()
+        self.version = read_chunk_store_version(self._conn)
+        if self.version > CHUNK_STORE_VERSION:
+            raise ValueError(f"Chunk store {self.db_path} has version {self.version}, newer than supported {CHUNK_STORE_VERSION}")
+        self._added = {}
+        self._deleted = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with self._lock held
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _read(self, doc_id: str):
+        with self._lock:
+            if self.version == 1:
+                row = self._connection().execute(
+                    "SELECT page_content, metadata FROM chunks WHERE doc_id = ?", (doc_id,)
+                ).fetchone()
+            else:
+                row = self._connection().execute(
+                    "SELECT c.page_content, c.page, s.value, c.chunk_index, c.bbox, c.flags, c.extra, p.total_blocks_in_page "
+                    "FROM chunks c LEFT JOIN strings s ON s.id = c.source LEFT JOIN pages p ON p.page = c.page "
+                    "WHERE c.doc_id = ?", (doc_id,)
+                ).fetchone()
+        if row is None:
+            return None
+        if self.version == 1:
+            metadata = json.loads(row[1])
+        else:
+            metadata = _decode_metadata(*row[1:])
+        metadata.update(self.extra_metadata)
+        return Document(page_content=row[0], metadata=metadata)
+
+    def search(self, search: str) -> str | Document:
+        if search in self._added:
+            return self._added[search]
+        doc = None if search in self._deleted else self._read(search)
+        if doc is None:
+            return f"ID {search} not found."
+        return doc
+
+    def add(self, texts: dict[str, Document]) -> None:
+        for doc_id, doc in texts.items():
+            self._deleted.discard(doc_id)
+            self._added[doc_id] = doc
+
+    def delete(self, ids: list) -> None:
+        for doc_id in ids:
+            self._added.pop(doc_id, None)
+            self._deleted.add(doc_id)
+
+    def load_ids(self) -> list[str]:
+        """
+        Return the docstore ids of the stored chunks in index order.
+        """
+        with self._lock:
+            return [row[0] for row in self._connection().execute("SELECT doc_id FROM chunks ORDER BY position")]
+
+
+class MergedDocstore(Docstore):
+    """
+    Docstore routing lookups to the docstores of several loaded indexes, so merged
+    multi-file stores stay lazy.
+    """
+    def __init__(self, docstores: list):
+        self.docstores = docstores
+
+    def search(self, search: str) -> str | Document:
+        for docstore in self.docstores:
+            doc = docstore.search(search)
+            if isinstance(doc, Document):
+                return doc
+        return f"ID {search} not found."
+
+    def close(self) -> None:
+        for docstore in self.docstores:
+            if isinstance(docstore, (SQLiteDocstore, MergedDocstore)):
+                docstore.close()
+
+
+def is_lazy_vector_store(db: FAISS) -> bool:
+    return isinstance(db.docstore, (SQLiteDocstore, MergedDocstore))
+
+
+def close_vector_store(db: FAISS) -> None:
+    """
+    Release the chunk store file handles of a lazily loaded store. The store stays
+    usable: its next read opens them again.
+    """
+    docstore = getattr(db, "docstore", None)
+    if isinstance(docstore, (SQLiteDocstore, MergedDocstore)):
+        docstore.close()
+
+
+def vector_store_docstore_path(folder_path: str | Path) -> str:
+    """
+    Return the docstore file of a saved index: the chunk store if present,
+    otherwise the legacy pickle.
+    """
+    chunk_store_path = os.path.join(folder_path, CHUNK_STORE_FILE)
+    if os.path.exists(chunk_store_path):
+        return chunk_store_path
+    return os.path.join(folder_path, PICKLE_DOCSTORE_FILE)
+
+
+def vector_store_exists(folder_path: str | Path) -> bool:
+    """
+    Check that a folder holds a saved index in either storage format.
+    """
+    return os.path.exists(os.path.join(folder_path, "index.faiss")) \
+        and os.path.exists(vector_store_docstore_path(folder_path))
+
+
+def _read_index(index_path: str, mmap: bool):
+    """
+    Read an index, memory-mapping its vectors when the faiss build supports it:
+    IVF inverted lists are mapped with IO_FLAG_MMAP, flat codes with IO_FLAG_MMAP_IFC
+    on faiss versions that provide it. Memory-mapped indexes must not be modified.
+    """
+    if mmap:
+        try:
+            io_flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            return faiss.read_index(index_path, io_flags)
+        except Exception as e:
+            # Not every index type and faiss build supports memory mapping
+            logger.info(f"Memory-mapped read of {index_path} not supported, reading it into memory: {e}")
+    return faiss.read_index(index_path)
+
+
+def _write_chunk_store(db: FAISS, tmp_path: str) -> None:
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    strings = {}
+    pages = {}
+    rows = []
+    for position in range(len(db.index_to_docstore_id)):
+        doc_id = db.index_to_docstore_id[position]
+        doc = db.docstore.search(doc_id)
+        rows.append((position, doc_id, doc.page_content, *_encode_metadata(doc.metadata, strings, pages)))
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE strings (id INTEGER PRIMARY KEY, value TEXT UNIQUE NOT NULL)")
+        conn.execute("CREATE TABLE pages (page INTEGER PRIMARY KEY, total_blocks_in_page INTEGER NOT NULL)")
+        conn.execute(
+            "CREATE TABLE chunks (position INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, "
+            "page_content TEXT NOT NULL, page INTEGER, source INTEGER, chunk_index INTEGER, "
+            "bbox BLOB, flags INTEGER NOT NULL, extra TEXT)"
+        )
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("format_version", str(CHUNK_STORE_VERSION)),
+            ("chunk_count", str(len(rows))),
+        ])
+        conn.executemany("INSERT INTO strings VALUES (?, ?)", [(string_id, value) for value, string_id in strings.items()])
+        conn.executemany("INSERT INTO pages VALUES (?, ?)", list(pages.items()))
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def save_chunk_store(db: FAISS, folder_path: str | Path) -> None:
+    """
+    Write the documents of a store, in index order, to a version 2 chunk store.
+
+    Args:
+        db: FAISS store to save
+        folder_path: Folder of the saved index
+    """
+    db_path = os.path.join(folder_path, CHUNK_STORE_FILE)
+    _write_chunk_store(db, db_path + ".tmp")
+    # Replace atomically, readers of the previous file keep their open handle
+    os.replace(db_path + ".tmp", db_path)
+
+
+def save_vector_store(db: FAISS, folder_path: str | Path) -> None:
+    """
+    Save a store as index.faiss plus the chunk store. A legacy index.pkl left in
+    the folder is removed so the two can never disagree.
+
+    Both files are written completely under temporary names first and only then
+    renamed into place, one right after the other: a failed save leaves the previous
+    pair untouched, and the folder only holds a mismatched pair for the instant
+    between the two renames.
+
+    Args:
+        db: FAISS store to save
+        folder_path: Destination folder
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    index_path = os.path.join(folder_path, "index.faiss")
+    chunk_store_path = os.path.join(folder_path, CHUNK_STORE_FILE)
+    try:
+        faiss.write_index(db.index, index_path + ".tmp")
+        _write_chunk_store(db, chunk_store_path + ".tmp")
+    except Exception:
+        for tmp_path in (index_path + ".tmp", chunk_store_path + ".tmp"):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    os.replace(chunk_store_path + ".tmp", chunk_store_path)
+    os.replace(index_path + ".tmp", index_path)
+
+    pkl_path = os.path.join(folder_path, PICKLE_DOCSTORE_FILE)
+    if os.path.exists(pkl_path):
+        os.remove(pkl_path)
+
+
+def load_vector_store(folder_path: str | Path, embeddings, extra_metadata: dict = None, mmap: bool = True) -> FAISS:
+    """
+    Load a saved store. With a chunk store present the index is memory-mapped when
+    possible and documents are read lazily; otherwise the legacy pickle is loaded.
+
+    Args:
+        folder_path: Folder of the saved index
+        embeddings: Embedding model used for queries
+        extra_metadata: Metadata stamped on every document of this store (e.g. file_index)
+        mmap: Whether to try memory-mapping index.faiss
+
+    Returns:
+        FAISS: The loaded store
+    """
+    chunk_store_path = os.path.join(folder_path, CHUNK_STORE_FILE)
+    if os.path.exists(chunk_store_path):
+        index = _read_index(os.path.join(folder_path, "index.faiss"), mmap)
+        docstore = SQLiteDocstore(chunk_store_path, extra_metadata)
+        index_to_docstore_id = dict(enumerate(docstore.load_ids()))
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+    logger.info(f"No chunk store in {folder_path}, loading the legacy pickle docstore")
+    db = FAISS.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+    if extra_metadata:
+        for doc in db.docstore._dict.values():
+            doc.metadata.update(extra_metadata)
+    return db
@@ -1,12 +1,169 @@
+import os
 import json
+import time
+import threading
 from pathlib import Path
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.config")
 
+CONFIG_PATH = Path(__file__).parent / 'config.json'
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict of the cached config. dict(frozen) gives a mutable shallow copy.
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("The config is shared and read-only, copy it with dict() to modify it")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """
+    Deep read-only copy of parsed JSON: dicts become FrozenDicts and lists tuples.
+    """
+    if isinstance(value, dict):
+        return FrozenDict({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """
+    Deep mutable copy of a frozen config, as json.load returns it.
+    """
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _derive_maps(config: FrozenDict) -> FrozenDict:
+    """
+    Maps built from the config by its callers, computed once per load.
+    """
+    return FrozenDict({
+        # Chunk index -> citation symbol, e.g. 0 -> "[<1>]"
+        "map_index_to_symbol": FrozenDict({index: symbol for symbol, index in config.get("map_symbol_to_index", {}).items()}),
+        # Language name -> ISO code, e.g. "Chinese" -> "zh"
+        "language_codes": FrozenDict({name: code for code, name in config.get("languages_short", {}).items()}),
+        "image_extensions": frozenset(config.get("image_extensions", ())),
+    })
+
+
+class _ConfigCache:
+    """
+    The parsed config.json, loaded once and reloaded when the file changes. The
+    file modification time is checked at most once per check_interval_seconds
+    (config_cache section), and never if reload_on_change is false.
+    """
+    def __init__(self, config_path: Path):
+        self.config_path = config_path
+        self._lock = threading.Lock()
+        self._config = None
+        self._maps = None
+        self._mtime = None
+        self._next_check = 0.0
+
+    def _load(self) -> None:
+        mtime = os.stat(self.config_path).st_mtime_ns
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = freeze(json.load(f))
+        if self._config is not None:
+            logger.info(f"Reloaded changed config from {self.config_path}")
+        self._config = config
+        self._maps = _derive_maps(config)
+        self._mtime = mtime
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        if self._config is not None and now < self._next_check:
+            return
+        with self._lock:
+            if self._config is None:
+                self._load()
+            else:
+                cache_config = self._config.get('config_cache', {})
+                if not cache_config.get('reload_on_change', True):
+                    self._next_check = float('inf')
+                    return
+                if now < self._next_check:
+                    return
+                try:
+                    changed = os.stat(self.config_path).st_mtime_ns != self._mtime
+                except OSError as e:
+                    logger.warning(f"Cannot check {self.config_path} for changes, keeping the loaded config: {e}")
+                    changed = False
+                if changed:
+                    try:
+                        self._load()
+                    except (OSError, ValueError) as e:
+                        # E.g. a half-written file: keep the last good config and retry later
+                        logger.error(f"Cannot reload {self.config_path}, keeping the loaded config: {e}")
+            self._next_check = now + float(self._config.get('config_cache', {}).get('check_interval_seconds', 1.0))
+
+    def config(self) -> FrozenDict:
+        self._check()
+        return self._config
+
+    def maps(self) -> FrozenDict:
+        self._check()
+        return self._maps
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._config = None
+            self._maps = None
+            self._next_check = 0.0
+
+
+_config_cache = _ConfigCache(CONFIG_PATH)
+
 
 def load_config():
-    """Load configuration from config.json"""
-    config_path = Path(__file__).parent / 'config.json'
-    with open(config_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
\ No newline at end of file
+    """
+    Load configuration from config.json.
+
+    Returns a mutable copy of the config, like parsing the file. Code that only
+    reads the config should use get_config(), which does not copy it.
+    """
+    return thaw(_config_cache.config())
+
+
+def get_config():
+    """
+    The parsed config.json, cached and shared by all callers.
+
+    The result is read-only (FrozenDict, lists as tuples), use dict() on a section
+    to get a modifiable copy.
+    """
+    return _config_cache.config()
+
+
+def reload_config():
+    """Drop the cached config so the next get_config() reads config.json again"""
+    _config_cache.invalidate()
+    return get_config()
+
+
+def get_map_index_to_symbol():
+    """Chunk index -> citation symbol, the reverse of map_symbol_to_index"""
+    return _config_cache.maps()["map_index_to_symbol"]
+
+
+def get_language_codes():
+    """Language name -> ISO code, the reverse of languages_short"""
+    return _config_cache.maps()["language_codes"]
+
+
+def get_image_extensions():
+    """The image extensions of the config as a frozenset"""
+    return _config_cache.maps()["image_extensions"]
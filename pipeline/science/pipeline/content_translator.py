@@ -26,7 +26,7 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain.output_parsers import OutputFixingParser
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config, get_language_codes
 from pipeline.science.pipeline.api_handler import ApiHandler
 
 
@@ -48,14 +48,10 @@ def get_translation_llm(para):
 def detect_language(text):
     """Detect language of the text"""
     # Load languages from config
-    config = load_config()
-    language_dict = config['languages']
-    language_options = list(language_dict.values())
-    language_short_dict = config['languages_short']
-    language_short_options = list(language_short_dict.keys())
+    language_short_dict = get_config()['languages_short']
 
     language = langid.classify(text)[0]
-    if language not in language_short_options:
+    if language not in language_short_dict:
         language = "English"
     else:
         language = language_short_dict[language]
@@ -120,7 +116,7 @@ def cleanup_numbered_markers(text):
         str: Text with numbered markers replaced with circled number symbols
     """
     # Map of numbers to circled number symbols
-    config = load_config()
+    config = get_config()
     circled_numbers = config["circled_numbers"]
     
     def replace_marker(match):
@@ -154,7 +150,7 @@ def translate_content_llm(content: str, target_lang: str, stream=False) -> str:
         return content
 
     # Load config and get LLM
-    config = load_config()
+    config = get_config()
     para = config['llm']
     llm = get_translation_llm(para)
     parser = StrOutputParser()
@@ -346,12 +342,8 @@ def translate_content(
     if language == target_lang:
         return content
 
-    # Load languages from config
-    config = load_config()
-    languages_short = config["languages_short"]
-    
-    # Create reverted map: language names to ISO codes
-    language_code_map = {v: k for k, v in languages_short.items()}
+    # Language names to ISO codes
+    language_code_map = get_language_codes()
     
     # If target_lang is a language name, convert to code
     if target_lang in language_code_map:
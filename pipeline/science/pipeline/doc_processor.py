@@ -1,6 +1,5 @@
 import os
 import io
-import hashlib
 import fitz
 import json
 import requests
@@ -8,7 +7,9 @@ import base64
 import time
 from datetime import datetime, UTC
 import asyncio
+import threading
 import numpy as np
+from collections import OrderedDict
 
 from dotenv import load_dotenv
 from typing import Tuple, Dict, List
@@ -17,13 +18,15 @@ from PIL import Image
 
 from langchain_community.document_loaders import PyMuPDFLoader
 
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config, get_image_extensions
 from pipeline.science.pipeline.images_understanding import (
     extract_image_context,
     upload_markdown_to_azure,
     upload_images_to_azure,
 )
-from pipeline.science.pipeline.utils import robust_search_for
+from pipeline.science.pipeline.utils import robust_search_for, generate_file_id, normalize_text
+from pipeline.science.pipeline.document_handle import get_document_handle
+from pipeline.science.pipeline.helper.marker_client import MarkerClient, convert_pdf_sync
 from pipeline.science.pipeline.session_manager import ChatSession
 import logging
 logger = logging.getLogger("tutorpipeline.science.doc_processor")
@@ -42,14 +45,94 @@ def extract_document_from_file(file_path):
     return document
 
 
+class ParsedDocument:
+    """
+    A PDF parsed at most once per process: the PyMuPDFLoader documents, the
+    fitz.Document and the raw and normalized text of each page, each computed
+    on first use and shared by all callers. doc and page() are the calling
+    thread's own fitz.Document, valid inside in_use() only, see DocumentHandle.
+    """
+    def __init__(self, document_handle):
+        self.document_handle = document_handle
+        self.file_id = document_handle.file_id
+        self._document = None
+        self._page_texts = {}
+        self._normalized_page_texts = {}
+        self._lock = threading.RLock()
+
+    @property
+    def doc(self) -> fitz.Document:
+        return self.document_handle.doc
+
+    @property
+    def document(self) -> list:
+        with self._lock:
+            if self._document is None:
+                self._document = extract_document_from_file(self.document_handle.file_path)
+            return self._document
+
+    @property
+    def page_count(self) -> int:
+        return self.document_handle.page_count
+
+    def page(self, page_num: int) -> fitz.Page:
+        return self.doc[page_num]
+
+    def in_use(self):
+        return self.document_handle.in_use()
+
+    def page_text(self, page_num: int) -> str:
+        page_text = self._page_texts.get(page_num)
+        if page_text is None:
+            with self.in_use():
+                page_text = self.doc[page_num].get_text()
+            with self._lock:
+                page_text = self._page_texts.setdefault(page_num, page_text)
+        return page_text
+
+    def normalized_page_text(self, page_num: int) -> str:
+        normalized_page_text = self._normalized_page_texts.get(page_num)
+        if normalized_page_text is None:
+            normalized_page_text = normalize_text(self.page_text(page_num))
+            with self._lock:
+                normalized_page_text = self._normalized_page_texts.setdefault(page_num, normalized_page_text)
+        return normalized_page_text
+
+
+_parsed_documents = OrderedDict()
+_parsed_documents_lock = threading.Lock()
+
+
+def get_parsed_document(file_path) -> ParsedDocument:
+    """
+    Return the parsed form of a PDF from a bounded per-process cache keyed by file id.
+
+    Args:
+        file_path: Path to the PDF file, or its DocumentHandle
+
+    Returns:
+        ParsedDocument: Shared by all callers until evicted. Its fitz documents belong
+        to the handle cache, which closes them once evicted and no longer in use.
+    """
+    document_handle = get_document_handle(file_path)
+    max_documents = get_config().get('parsed_document_cache', {}).get('max_documents', 8)
+    with _parsed_documents_lock:
+        parsed_document = _parsed_documents.get(document_handle.file_id)
+        if parsed_document is None:
+            parsed_document = ParsedDocument(document_handle)
+            _parsed_documents[document_handle.file_id] = parsed_document
+        _parsed_documents.move_to_end(document_handle.file_id)
+        while len(_parsed_documents) > max_documents:
+            _parsed_documents.popitem(last=False)
+    return parsed_document
+
+
 # Function to process the PDF file
 def process_pdf_file(file_path):
-    # Process the document
-    with open(file_path, 'rb') as file:
-        file_bytes = file.read()
-    document = extract_document_from_file(file_path)
-    doc = fitz.open(stream=io.BytesIO(file_bytes), filetype="pdf")
-    return document, doc
+    # Process the document, parsed once per process and shared. The fitz.Document is
+    # the caller's own: it is kept in the session and outlives the shared caches.
+    parsed_document = get_parsed_document(file_path)
+    return parsed_document.document, fitz.open(parsed_document.document_handle.file_path)
 
 
 # Function to save the file locally as a text file
@@ -60,11 +143,8 @@ def save_file_txt_locally(file_path, filename, embedding_folder, chat_session: C
     Always overwrite existing text file with markdown content when markdown file is available.
     """
     markdown_dir = os.path.join(embedding_folder, "markdown")
-    # Generate file_id using hashlib instead of the undefined generate_file_id function
-    with open(file_path, 'rb') as file:
-        file_bytes = file.read()
-        file_id = hashlib.md5(file_bytes).hexdigest()
-    
+    file_id = generate_file_id(file_path)
+
     md_path = os.path.join(markdown_dir, f"{file_id}.md")
     
     # Define folder structure
@@ -77,7 +157,7 @@ def save_file_txt_locally(file_path, filename, embedding_folder, chat_session: C
 
     # Generate a shorter filename using hash, and it should be unique and consistent for the same file
     base_name = os.path.splitext(filename)[0]
-    hashed_name = hashlib.md5(file_bytes).hexdigest()[:8]  # Use first 8 chars of hash
+    hashed_name = file_id[:8]  # Use first 8 chars of hash
     output_file_path = os.path.join(GraphRAG_embedding_input_folder, f"{hashed_name}.txt")
 
     try:
@@ -103,7 +183,7 @@ def save_file_txt_locally(file_path, filename, embedding_folder, chat_session: C
         # Only extract from PDF if markdown file doesn't exist and txt file doesn't exist
         elif not os.path.exists(output_file_path):
             # Extract text from the PDF using the provided utility function
-            document = extract_document_from_file(file_path)
+            document = extract_document_from_file(str(file_path))
 
             # Write the extracted text into a .txt file
             with open(output_file_path, "w", encoding="utf-8") as f:
@@ -231,10 +311,36 @@ def extract_pdf_content_to_markdown_via_api(
         OSError: If output directory cannot be created
         Exception: For API errors or processing failures
     """
+    file_path, output_dir, file_id = _prepare_marker_extraction(file_path, output_dir)
+    # Submit the file to API and poll until processing is complete
+    result = convert_pdf_sync(file_path)
+    return _save_marker_result(result, file_path, output_dir, file_id)
+
+
+async def aextract_pdf_content_to_markdown_via_api(
+    file_path: str | Path,
+    output_dir: str | Path,
+) -> Tuple[str, Dict[str, Image.Image], str]:
+    """
+    extract_pdf_content_to_markdown_via_api for async callers: the conversion is awaited
+    on the running event loop, and the result is saved in a worker thread.
+    """
+    file_path, output_dir, file_id = await asyncio.to_thread(_prepare_marker_extraction, file_path, output_dir)
+    async with MarkerClient() as marker_client:
+        result = await marker_client.convert(file_path)
+    return await asyncio.to_thread(_save_marker_result, result, file_path, output_dir, file_id)
+
+
+def _prepare_marker_extraction(file_path: str | Path, output_dir: str | Path) -> Tuple[Path, Path, str]:
+    """
+    Validate the input of a Marker API extraction and create its output directory.
+
+    Returns:
+        Tuple of the PDF path, the output directory and the file id
+    """
     # Load environment variables and validate input
     load_dotenv()
-    API_KEY = os.getenv("MARKER_API_KEY")
-    if not API_KEY:
+    if not os.getenv("MARKER_API_KEY"):
         raise ValueError("MARKER_API_KEY not found in environment variables")
 
     # Validate input PDF exists
@@ -243,58 +349,19 @@ def extract_pdf_content_to_markdown_via_api(
         raise FileNotFoundError(f"PDF file not found: {file_path}")
 
     # Generate hash ID for the file
-    with open(file_path, "rb") as f:
-        file_id = hashlib.md5(f.read()).hexdigest()
+    file_id = generate_file_id(file_path)
 
     # Create output directory
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    return file_path, output_dir, file_id
 
-    API_URL = "https://www.datalab.to/api/v1/marker"
-
-    # Submit the file to API
-    with open(file_path, "rb") as f:
-        form_data = {
-            "file": (str(file_path), f, "application/pdf"),
-            "langs": (None, "English"),
-            "force_ocr": (None, False),
-            "paginate": (None, False),
-            "output_format": (None, "markdown"),
-            "use_llm": (None, False),
-            "strip_existing_ocr": (None, False),
-            "disable_image_extraction": (None, False),
-        }
-        headers = {"X-Api-Key": API_KEY}
-        response = requests.post(API_URL, files=form_data, headers=headers)
-
-    # Check initial response
-    data = response.json()
-    if not data.get("success"):
-        raise Exception(f"API request failed: {data.get('error')}")
-
-    request_check_url = data.get("request_check_url")
-    logger.info("Submitted request. Polling for results...")
-
-    # Poll until processing is complete
-    max_polls = 300
-    poll_interval = 2
-    result = None
-
-    for i in range(max_polls):
-        time.sleep(poll_interval)
-        poll_response = requests.get(request_check_url, headers=headers)
-        result = poll_response.json()
-        status = result.get("status")
-        logger.info(f"Poll {i+1}: status = {status}")
-        if status == "complete":
-            break
-    else:
-        raise Exception("The request did not complete within the expected time.")
-
-    # Process and save results
-    if not result.get("success"):
-        raise Exception(f"Processing failed: {result.get('error')}")
 
+def _save_marker_result(result: dict, file_path: Path, output_dir: Path, file_id: str) -> Tuple[str, Dict[str, Image.Image], str]:
+    """
+    Save the markdown and images of a Marker API result, upload them to Azure Blob
+    Storage and extract the image context.
+    """
     # Save markdown content with hash ID
     markdown = result.get("markdown", "")
     md_path = output_dir / f"{file_id}.md"
@@ -337,7 +404,7 @@ def extract_pdf_content_to_markdown_via_api(
 
     # Extract image context
     try:
-        config = load_config()
+        config = get_config()
         chunk_size = config["embedding"]["chunk_size"]
         extract_image_context(output_dir, file_path=file_path)
     except Exception as e:
@@ -350,6 +417,7 @@ def extract_pdf_content_to_markdown_via_api(
 async def extract_pdf_content_to_markdown_via_api_streaming(
     file_path: str | Path,
     output_dir: str | Path,
+    process_images: bool = True,
 ):
     """
     Extract text and images from a PDF file using the Marker API and save them to the specified directory.
@@ -358,6 +426,8 @@ async def extract_pdf_content_to_markdown_via_api_streaming(
     Args:
         file_path: Path to the input PDF file
         output_dir: Directory where images and markdown will be saved
+        process_images: Upload the markdown and images and analyze the images before returning.
+            The ingestion pipeline passes False and runs these steps alongside embedding.
 
     Yields:
         Progress updates as strings or final result as tuple
@@ -365,13 +435,8 @@ async def extract_pdf_content_to_markdown_via_api_streaming(
     Returns:
         None - the final result is yielded as a tuple
     """
-    import aiohttp
-    
     # Load environment variables and validate input
     load_dotenv()
-    API_KEY = os.getenv("MARKER_API_KEY")
-    if not API_KEY:
-        raise ValueError("MARKER_API_KEY not found in environment variables")
 
     # Validate input PDF exists
     file_path = Path(file_path)
@@ -381,76 +446,34 @@ async def extract_pdf_content_to_markdown_via_api_streaming(
     # yield "Generating file ID..."
     logger.info("Generating file ID...")
     # Generate hash ID for the file
-    with open(file_path, "rb") as f:
-        file_id = hashlib.md5(f.read()).hexdigest()
+    file_id = generate_file_id(file_path)
 
     # Create output directory
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    API_URL = "https://www.datalab.to/api/v1/marker"
-
-    # yield f"\n\n**📑 PDF parsing progress: {progress_update}**"
-    yield "\n\n**📑 PDF parsing progress: Start parsing PDF to markdown ...**"
-    # Submit the file to API - use requests for initial upload since it handles multipart/form-data better
-    with open(file_path, "rb") as f:
-        form_data = {
-            "file": (str(file_path), f, "application/pdf"),
-            "langs": (None, "English"),
-            "force_ocr": (None, False),
-            "paginate": (None, False),
-            "output_format": (None, "markdown"),
-            "use_llm": (None, False),
-            "strip_existing_ocr": (None, False),
-            "disable_image_extraction": (None, False),
-        }
-        headers = {"X-Api-Key": API_KEY}
-        response = requests.post(API_URL, files=form_data, headers=headers)
-
-    # Check initial response
-    data = response.json()
-    if not data.get("success"):
-        raise Exception(f"API request failed: {data.get('error')}")
-
-    request_check_url = data.get("request_check_url")
-    logger.info("Submitted request. Polling for results...")
-    yield "\n\n**📑 PDF parsing progress: Polling for PDF parsing results ...**"
-
-    # Poll until processing is complete using aiohttp
-    max_polls = 300
-    poll_interval = 2
-    result = None
-
-    try:
-        async with aiohttp.ClientSession() as session:
-            for i in range(max_polls):
-                try:
-                    await asyncio.sleep(poll_interval)
-                    async with session.get(request_check_url, headers=headers) as poll_response:
-                        if poll_response.status != 200:
-                            error_text = await poll_response.text()
-                            logger.error(f"API polling error: Status {poll_response.status}, {error_text}")
-                            yield f"\n\n**📑 PDF parsing progress: Error during polling: Status {poll_response.status}**"
-                            continue
-                            
-                        result = await poll_response.json()
-                        status = result.get("status")
-                        progress = result.get("progress", 0)
-                        logger.info(f"Poll {i+1}: status = {status}, progress = {progress}%")
-                        # yield f"Processing: {status} - {progress}% complete"
-                        
-                        if status == "complete":
-                            break
-                except aiohttp.ClientError as e:
-                    logger.error(f"Network error during polling: {str(e)}")
-                    yield f"\n\n**📑 PDF parsing progress: Network error during polling: {str(e)}**"
-                    await asyncio.sleep(poll_interval * 2)  # Wait longer before retrying
-            else:
-                raise Exception("The request did not complete within the expected time.")
-    except Exception as e:
-        logger.exception(f"Unexpected error during polling: {str(e)}")
-        yield f"\n\n**📑 PDF parsing progress: Unexpected error during polling: {str(e)}**"
-        raise
+    # The session of the client is closed once the result is received
+    async with MarkerClient() as marker_client:
+        # yield f"\n\n**📑 PDF parsing progress: {progress_update}**"
+        yield "\n\n**📑 PDF parsing progress: Start parsing PDF to markdown ...**"
+        # Submit the file to API, streaming the upload from disk
+        request_check_url = await marker_client.submit(file_path)
+        logger.info("Submitted request. Polling for results...")
+        yield "\n\n**📑 PDF parsing progress: Polling for PDF parsing results ...**"
+
+        # Poll until processing is complete, quickly at first and then with backoff
+        result = None
+        try:
+            last_progress = None
+            async for result in marker_client.poll(request_check_url):
+                progress = result.get("progress")
+                if progress and progress != last_progress and result.get("status") != "complete":
+                    last_progress = progress
+                    yield f"\n\n**📑 PDF parsing progress: {progress}% ...**"
+        except Exception as e:
+            logger.exception(f"Unexpected error during polling: {str(e)}")
+            yield f"\n\n**📑 PDF parsing progress: Unexpected error during polling: {str(e)}**"
+            raise
 
     # Process and save results
     if not result.get("success"):
@@ -496,6 +519,11 @@ async def extract_pdf_content_to_markdown_via_api_streaming(
         logger.info("No images were returned with the result")
         yield "\n\n**📑 PDF parsing progress: No images were returned with the result**"
 
+    if not process_images:
+        logger.info("PDF extraction complete, images are left to the ingestion pipeline")
+        yield (str(md_path), saved_images, markdown)
+        return
+
     # Save markdown file and images to Azure Blob Storage
     try:
         # yield "Uploading markdown and images to Azure Blob Storage..."
@@ -511,7 +539,7 @@ async def extract_pdf_content_to_markdown_via_api_streaming(
     try:
         # yield "Extracting image context..."
         logger.info("Extracting image context...")
-        config = load_config()
+        config = get_config()
         chunk_size = config["embedding"]["chunk_size"]
         for chunk in extract_image_context(output_dir, file_path=file_path):
             yield chunk
@@ -564,8 +592,7 @@ def extract_pdf_content_to_markdown(
 
     try:
         # Generate hash ID for the file
-        with open(file_path, 'rb') as f:
-            file_id = hashlib.md5(f.read()).hexdigest()
+        file_id = generate_file_id(file_path)
 
         # Initialize converter and process PDF
         converter = PdfConverter(
@@ -609,7 +636,7 @@ def extract_pdf_content_to_markdown(
 
         # Extract image context
         try:
-            config = load_config()
+            config = get_config()
             chunk_size = config['embedding']['chunk_size']
             extract_image_context(output_dir, file_path=file_path)
         except Exception as e:
@@ -639,8 +666,7 @@ def clean_unused_images(image_dir: str | Path):
         logger.warning(f"Image directory not found: {image_dir}")
         return []
     
-    config = load_config()
-    image_extensions = config["image_extensions"]
+    image_extensions = get_image_extensions()
     deleted_images = []
     
     # Get all image files
@@ -695,6 +721,7 @@ def clean_unused_images(image_dir: str | Path):
 __all__ = [
     "mdDocumentProcessor",
     "extract_pdf_content_to_markdown_via_api",
+    "aextract_pdf_content_to_markdown_via_api",
     "extract_pdf_content_to_markdown",
     "extract_pdf_content_to_markdown_via_api_streaming",
     "clean_unused_images",
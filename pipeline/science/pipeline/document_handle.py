@@ -0,0 +1,401 @@
+import os
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz
+
+from pipeline.science.pipeline.config import get_config
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.document_handle")
+
+
+FILE_ID_SCHEMES = ("md5", "blake2b")
+# BLAKE2b ids carry a prefix so they can never be mistaken for a legacy md5 id
+BLAKE2B_ID_PREFIX = "b2_"
+
+
+class FileHashCache:
+    """
+    Persistent (path, size, mtime, scheme) -> file id cache, so files that did not
+    change since they were last seen are never hashed again, even across processes.
+
+    It also keeps the compatibility mapping from content hashes of the current id
+    scheme to the legacy md5 ids that existing folders and blobs are named after.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_ids ("
+            "path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, scheme TEXT NOT NULL, "
+            "file_id TEXT NOT NULL, PRIMARY KEY (path, size, mtime_ns, scheme))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_id_aliases (content_id TEXT PRIMARY KEY, file_id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, path: str, size: int, mtime_ns: int, scheme: str = "md5") -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM file_ids WHERE path = ? AND size = ? AND mtime_ns = ? AND scheme = ?",
+                (path, size, mtime_ns, scheme),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, path: str, size: int, mtime_ns: int, file_id: str, scheme: str = "md5") -> None:
+        with self._lock:
+            # Older versions of the same path can never match again
+            self._conn.execute("DELETE FROM file_ids WHERE path = ? AND scheme = ?", (path, scheme))
+            self._conn.execute(
+                "INSERT INTO file_ids (path, size, mtime_ns, scheme, file_id) VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, scheme, file_id),
+            )
+            self._conn.commit()
+
+    def get_alias(self, content_id: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM file_id_aliases WHERE content_id = ?", (content_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_alias(self, content_id: str, file_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_id_aliases (content_id, file_id) VALUES (?, ?)", (content_id, file_id)
+            )
+            self._conn.commit()
+
+
+class DocumentHandle:
+    """
+    One uploaded document: its file id (content hash), size, mtime, page count and
+    lazily opened fitz.Documents, computed once and passed through the pipeline.
+
+    A fitz.Document is not thread-safe, so every thread gets its own, opened on its
+    first access. These documents belong to the handle: use them inside in_use(), and
+    never pass them to another thread or keep them beyond it. A handle evicted from the
+    handle cache closes its documents once no caller is using them. Code that keeps a
+    document opens its own with fitz.open.
+
+    The handle is os.PathLike, so it can be given to code that expects a file path.
+    """
+    def __init__(self, file_path: str, file_id: str, size: int, mtime_ns: int):
+        self.file_path = file_path
+        self.file_id = file_id
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # Thread ident -> the fitz.Document opened by that thread
+        self._docs = {}
+        self._page_count = None
+        self._users = 0
+        self._evicted = False
+        self._lock = threading.Lock()
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+    @property
+    def doc(self) -> fitz.Document:
+        """
+        The parsed PDF of the calling thread, opened on its first access.
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            doc = self._docs.get(thread_id)
+        if doc is None or doc.is_closed:
+            doc = fitz.open(self.file_path)
+            with self._lock:
+                self._docs[thread_id] = doc
+        return doc
+
+    @property
+    def page_count(self) -> int:
+        if self._page_count is None:
+            with self.in_use():
+                self._page_count = self.doc.page_count
+        return self._page_count
+
+    @contextmanager
+    def in_use(self):
+        """
+        Keep the documents of the handle open, even if it is evicted meanwhile.
+        """
+        with self._lock:
+            self._users += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._users -= 1
+                close_now = self._evicted and self._users == 0
+            if close_now:
+                self.close()
+
+    def evict(self) -> None:
+        """
+        Called when the handle leaves the handle cache: its documents are closed as
+        soon as no caller is using them.
+        """
+        with self._lock:
+            self._evicted = True
+            close_now = self._users == 0
+        if close_now:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Close the documents of all threads; the next access opens a new one.
+        """
+        with self._lock:
+            docs = list(self._docs.values())
+            self._docs = {}
+        for doc in docs:
+            if not doc.is_closed:
+                doc.close()
+
+    def __fspath__(self) -> str:
+        return self.file_path
+
+    def __str__(self) -> str:
+        return self.file_path
+
+    def __repr__(self) -> str:
+        return f"DocumentHandle(file_path={self.file_path!r}, file_id={self.file_id!r}, size={self.size})"
+
+
+def get_file_id_config() -> dict:
+    file_id_config = get_config().get('file_id', {})
+    scheme = file_id_config.get('scheme', 'md5')
+    if scheme not in FILE_ID_SCHEMES:
+        logger.warning(f"Unknown file id scheme {scheme}, using md5")
+        scheme = 'md5'
+    return {
+        "scheme": scheme,
+        "hash_buffer_bytes": int(file_id_config.get('hash_buffer_bytes', 1 << 20)),
+        "legacy_md5_lookup": file_id_config.get('legacy_md5_lookup', True),
+    }
+
+
+def _new_hasher(scheme: str):
+    if scheme == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    return hashlib.md5()
+
+
+def _format_file_id(scheme: str, hexdigest: str) -> str:
+    if scheme == "blake2b":
+        return BLAKE2B_ID_PREFIX + hexdigest
+    return hexdigest
+
+
+def hash_file_digests(file_path: str, schemes: list[str], buffer_size: int = None) -> dict:
+    """
+    Hash a file with one or more id schemes in a single streaming pass, reading
+    into one fixed-size buffer instead of loading the whole file.
+
+    Args:
+        file_path: Path to the file
+        schemes: Id schemes from FILE_ID_SCHEMES
+        buffer_size: Read buffer size in bytes, from config by default
+
+    Returns:
+        dict: Mapping from scheme to file id
+    """
+    buffer_size = buffer_size or get_file_id_config()["hash_buffer_bytes"]
+    hashers = {scheme: _new_hasher(scheme) for scheme in dict.fromkeys(schemes)}
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as file:
+        while True:
+            n = file.readinto(buffer)
+            if not n:
+                break
+            for hasher in hashers.values():
+                hasher.update(view[:n])
+    return {scheme: _format_file_id(scheme, hasher.hexdigest()) for scheme, hasher in hashers.items()}
+
+
+def hash_file(file_path: str, scheme: str = None) -> str:
+    """
+    Compute the file id of a document with the given (default: configured) id scheme.
+    """
+    scheme = scheme or get_file_id_config()["scheme"]
+    return hash_file_digests(file_path, [scheme])[scheme]
+
+
+def legacy_folders_exist(legacy_file_id: str) -> bool:
+    """
+    Whether a local embedded_content folder was already built under a legacy md5 file id.
+    """
+    path_prefix = os.getenv("FILE_PATH_PREFIX") or ""
+    embedded_content_path = os.path.join(path_prefix, 'embedded_content')
+    return any(
+        os.path.isdir(folder) for folder in (
+            os.path.join(embedded_content_path, legacy_file_id),
+            os.path.join(embedded_content_path, 'lite_mode', legacy_file_id),
+        )
+    )
+
+
+def legacy_blobs_exist(legacy_file_id: str) -> bool:
+    """
+    Whether an index zip was already uploaded to Azure Blob Storage under a legacy md5 file id.
+    """
+    try:
+        from pipeline.science.pipeline.helper.azure_blob import AzureBlobHelper
+        azure_blob = AzureBlobHelper()
+        for blob_name in (f"graphrag_index/{legacy_file_id}.zip", f"vectorrag_index/{legacy_file_id}.zip"):
+            blob_client = azure_blob.blob_service_client.get_blob_client(container="knowhiztutorrag", blob=blob_name)
+            if blob_client.exists():
+                return True
+    except Exception as e:
+        logger.info(f"Could not check Azure Blob Storage for legacy file id {legacy_file_id}: {e}")
+    return False
+
+
+def _compute_file_id(path: str, hash_cache: FileHashCache | None) -> str:
+    """
+    Hash a file under the configured id scheme. With a non-md5 scheme, a file that
+    already has local folders under its md5 id keeps using that id, so existing
+    embeddings and indexes still resolve; the decision is stored per content hash,
+    and the md5 is only computed for content that has no decision yet.
+
+    Indexes that only exist in Azure Blob Storage are not looked up here, see
+    register_legacy_file_id.
+    """
+    file_id_config = get_file_id_config()
+    scheme = file_id_config["scheme"]
+    if scheme == "md5":
+        return hash_file_digests(path, ["md5"], file_id_config["hash_buffer_bytes"])["md5"]
+    content_id = hash_file_digests(path, [scheme], file_id_config["hash_buffer_bytes"])[scheme]
+    if not file_id_config["legacy_md5_lookup"]:
+        return content_id
+
+    file_id = hash_cache.get_alias(content_id) if hash_cache is not None else None
+    if file_id is None:
+        legacy_file_id = hash_file_digests(path, ["md5"], file_id_config["hash_buffer_bytes"])["md5"]
+        file_id = legacy_file_id if legacy_folders_exist(legacy_file_id) else content_id
+        if hash_cache is not None:
+            hash_cache.put_alias(content_id, file_id)
+        if file_id != content_id:
+            logger.info(f"Using legacy file id {file_id} for {path} (content id {content_id})")
+    return file_id
+
+
+def register_legacy_file_id(file_path, check_blobs: bool = True) -> str:
+    """
+    Decide the file id of a document's content from its local folders and, unlike
+    get_document_handle, from Azure Blob Storage, and store the decision in the hash
+    cache. Run it on existing uploads before switching to a non-md5 id scheme, so
+    documents whose indexes only exist as blobs keep their md5 id.
+
+    Args:
+        file_path: Path to the document
+        check_blobs: Also look for index zips in Azure Blob Storage
+
+    Returns:
+        str: The file id the document will be served under
+    """
+    file_id_config = get_file_id_config()
+    scheme = "blake2b" if file_id_config["scheme"] == "md5" else file_id_config["scheme"]
+    digests = hash_file_digests(os.fspath(file_path), [scheme, "md5"], file_id_config["hash_buffer_bytes"])
+    legacy_file_id = digests["md5"]
+    if legacy_folders_exist(legacy_file_id) or (check_blobs and legacy_blobs_exist(legacy_file_id)):
+        file_id = legacy_file_id
+    else:
+        file_id = digests[scheme]
+    hash_cache = _get_file_hash_cache()
+    if hash_cache is not None:
+        hash_cache.put_alias(digests[scheme], file_id)
+    return file_id
+
+
+_hash_caches = {}
+_handles = OrderedDict()
+_handles_lock = threading.Lock()
+
+
+def get_file_hash_cache_path() -> str:
+    cache_config = get_config().get('file_hash_cache', {})
+    path_prefix = os.getenv("FILE_PATH_PREFIX") or ""
+    return os.path.join(path_prefix, 'embedded_content', cache_config.get('file_name', 'file_hash_cache.sqlite'))
+
+
+def _get_file_hash_cache() -> FileHashCache | None:
+    cache_config = get_config().get('file_hash_cache', {})
+    if not cache_config.get('enabled', True):
+        return None
+    db_path = get_file_hash_cache_path()
+    with _handles_lock:
+        if db_path not in _hash_caches:
+            try:
+                _hash_caches[db_path] = FileHashCache(db_path)
+            except Exception as e:
+                logger.exception(f"Failed to open file hash cache at {db_path}, hashing without cache: {e}")
+                _hash_caches[db_path] = None
+        return _hash_caches[db_path]
+
+
+def get_document_handle(file_path) -> DocumentHandle:
+    """
+    Return the DocumentHandle of a file, hashing it only if neither this process
+    nor the persistent hash cache has seen the same (path, size, mtime) before.
+    Hashing streams the file; use aget_document_handle from async code.
+
+    Args:
+        file_path: Path to the document, or an existing DocumentHandle
+
+    Returns:
+        DocumentHandle: Shared by all callers while the file is unchanged
+    """
+    if isinstance(file_path, DocumentHandle):
+        return file_path
+    path = os.path.abspath(os.fspath(file_path))
+    stat = os.stat(path)
+    scheme = get_file_id_config()["scheme"]
+    key = (path, stat.st_size, stat.st_mtime_ns, scheme)
+    with _handles_lock:
+        handle = _handles.get(key)
+        if handle is not None:
+            _handles.move_to_end(key)
+            return handle
+
+    hash_cache = _get_file_hash_cache()
+    file_id = hash_cache.get(*key) if hash_cache is not None else None
+    if file_id is None:
+        file_id = _compute_file_id(path, hash_cache)
+        if hash_cache is not None:
+            hash_cache.put(path, stat.st_size, stat.st_mtime_ns, file_id, scheme=scheme)
+    handle = DocumentHandle(os.fspath(file_path), file_id, stat.st_size, stat.st_mtime_ns)
+
+    max_handles = get_config().get('file_hash_cache', {}).get('max_open_handles', 32)
+    with _handles_lock:
+        # Another caller may have built the same handle meanwhile
+        handle = _handles.setdefault(key, handle)
+        _handles.move_to_end(key)
+        evicted = []
+        while len(_handles) > max_handles:
+            evicted.append(_handles.popitem(last=False)[1])
+    for evicted_handle in evicted:
+        evicted_handle.evict()
+    return handle
+
+
+async def aget_document_handle(file_path) -> DocumentHandle:
+    """
+    get_document_handle run in a worker thread, so hashing a large upload does not
+    block the event loop.
+    """
+    return await asyncio.to_thread(get_document_handle, file_path)
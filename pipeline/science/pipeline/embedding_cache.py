@@ -0,0 +1,290 @@
+import os
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import numpy as np
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+from pipeline.science.pipeline.config import get_config
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.embedding_cache")
+
+
+class EmbeddingCacheStore:
+    """
+    Disk-backed, content-addressed store of embedding vectors.
+
+    Vectors are stored as float32 blobs in SQLite, keyed by the hash of the
+    embedding model name and the text, so identical chunks are shared across
+    documents, modes and processes. The token count of the text is stored with
+    its vector for the tokens-saved statistic.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, tokens INTEGER)"
+        )
+        # Caches written before token counts were stored get the column, NULL for their rows
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "tokens" not in columns:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN tokens INTEGER")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_entries(self, keys: list[str]) -> dict:
+        """
+        Fetch the cached vectors and token counts for the given keys.
+
+        Args:
+            keys: Cache keys built with make_key
+
+        Returns:
+            dict: Mapping from key to (vector, tokens) for the keys that are cached;
+            tokens is None for rows stored before token counts were kept
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, tokens FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector, tokens in rows:
+                    found[key] = (np.frombuffer(vector, dtype=np.float32).tolist(), tokens)
+        return found
+
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        Fetch the cached vectors for the given keys.
+
+        Args:
+            keys: Cache keys built with make_key
+
+        Returns:
+            dict: Mapping from key to vector (list of floats) for the keys that are cached
+        """
+        return {key: vector for key, (vector, _) in self.get_entries(keys).items()}
+
+    def put_many(self, model_name: str, items: list[tuple[str, list[float], int]]) -> None:
+        """
+        Store vectors for the given keys.
+
+        Args:
+            model_name: Embedding model the vectors were produced with
+            items: List of (key, vector, tokens) triples
+        """
+        rows = [
+            (key, model_name, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), tokens)
+            for key, vector, tokens in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, tokens) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def set_tokens(self, items: list[tuple[str, int]]) -> None:
+        """
+        Fill in the token counts of rows stored before token counts were kept.
+
+        Args:
+            items: List of (key, tokens) pairs
+        """
+        with self._lock:
+            self._conn.executemany("UPDATE embeddings SET tokens = ? WHERE key = ?",
+                                   [(tokens, key) for key, tokens in items])
+            self._conn.commit()
+
+
+class EmbeddingCacheStats:
+    """
+    Hit/miss counters of one embedding model, shared by all of its cache wrappers.
+    """
+    def __init__(self, model_name: str):
+        self.model = model_name
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def record(self, hits: int, misses: int, tokens_saved: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.tokens_saved += tokens_saved
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "tokens_saved": self.tokens_saved,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from the content-addressed cache
+    and only sends unseen texts to the wrapped model.
+
+    Queries are read through the cache but only stored when cache_queries is set:
+    user questions rarely repeat, and would otherwise grow the cache with every turn.
+    """
+    def __init__(self, embeddings: Embeddings, store: EmbeddingCacheStore, model_name: str = None, stats: EmbeddingCacheStats = None, cache_queries: bool = False):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.stats = stats or EmbeddingCacheStats(self.model)
+        self.cache_queries = cache_queries
+
+    def _lookup(self, texts: list[str]):
+        """
+        Look the texts up in the store and record the hits and misses. Blocking: the
+        async methods run it in a worker thread.
+        """
+        keys = [EmbeddingCacheStore.make_key(self.model, text) for text in texts]
+        entries = self.store.get_entries(keys)
+        cached = {key: vector for key, (vector, _) in entries.items()}
+        # Embed every missing text once, even if it appears several times in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self._record(texts, keys, entries)
+        return keys, cached, missing
+
+    def _record(self, texts: list[str], keys: list[str], entries: dict) -> None:
+        # Count every distinct text once: a text repeated in the batch is embedded once
+        unique_texts = dict(zip(keys, texts))
+        hits = [key for key in unique_texts if key in entries]
+        # Rows from older caches have no token count yet: count them once and store it
+        counted = [(key, count_embedding_tokens(unique_texts[key])) for key in hits if entries[key][1] is None]
+        if counted:
+            self.store.set_tokens(counted)
+        token_counts = dict(counted)
+        self.stats.record(
+            hits=len(hits),
+            misses=len(unique_texts) - len(hits),
+            tokens_saved=sum(token_counts.get(key, entries[key][1]) for key in hits),
+        )
+
+    def _store(self, missing: dict, vectors: list) -> None:
+        """
+        Store the newly embedded vectors with the token counts of their texts. Blocking:
+        the async methods run it in a worker thread.
+        """
+        if missing:
+            self.store.put_many(self.model, [
+                (key, vector, count_embedding_tokens(text))
+                for (key, text), vector in zip(missing.items(), vectors)
+            ])
+
+    @staticmethod
+    def _assemble(keys: list[str], cached: dict, missing: dict, vectors: list) -> list[list[float]]:
+        resolved = dict(cached)
+        resolved.update(zip(missing.keys(), vectors))
+        return [resolved[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, cached, missing = self._lookup(texts)
+        vectors = self.embeddings.embed_documents(list(missing.values())) if missing else []
+        self._store(missing, vectors)
+        return self._assemble(keys, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.cache_queries:
+            return self.embed_documents([text])[0]
+        keys, cached, _ = self._lookup([text])
+        if keys[0] in cached:
+            return cached[keys[0]]
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        # SQLite I/O stays off the event loop
+        keys, cached, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await self.embeddings.aembed_documents(list(missing.values())) if missing else []
+        await asyncio.to_thread(self._store, missing, vectors)
+        return self._assemble(keys, cached, missing, vectors)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        if self.cache_queries:
+            return (await self.aembed_documents([text]))[0]
+        keys, cached, _ = await asyncio.to_thread(self._lookup, [text])
+        if keys[0] in cached:
+            return cached[keys[0]]
+        return await self.embeddings.aembed_query(text)
+
+
+_encoder = None
+_stores = {}
+_stores_lock = threading.Lock()
+_stats = {}
+
+
+def count_embedding_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the cl100k_base encoding used by the embedding models.
+    """
+    global _encoder
+    if _encoder is None:
+        _encoder = tiktoken.get_encoding("cl100k_base")
+    return len(_encoder.encode(text, disallowed_special=()))
+
+
+def get_embedding_cache_path() -> str:
+    cache_config = get_config().get('embedding_cache', {})
+    path_prefix = os.getenv("FILE_PATH_PREFIX") or ""
+    return os.path.join(path_prefix, 'embedded_content', cache_config.get('file_name', 'embedding_cache.sqlite'))
+
+
+def wrap_with_embedding_cache(embeddings: Embeddings) -> Embeddings:
+    """
+    Wrap an embedding model with the persistent embedding cache if it is enabled.
+
+    Args:
+        embeddings: Embedding model instance, e.g. from ApiHandler.embedding_models
+
+    Returns:
+        Embeddings: A CachedEmbeddings wrapper sharing one store per cache file and
+        one set of counters per model name, or the model itself when the cache is disabled
+    """
+    cache_config = get_config().get('embedding_cache', {})
+    if not cache_config.get('enabled', True) or isinstance(embeddings, CachedEmbeddings):
+        return embeddings
+    db_path = get_embedding_cache_path()
+    model_name = getattr(embeddings, "model", None) or type(embeddings).__name__
+    with _stores_lock:
+        try:
+            if db_path not in _stores:
+                _stores[db_path] = EmbeddingCacheStore(db_path)
+        except Exception as e:
+            logger.exception(f"Failed to open embedding cache at {db_path}, using the model without cache: {e}")
+            return embeddings
+        stats = _stats.setdefault(model_name, EmbeddingCacheStats(model_name))
+        return CachedEmbeddings(embeddings, _stores[db_path], model_name, stats,
+                                cache_queries=cache_config.get('cache_queries', False))
+
+
+def get_embedding_cache_stats() -> dict:
+    """
+    Return hit rate and tokens saved for every cached embedding model in this process.
+    """
+    return {model_name: stats.to_dict() for model_name, stats in _stats.items()}
@@ -1,14 +1,38 @@
 import os
+import json
 import time
+import uuid
+import random
+import asyncio
+import threading
+from collections import OrderedDict
 from pathlib import Path
+import faiss
+import numpy as np
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.api_handler import ApiHandler
-# from pipeline.science.pipeline.utils import create_searchable_chunks
+from pipeline.science.pipeline.chunk_store import (
+    CHUNK_STORE_FILE,
+    PICKLE_DOCSTORE_FILE,
+    MergedDocstore,
+    close_vector_store,
+    is_lazy_vector_store,
+    load_vector_store,
+    save_vector_store,
+    vector_store_exists,
+)
+from pipeline.science.pipeline.embedding_cache import (
+    wrap_with_embedding_cache,
+    count_embedding_tokens,
+)
+from pipeline.science.pipeline.pdf_chunker import create_searchable_chunks
+from pipeline.science.pipeline.token_counter import with_token_counts
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.embeddings")
@@ -19,87 +43,11 @@ load_dotenv()
 SKIP_MARKER_API = True if os.getenv("ENVIRONMENT") == "local" else False
 logger.info(f"SKIP_MARKER_API: {SKIP_MARKER_API}")
 
-# Define create_searchable_chunks here to avoid circular import
-def create_searchable_chunks(doc, chunk_size: int) -> list:
-    """
-    Create searchable chunks from a PDF document.
-
-    Args:
-        doc: The PDF document object
-        chunk_size: Maximum size of each text chunk in characters
-
-    Returns:
-        list: A list of Document objects containing the chunks
-    """
-    chunks = []
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text_blocks = []
-
-        # Get text blocks that can be found via search
-        for block in page.get_text("blocks"):
-            text = block[4]  # The text content is at index 4
-            # Clean up the text
-            clean_text = text.strip()
-
-            if clean_text:
-                # Remove hyphenation at line breaks
-                clean_text = clean_text.replace("-\n", "")
-                # Normalize spaces
-                clean_text = " ".join(clean_text.split())
-                # Replace special characters that might cause issues
-                replacements = {
-                    # "−": "-",  # Replace unicode minus with hyphen
-                    # "⊥": "_|_",  # Replace perpendicular symbol
-                    # "≫": ">>",  # Replace much greater than
-                    # "%": "",     # Remove percentage signs that might be formatting artifacts
-                    # "→": "->",   # Replace arrow
-                }
-                for old, new in replacements.items():
-                    clean_text = clean_text.replace(old, new)
-
-                # Split into chunks of specified size
-                while len(clean_text) > 0:
-                    # Find a good break point near chunk_size characters
-                    end_pos = min(chunk_size, len(clean_text))
-                    if end_pos < len(clean_text):
-                        # Try to break at a sentence or period
-                        last_period = clean_text[:end_pos].rfind(". ")
-                        if last_period > 0:
-                            end_pos = last_period + 1
-                        else:
-                            # If no period, try to break at a space
-                            last_space = clean_text[:end_pos].rfind(" ")
-                            if last_space > 0:
-                                end_pos = last_space
-
-                    chunk_text = clean_text[:end_pos].strip()
-                    if chunk_text:
-                        text_blocks.append(Document(
-                            page_content=chunk_text,
-                            metadata={
-                                "page": page_num,
-                                "source": f"page_{page_num + 1}",
-                                "chunk_index": len(text_blocks),  # Track position within page
-                                "block_bbox": block[:4],  # Store block bounding box coordinates
-                                "total_blocks_in_page": len(page.get_text("blocks")),
-                                "relative_position": len(text_blocks) / len(page.get_text("blocks"))
-                            }
-                        ))
-                    clean_text = clean_text[end_pos:].strip()
-
-        chunks.extend(text_blocks)
-
-    # Sort chunks by page number and then by chunk index
-    chunks.sort(key=lambda x: (
-        x.metadata.get("page", 0),
-        x.metadata.get("chunk_index", 0)
-    ))
-
-    return chunks
-
-
 def get_embedding_models(embedding_type, para):
+    """
+    Get the embedding model for the given type, wrapped with the persistent
+    content-addressed embedding cache so repeated text is never re-embedded.
+    """
     para = para
     api = ApiHandler(para)
     embedding_model_default = api.embedding_models['default']['instance']
@@ -108,30 +56,322 @@ def get_embedding_models(embedding_type, para):
     # embedding_model_lite = api.embedding_models['lite']['instance']
     # embedding_model_small = api.embedding_models['small']['instance']
     if embedding_type == 'default':
-        return embedding_model_default
+        return wrap_with_embedding_cache(embedding_model_default)
     elif embedding_type == 'lite':
-        return embedding_model_lite
+        return wrap_with_embedding_cache(embedding_model_lite)
     elif embedding_type == 'small':
-        return embedding_model_small
+        return wrap_with_embedding_cache(embedding_model_small)
+    else:
+        return wrap_with_embedding_cache(embedding_model_default)
+
+
+def create_faiss_index(dim: int, vectors_count: int, index_config: dict = None):
+    """
+    Create an empty FAISS index of the type selected in the vector_index config.
+
+    Args:
+        dim: Dimension of the vectors
+        vectors_count: Number of vectors that will be added, used to size IVF-PQ
+        index_config: Optional override of config['vector_index']
+
+    Returns:
+        faiss.Index: IndexFlatL2, IndexHNSWFlat or IndexIVFPQ. Small stores, below
+        min_vectors or too small to train IVF-PQ, always get an exact flat index.
+    """
+    index_config = index_config or get_config().get('vector_index', {})
+    index_type = index_config.get('type', 'flat')
+    if index_type == 'flat' or vectors_count < index_config.get('min_vectors', 0):
+        return faiss.IndexFlatL2(dim)
+    if index_type == 'hnsw':
+        hnsw_config = index_config.get('hnsw', {})
+        index = faiss.IndexHNSWFlat(dim, hnsw_config.get('M', 32))
+        index.hnsw.efConstruction = hnsw_config.get('ef_construction', 200)
+        index.hnsw.efSearch = hnsw_config.get('ef_search', 128)
+        return index
+    if index_type == 'ivfpq':
+        ivfpq_config = index_config.get('ivfpq', {})
+        # Aim for roughly 39 training points per centroid, as recommended by faiss
+        nlist = min(ivfpq_config.get('nlist', 1024), vectors_count // 39)
+        m = ivfpq_config.get('m', 16)
+        nbits = ivfpq_config.get('nbits', 8)
+        if nlist < 1 or vectors_count < 2 ** nbits or dim % m != 0:
+            logger.info(f"Not enough vectors ({vectors_count}) or incompatible dimension ({dim}) for IVF-PQ, using a flat index")
+            return faiss.IndexFlatL2(dim)
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits)
+        index.nprobe = min(ivfpq_config.get('nprobe', 32), nlist)
+        return index
+    logger.warning(f"Unknown vector index type {index_type}, using a flat index")
+    return faiss.IndexFlatL2(dim)
+
+
+def apply_index_search_params(index, index_config: dict = None) -> None:
+    """
+    Apply the search-time parameters (efSearch, nprobe) of the vector_index config
+    to a loaded index, so they can be tuned without rebuilding stores.
+    """
+    index_config = index_config or get_config().get('vector_index', {})
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = index_config.get('hnsw', {}).get('ef_search', index.hnsw.efSearch)
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(index_config.get('ivfpq', {}).get('nprobe', index.nprobe), index.nlist)
+
+
+def reconstruct_vectors(index) -> np.ndarray:
+    """
+    Return all vectors stored in an index as an (ntotal, d) float32 array.
+    Vectors read back from IVF-PQ are the compressed approximations.
+    """
+    if isinstance(index, faiss.IndexShards):
+        return np.vstack([reconstruct_vectors(faiss.downcast_index(index.at(i))) for i in range(index.count())])
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.NoMap:
+        # The direct map is only needed for reading back; drop it again so it does
+        # not get in the way of later remove_ids calls on the same index
+        index.make_direct_map()
+        try:
+            return index.reconstruct_n(0, index.ntotal)
+        finally:
+            index.set_direct_map_type(faiss.DirectMap.NoMap)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def faiss_from_vectors(texts: list[str], vectors, embeddings, metadatas: list[dict] = None, ids: list[str] = None, index_config: dict = None) -> FAISS:
+    """
+    Assemble a LangChain FAISS store from precomputed vectors using the index type
+    selected in the vector_index config.
+
+    Args:
+        texts: Page contents of the documents
+        vectors: One vector per text
+        embeddings: Embedding model, kept as the store's query embedding function
+        metadatas: Optional metadata per text, stored with the token count of the text
+        ids: Optional docstore id per text
+        index_config: Optional override of config['vector_index']
+
+    Returns:
+        FAISS: The vector store
+    """
+    metadatas = with_token_counts(texts, metadatas)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = create_faiss_index(vectors.shape[1], len(texts), index_config)
+    if not index.is_trained:
+        index.train(vectors)
+    db = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    db.add_embeddings(
+        text_embeddings=list(zip(texts, vectors.tolist())),
+        metadatas=metadatas,
+        ids=ids,
+    )
+    return db
+
+
+def build_faiss_from_documents(documents: list[Document], embeddings) -> FAISS:
+    """
+    Synchronous counterpart of abuild_faiss_from_documents for non-async callers.
+    """
+    texts = [doc.page_content for doc in documents]
+    return faiss_from_vectors(
+        texts,
+        embeddings.embed_documents(texts),
+        embeddings,
+        metadatas=[doc.metadata for doc in documents],
+        ids=[doc.metadata.get("chunk_id") or str(uuid.uuid4()) for doc in documents],
+    )
+
+
+def iter_vector_store_documents(db: FAISS):
+    """
+    Yield every document of a store in index order, without running a search.
+    """
+    for position in range(len(db.index_to_docstore_id)):
+        yield db.docstore.search(db.index_to_docstore_id[position])
+
+
+def _split_into_token_batches(texts: list[str], max_batch_tokens: int, max_batch_size: int) -> list[list[int]]:
+    """
+    Split texts into batches of indices bounded by a token budget and a batch size.
+
+    Args:
+        texts: Texts to embed
+        max_batch_tokens: Maximum total tokens in one request
+        max_batch_size: Maximum number of texts in one request
+
+    Returns:
+        list: Batches of indices into texts, in order
+    """
+    batches = []
+    current_batch = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        text_tokens = count_embedding_tokens(text)
+        if current_batch and (current_tokens + text_tokens > max_batch_tokens or len(current_batch) >= max_batch_size):
+            batches.append(current_batch)
+            current_batch = []
+            current_tokens = 0
+        current_batch.append(i)
+        current_tokens += text_tokens
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+def _is_rate_limit_error(e: Exception) -> bool:
+    if getattr(e, "status_code", None) == 429:
+        return True
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def _retry_after_seconds(e: Exception):
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def aembed_texts_batched(texts: list[str], embeddings) -> list[list[float]]:
+    """
+    Embed texts in token-bounded batches sent with bounded concurrency.
+    Batches hitting the rate limit (HTTP 429) are retried with exponential backoff,
+    honoring the Retry-After header when the endpoint provides one.
+
+    Args:
+        texts: Texts to embed
+        embeddings: Embedding model instance
+
+    Returns:
+        list: One vector per text, in the same order as texts
+    """
+    embedding_config = get_config()['embedding']
+    max_batch_tokens = embedding_config.get('batch_max_tokens', 100000)
+    max_batch_size = embedding_config.get('batch_max_size', 1000)
+    max_concurrency = embedding_config.get('max_concurrency', 4)
+    max_retries = embedding_config.get('max_retries', 6)
+
+    batches = _split_into_token_batches(texts, max_batch_tokens, max_batch_size)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    vectors = [None] * len(texts)
+
+    async def embed_batch(batch_number: int, batch: list[int]):
+        batch_texts = [texts[i] for i in batch]
+        for attempt in range(max_retries + 1):
+            async with semaphore:
+                try:
+                    batch_vectors = await embeddings.aembed_documents(batch_texts)
+                    break
+                except Exception as e:
+                    if not _is_rate_limit_error(e) or attempt == max_retries:
+                        raise
+                    delay = _retry_after_seconds(e) or min(60, 2 ** attempt) + random.uniform(0, 1)
+                    logger.info(f"Embedding batch {batch_number + 1}/{len(batches)} rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            # Sleep outside the semaphore so other batches can use the slot
+            await asyncio.sleep(delay)
+        for i, vector in zip(batch, batch_vectors):
+            vectors[i] = vector
+
+    await asyncio.gather(*(embed_batch(batch_number, batch) for batch_number, batch in enumerate(batches)))
+    logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches with concurrency {max_concurrency}")
+    return vectors
+
+
+async def aembed_unique_texts(texts: list[str], embeddings, vector_map: dict) -> dict:
+    """
+    Embed every text that is not in vector_map yet, once, and record its vector there.
+
+    Args:
+        texts: Texts to embed, duplicates allowed
+        embeddings: Embedding model instance
+        vector_map: Mapping from text to vector shared across index builds
+
+    Returns:
+        dict: The updated vector_map
+    """
+    missing = [text for text in dict.fromkeys(texts) if text not in vector_map]
+    if missing:
+        vectors = await aembed_texts_batched(missing, embeddings)
+        vector_map.update(zip(missing, vectors))
+    logger.info(f"Embedding pass: {len(texts)} texts, {len(missing)} newly embedded, {len(texts) - len(missing)} reused")
+    return vector_map
+
+
+async def abuild_faiss_from_documents(documents: list[Document], embeddings, vector_map: dict = None) -> FAISS:
+    """
+    Build a FAISS index from documents using concurrent batched embedding.
+
+    Args:
+        documents: Documents to index
+        embeddings: Embedding model instance, kept as the store's query embedding function
+        vector_map: Optional mapping from text to vector shared with other index builds
+            of the same ingestion, so each unique text is embedded only once
+
+    Returns:
+        FAISS: The vector store assembled from the returned vectors
+    """
+    texts = [doc.page_content for doc in documents]
+    if vector_map is None:
+        vectors = await aembed_texts_batched(texts, embeddings)
     else:
-        return embedding_model_default
+        await aembed_unique_texts(texts, embeddings, vector_map)
+        vectors = [vector_map[text] for text in texts]
+    # Token counting and index training are CPU-bound, keep them off the event loop
+    return await asyncio.to_thread(
+        faiss_from_vectors,
+        texts,
+        vectors,
+        embeddings,
+        metadatas=[doc.metadata for doc in documents],
+        # Documents with a stable chunk_id (image contexts) keep it as their docstore id
+        # so they can be replaced in place later
+        ids=[doc.metadata.get("chunk_id") or str(uuid.uuid4()) for doc in documents],
+    )
+
+
+def split_markdown_documents(md_document: str, chunk_size: int = 2000, chunk_overlap: int = 50) -> list[Document]:
+    """
+    Split a markdown document into the chunks stored in the markdown index.
+
+    Args:
+        md_document: Markdown document
+        chunk_size: Maximum size of each chunk in characters
+        chunk_overlap: Overlap between consecutive chunks in characters
+
+    Returns:
+        list: Documents with source "markdown"
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    return [
+        Document(page_content=chunk.replace('<|endoftext|>', ''), metadata={"source": "markdown"})
+        for chunk in text_splitter.split_text(md_document)
+    ]
 
 
 # Create markdown embeddings
-def create_markdown_embeddings(md_document: str, output_dir: str | Path, chunk_size: int = 2000, chunk_overlap: int = 50):
+async def create_markdown_embeddings(md_document: str, output_dir: str | Path, chunk_size: int = 2000, chunk_overlap: int = 50, vector_map: dict = None):
     """
     Create markdown embeddings from a markdown document and save them to the specified directory.
 
     Args:
         md_document: Markdown document
         output_dir: Directory where embeddings will be saved
+        vector_map: Optional mapping from text to vector shared with the other indexes
+            built during the same ingestion
 
     Returns:
         None
     """
     # Load the markdown file
     # Create and save markdown embeddings
-    config = load_config()
+    config = get_config()
     para = config['llm']
     embeddings = get_embedding_models('default', para)
 
@@ -141,21 +381,14 @@ def create_markdown_embeddings(md_document: str, output_dir: str | Path, chunk_s
         os.makedirs(output_dir, exist_ok=True)
 
         # Split markdown content into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-        )
-        markdown_texts = [
-            Document(page_content=chunk.replace('<|endoftext|>', ''), metadata={"source": "markdown"})
-            for chunk in text_splitter.split_text(md_document)
-        ]
+        markdown_texts = split_markdown_documents(md_document, chunk_size, chunk_overlap)
 
         for text in markdown_texts:
             logger.info(f"markdown text after text splitter: {text}")
 
         # Create and save markdown embeddings
-        db_markdown = FAISS.from_documents(markdown_texts, embeddings)
-        db_markdown.save_local(output_dir)
+        db_markdown = await abuild_faiss_from_documents(markdown_texts, embeddings, vector_map=vector_map)
+        save_vector_store(db_markdown, output_dir)
         logger.info(f"Saved {len(markdown_texts)} markdown chunks to {output_dir}")
     else:
         logger.info("No markdown content available to create markdown embeddings")
@@ -165,15 +398,13 @@ async def generate_LiteRAG_embedding(_doc, file_path, embedding_folder):
     """
     Generate LiteRAG embeddings for the document
     """
-    config = load_config()
+    config = get_config()
     para = config['llm']
     # file_id = generate_file_id(file_path)
     lite_embedding_folder = os.path.join(embedding_folder, 'lite_embedding')
     # Check if all necessary files exist to load the embeddings
-    faiss_path = os.path.join(lite_embedding_folder, "index.faiss")
-    pkl_path = os.path.join(lite_embedding_folder, "index.pkl")
     embeddings = get_embedding_models('lite', para)
-    if os.path.exists(faiss_path) and os.path.exists(pkl_path):
+    if vector_store_exists(lite_embedding_folder):
         # Try to load existing txt file in graphrag_embedding folder
         logger.info("LiteRAG embedding already exists. We can load existing embeddings...")
     else:
@@ -191,38 +422,405 @@ async def generate_LiteRAG_embedding(_doc, file_path, embedding_folder):
         # yield f"\n\n**Average page length: {int(average_page_length)}**"
         logger.info(f"Chunk size: {chunk_size}")
         # yield f"\n\n**Chunk size: {int(chunk_size)}**"
-        texts = create_searchable_chunks(_doc, chunk_size)
-        db = FAISS.from_documents(texts, embeddings)
-        db.save_local(lite_embedding_folder)
+        # Chunked in a worker thread, which opens its own fitz.Document
+        texts = await asyncio.to_thread(create_searchable_chunks, file_path, chunk_size)
+        db = await abuild_faiss_from_documents(texts, embeddings)
+        save_vector_store(db, lite_embedding_folder)
+
+
+def image_context_chunk_id(file_id: str, image_name: str, context_index: int) -> str:
+    """
+    Return the stable id of one image-context chunk, used as its docstore id.
+    """
+    return f"{file_id}_{image_name}_{context_index}"
+
+
+def update_image_context_embeddings(embedding_folder: str | Path, image_names: list[str] = None, embedding_type: str = 'default') -> dict:
+    """
+    Append or replace the image-context documents of a saved page index in place,
+    keyed by their chunk_id, instead of rebuilding the whole index.
+
+    Only contexts whose text changed are embedded, in a single embedding call; a
+    context re-added with unchanged text reuses its stored vector. The same vectors
+    are used to find the best matching page chunk, so the page assignment follows
+    the rule used at ingestion (distance below 1.0, otherwise page 0).
+
+    Args:
+        embedding_folder: Folder holding the saved page index and markdown/image_context.json
+        image_names: Images whose contexts changed, or None to diff every image
+        embedding_type: Embedding model used by the index
+
+    Returns:
+        dict: Counts of added, replaced, removed and unchanged image-context chunks
+    """
+    image_context_path = os.path.join(embedding_folder, "markdown", "image_context.json")
+    with open(image_context_path, "r") as f:
+        image_context = json.load(f)
+
+    config = get_config()
+    para = config['llm']
+    embeddings = get_embedding_models(embedding_type, para)
+    # Load into memory (no mmap) since the index is modified and saved again
+    db = load_vector_store(embedding_folder, embeddings, mmap=False)
+    apply_index_search_params(db.index)
+    file_id = os.path.basename(os.path.normpath(str(embedding_folder)))
+    target_images = set(image_context.keys()) if image_names is None else set(image_names)
+
+    # Current image-context documents of the target images, by docstore id
+    existing = {}
+    for doc_id in db.index_to_docstore_id.values():
+        doc = db.docstore.search(doc_id)
+        if doc.metadata.get("source") in target_images:
+            existing[doc_id] = doc
+    wanted = {}
+    for image in target_images:
+        for i, context in enumerate(image_context.get(image, [])):
+            wanted[image_context_chunk_id(file_id, image, i)] = (image, i, context)
+
+    unchanged_ids = {
+        chunk_id for chunk_id, (_, _, context) in wanted.items()
+        if chunk_id in existing and existing[chunk_id].page_content == context
+    }
+    # Legacy indexes built before chunk ids were used have random ids for image
+    # documents; those are dropped and re-added under their chunk_id.
+    ids_to_delete = [doc_id for doc_id in existing if doc_id not in unchanged_ids]
+    chunks_to_add = [(chunk_id, wanted[chunk_id]) for chunk_id in wanted if chunk_id not in unchanged_ids]
+
+    # Contexts re-added with the same text (e.g. under their chunk_id in place of a
+    # legacy random id) keep the vector already stored in the index
+    deleted_ids_by_text = {existing[doc_id].page_content: doc_id for doc_id in ids_to_delete}
+    stored_vectors = {}
+    if any(context in deleted_ids_by_text for _, (_, _, context) in chunks_to_add):
+        index_vectors = reconstruct_vectors(db.index)
+        positions = {doc_id: position for position, doc_id in db.index_to_docstore_id.items()}
+        for _, (_, _, context) in chunks_to_add:
+            if context in deleted_ids_by_text:
+                stored_vectors[context] = index_vectors[positions[deleted_ids_by_text[context]]].tolist()
+
+    if ids_to_delete:
+        _delete_from_vector_store(db, ids_to_delete)
+
+    if chunks_to_add:
+        texts = [context for _, (_, _, context) in chunks_to_add]
+        texts_to_embed = [text for text in dict.fromkeys(texts) if text not in stored_vectors]
+        if texts_to_embed:
+            stored_vectors.update(zip(texts_to_embed, embeddings.embed_documents(texts_to_embed)))
+        vectors = [stored_vectors[text] for text in texts]
+        metadatas = []
+        for (chunk_id, (image, i, _)), vector in zip(chunks_to_add, vectors):
+            # Match against page chunks only, never against other image contexts
+            similar_chunks = db.similarity_search_with_score_by_vector(
+                vector, k=1, filter=lambda metadata: metadata.get("source") not in image_context
+            )
+            if similar_chunks:
+                best_match_chunk, score = similar_chunks[0]
+                best_match_page = best_match_chunk.metadata.get("page", 0) if score < 1.0 else 0
+            else:
+                best_match_page = 0
+            metadatas.append({"source": image, "page": best_match_page, "chunk_id": chunk_id})
+        db.add_embeddings(
+            text_embeddings=list(zip(texts, vectors)),
+            metadatas=with_token_counts(texts, metadatas),
+            ids=[chunk_id for chunk_id, _ in chunks_to_add],
+        )
+
+    if ids_to_delete or chunks_to_add:
+        save_vector_store(db, embedding_folder)
+        # The cached stores of the folder are outdated, free their memory now
+        get_vector_store_cache().invalidate(embedding_folder)
+
+    replaced = len([chunk_id for chunk_id, _ in chunks_to_add if chunk_id in existing])
+    result = {
+        "added": len(chunks_to_add) - replaced,
+        "replaced": replaced,
+        "removed": len(ids_to_delete) - replaced,
+        "unchanged": len(unchanged_ids),
+    }
+    logger.info(f"Updated image-context embeddings in {embedding_folder}: {result}")
+    return result
+
+
+def _rebuild_vector_store(db: FAISS, keep_ids: list[str], extra_stores: list = ()) -> FAISS:
+    """
+    Rebuild a store from the vectors already held by its index (and optional extra
+    stores), for index types that do not support in-place removal or merging.
+    """
+    texts, vectors, metadatas, ids = [], [], [], []
+    for store in [db, *extra_stores]:
+        store_vectors = reconstruct_vectors(store.index)
+        for position, doc_id in store.index_to_docstore_id.items():
+            if store is db and doc_id not in keep_ids:
+                continue
+            doc = store.docstore.search(doc_id)
+            texts.append(doc.page_content)
+            vectors.append(store_vectors[position])
+            metadatas.append(doc.metadata)
+            ids.append(doc_id)
+    return faiss_from_vectors(texts, vectors, db.embedding_function, metadatas=metadatas, ids=ids)
+
+
+def _delete_from_vector_store(db: FAISS, ids: list[str]) -> None:
+    """
+    Delete documents from a store in place. Only flat indexes are removed from
+    directly: HNSW does not support removal, and IVF indexes keep the original ids of
+    the remaining vectors while LangChain renumbers index_to_docstore_id to 0..n-1,
+    so every other index is rebuilt from its stored vectors.
+
+    A store served by load_embeddings is shared through the vector store cache, so
+    it is dropped from the cache before it is modified.
+    """
+    get_vector_store_cache().invalidate(db=db)
+    if not isinstance(db.index, faiss.IndexFlat):
+        ids = set(ids)
+        keep_ids = set(doc_id for doc_id in db.index_to_docstore_id.values() if doc_id not in ids)
+        rebuilt = _rebuild_vector_store(db, keep_ids)
+        db.index, db.docstore, db.index_to_docstore_id = rebuilt.index, rebuilt.docstore, rebuilt.index_to_docstore_id
+    else:
+        db.delete(ids)
+
+
+def _merge_vector_stores(db_list: list) -> FAISS:
+    """
+    Merge loaded FAISS stores into the first one, reusing the stored vectors.
+
+    Args:
+        db_list: FAISS stores loaded from disk, in file_index order
+
+    Returns:
+        FAISS: The first store with the vectors and documents of the others appended
+    """
+    db_merged = db_list[0]
+    if len(db_list) > 1 and any(is_lazy_vector_store(db) for db in db_list):
+        # Keep lazily loaded (possibly memory-mapped) indexes as shards instead of
+        # copying their vectors; ids are numbered successively across shards so the
+        # merged index_to_docstore_id lines up with the shard order.
+        index = faiss.IndexShards(db_merged.index.d, False, True)
+        index_to_docstore_id = {}
+        for db in db_list:
+            index.add_shard(db.index)
+            offset = len(index_to_docstore_id)
+            for position, doc_id in db.index_to_docstore_id.items():
+                index_to_docstore_id[offset + position] = doc_id
+        return FAISS(
+            embedding_function=db_merged.embedding_function,
+            index=index,
+            docstore=MergedDocstore([db.docstore for db in db_list]),
+            index_to_docstore_id=index_to_docstore_id,
+        )
+    if len(db_list) > 1 and not all(isinstance(db.index, faiss.IndexFlat) for db in db_list):
+        # ANN indexes trained separately cannot be merged directly; rebuild one index
+        # of the configured type from the vectors they already store.
+        keep_ids = set(db_merged.index_to_docstore_id.values())
+        return _rebuild_vector_store(db_merged, keep_ids, db_list[1:])
+    for db in db_list[1:]:
+        # merge_from appends the raw vectors of the other index and its docstore
+        # entries, so no chunk has to be sent back to the embedding endpoint.
+        db_merged.merge_from(db)
+    return db_merged
+
+
+class VectorStoreCache:
+    """
+    Process-wide LRU cache of loaded vector stores with a byte budget.
+
+    Entries are keyed by the embedding folder list, the embedding type and the
+    modification times of the index files, so a rebuilt index is never served stale.
+    A cached store is shared by every caller: code that modifies a store must load
+    its own copy, and invalidates the entries of the folder after saving it. Stores
+    leaving the cache release their chunk store handles, which a caller still
+    holding one reopens on its next read.
+    """
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, db, size_bytes: int) -> None:
+        evicted = []
+        with self._lock:
+            if size_bytes > self.max_bytes:
+                logger.info(f"Vector store of {size_bytes} bytes exceeds the cache budget, not caching it")
+                return
+            if key in self._entries:
+                replaced_db, replaced_bytes = self._entries.pop(key)
+                self.current_bytes -= replaced_bytes
+                if replaced_db is not db:
+                    evicted.append(replaced_db)
+            self._entries[key] = (db, size_bytes)
+            self.current_bytes += size_bytes
+            while self._entries and (self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (evicted_db, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+                evicted.append(evicted_db)
+        for evicted_db in evicted:
+            close_vector_store(evicted_db)
+
+    def invalidate(self, embedding_folder: str | Path = None, db: FAISS = None) -> int:
+        """
+        Drop the entries that include embedding_folder, or that hold the store db.
+
+        Returns:
+            int: Number of entries dropped
+        """
+        folder = os.path.abspath(str(embedding_folder)) if embedding_folder is not None else None
+        with self._lock:
+            stale_keys = [
+                key for key, (cached_db, _) in self._entries.items()
+                if cached_db is db or any(cached_folder == folder for cached_folder, _ in key[1])
+            ]
+            stale_dbs = []
+            for key in stale_keys:
+                stale_db, stale_bytes = self._entries.pop(key)
+                self.current_bytes -= stale_bytes
+                stale_dbs.append(stale_db)
+        for stale_db in stale_dbs:
+            close_vector_store(stale_db)
+        return len(stale_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            dbs = [db for db, _ in self._entries.values()]
+            self._entries.clear()
+            self.current_bytes = 0
+        for db in dbs:
+            close_vector_store(db)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_vector_store_cache = None
+_vector_store_cache_lock = threading.Lock()
+
+
+def get_vector_store_cache() -> VectorStoreCache:
+    """
+    Return the process-wide vector store cache, creating it from config on first use.
+    """
+    global _vector_store_cache
+    with _vector_store_cache_lock:
+        if _vector_store_cache is None:
+            cache_config = get_config().get('vector_store_cache', {})
+            _vector_store_cache = VectorStoreCache(
+                max_bytes=cache_config.get('max_bytes', 1024 ** 3),
+                max_entries=cache_config.get('max_entries', 32),
+            )
+        return _vector_store_cache
+
+
+def get_vector_store_cache_stats() -> dict:
+    """
+    Return the hit/miss/eviction counters of the vector store cache.
+    """
+    return get_vector_store_cache().stats()
+
+
+def _index_files_signature(embedding_folder: str | Path) -> tuple:
+    """
+    Return the modification times and sizes of the index files in a folder.
+    """
+    signature = []
+    for file_name in ("index.faiss", PICKLE_DOCSTORE_FILE, CHUNK_STORE_FILE):
+        try:
+            stat = os.stat(os.path.join(embedding_folder, file_name))
+            signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((file_name, None, None))
+    return tuple(signature)
+
+
+def _vector_store_cache_key(embedding_folder_list: list[str | Path], embedding_type: str) -> tuple:
+    return (
+        embedding_type,
+        tuple(
+            (os.path.abspath(str(embedding_folder)), _index_files_signature(embedding_folder))
+            for embedding_folder in embedding_folder_list
+        ),
+    )
+
+
+def _estimate_vector_store_bytes(db: FAISS, embedding_folder_list: list[str | Path]) -> int:
+    """
+    Estimate the memory held by a loaded store: raw float32 vectors plus the docstore,
+    approximated by the size of the pickled docstore on disk. Lazy docstores only
+    hold their ids in memory.
+    """
+    size_bytes = db.index.ntotal * db.index.d * 4
+    if is_lazy_vector_store(db):
+        return size_bytes + 64 * len(db.index_to_docstore_id)
+    for embedding_folder in embedding_folder_list:
+        pkl_path = os.path.join(embedding_folder, PICKLE_DOCSTORE_FILE)
+        if os.path.exists(pkl_path):
+            size_bytes += os.path.getsize(pkl_path)
+    return size_bytes
 
 
 def load_embeddings(embedding_folder_list: list[str | Path], embedding_type: str = 'default'):
     """
     Load embeddings from the specified folder.
     Adds a file_index metadata field to each document indicating which folder it came from.
+
+    The saved vectors in index.faiss are reused as they are: each folder is loaded,
+    its documents are stamped with file_index, and the indexes are merged without
+    calling the embedding model. Folders saved with a chunk store are opened lazily:
+    the index is memory-mapped when possible and only the documents hit by a search
+    are read. Loaded stores are kept in a process-wide LRU cache so follow-up
+    questions on the same documents reuse the hot index.
     """
-    config = load_config()
+    cache = get_vector_store_cache()
+    cache_key = _vector_store_cache_key(embedding_folder_list, embedding_type)
+    db_cached = cache.get(cache_key)
+    if db_cached is not None:
+        logger.info(f"Vector store cache hit for {len(embedding_folder_list)} folder(s): {cache.stats()}")
+        return db_cached
+
+    config = get_config()
     para = config['llm']
     embeddings = get_embedding_models(embedding_type, para)
-    
+
     # Load each database separately and add file_index to metadata
-    all_docs = []
+    db_list = []
     for i, embedding_folder in enumerate(embedding_folder_list):
-        db = FAISS.load_local(embedding_folder, embeddings, allow_dangerous_deserialization=True)
-        # Get the documents and add file_index to their metadata
-        docs = db.docstore._dict.values()
-        for doc in docs:
-            doc.metadata["file_index"] = i
-            all_docs.append(doc)
-    
-    # Create a new database with all the documents that have updated metadata
-    db_merged = FAISS.from_documents(all_docs, embeddings)
-    
+        # Documents are stamped with file_index in place (pickle) or on read (chunk store)
+        # so the stored vectors stay aligned with them
+        db = load_vector_store(embedding_folder, embeddings, extra_metadata={"file_index": i})
+        apply_index_search_params(db.index)
+        db_list.append(db)
+
+    db_merged = _merge_vector_stores(db_list)
+
     # Log the first 5 chunks for testing
-    logger.info(f"Total chunks in merged database: {len(all_docs)}")
-    for i, doc in enumerate(all_docs[:5]):
+    all_docs = [db_merged.docstore.search(doc_id) for doc_id in list(db_merged.index_to_docstore_id.values())[:5]]
+    logger.info(f"Total chunks in merged database: {db_merged.index.ntotal}")
+    for i, doc in enumerate(all_docs):
         logger.info(f"Chunk {i+1} - Content preview: {doc.page_content[:50]}...")
         logger.info(f"Chunk {i+1} - Metadata: {doc.metadata}")
         logger.info(f"Chunk {i+1} - From embedding folder index: {doc.metadata['file_index']} (corresponds to {embedding_folder_list[doc.metadata['file_index']]})")
-    
-    return db_merged
\ No newline at end of file
+
+    cache.put(cache_key, db_merged, _estimate_vector_store_bytes(db_merged, embedding_folder_list))
+    logger.info(f"Vector store cache miss for {len(embedding_folder_list)} folder(s): {cache.stats()}")
+    return db_merged
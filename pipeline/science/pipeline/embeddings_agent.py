@@ -1,25 +1,34 @@
 import os
 import json
 import time
+import asyncio
 import fitz
 from typing import Dict
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.utils import (
     create_searchable_chunks,
     format_time_tracking,
-    generate_file_id,
 )
+from pipeline.science.pipeline.document_handle import get_document_handle
+from pipeline.science.pipeline.pdf_chunker import aextract_searchable_page_texts
+from pipeline.science.pipeline.ingestion_pipeline import (
+    get_ingestion_pipeline_config,
+    process_images_pipeline,
+    stream_messages,
+    run_in_thread,
+)
+from pipeline.science.pipeline.page_text_index import build_page_text_index
 from pipeline.science.pipeline.images_understanding import initialize_image_files
 from pipeline.science.pipeline.embeddings_graphrag import generate_GraphRAG_embedding
 from pipeline.science.pipeline.session_manager import ChatMode, ChatSession
-from pipeline.science.pipeline.get_doc_summary import generate_document_summary
+from pipeline.science.pipeline.get_doc_summary import generate_document_summary, summary_needs_embeddings
 from pipeline.science.pipeline.doc_processor import (
     mdDocumentProcessor,
-    extract_pdf_content_to_markdown_via_api,
+    aextract_pdf_content_to_markdown_via_api,
     extract_pdf_content_to_markdown,
     extract_pdf_content_to_markdown_via_api_streaming,
     save_file_txt_locally,
@@ -28,7 +37,13 @@ from pipeline.science.pipeline.embeddings import (
     get_embedding_models,
     create_markdown_embeddings,
     generate_LiteRAG_embedding,
+    abuild_faiss_from_documents,
+    aembed_unique_texts,
+    split_markdown_documents,
+    image_context_chunk_id,
 )
+from pipeline.science.pipeline.embedding_cache import get_embedding_cache_stats
+from pipeline.science.pipeline.chunk_store import save_vector_store, vector_store_exists
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.embeddings_agent")
@@ -40,6 +55,76 @@ SKIP_MARKER_API = True if os.getenv("ENVIRONMENT") == "local" else False
 logger.info(f"SKIP_MARKER_API: {SKIP_MARKER_API}")
 
 
+async def _chunk_and_embed(file_path, _document, texts, md_document, embeddings, shared_vectors, time_tracking):
+    """
+    Ingestion stage for the text: split the document into searchable chunks (unless the
+    fallback extraction already produced page texts) and embed every unique page chunk
+    and markdown chunk once into shared_vectors.
+
+    Returns:
+        list: The page chunks
+    """
+    if texts is None:
+        # Split the document into chunks when markdown extraction succeeded
+        create_searchable_chunks_start_time = time.time()
+        average_page_length = sum(len(doc.page_content) for doc in _document) / len(_document)
+        chunk_size = int(average_page_length // 3)
+        logger.info(f"Average page length: {average_page_length}")
+        logger.info(f"Chunk size: {chunk_size}")
+        # The worker thread opens its own fitz.Document
+        texts = await asyncio.to_thread(create_searchable_chunks, file_path, chunk_size)
+        logger.info(f"length of document chunks generated for get_response_source: {len(texts)}")
+        time_tracking['create_searchable_chunks'] = time.time() - create_searchable_chunks_start_time
+
+    # Embed every unique page chunk and markdown chunk once. The temporary index for
+    # image-context matching, the page index and the markdown index are all built
+    # from these shared vectors, so only image-context text is embedded later.
+    embedding_pass_start_time = time.time()
+    try:
+        markdown_texts = await asyncio.to_thread(split_markdown_documents, md_document, chunk_size=2000, chunk_overlap=50) \
+            if md_document else []
+        await aembed_unique_texts([doc.page_content for doc in texts + markdown_texts], embeddings, shared_vectors)
+    except Exception as e:
+        logger.exception(f"Error in the shared embedding pass, indexes will embed their own texts: {e}")
+    time_tracking['vectorrag_shared_embedding_pass'] = time.time() - embedding_pass_start_time
+    return texts
+
+
+async def _generate_document_summary(file_path, embedding_folder, md_document, time_tracking):
+    """
+    Ingestion stage for the document summary. The summary calls blocking LLM APIs, so it
+    runs on its own event loop in a worker thread.
+
+    Returns:
+        Exception | None: The error if the summary could not be generated
+    """
+    generate_document_summary_start_time = time.time()
+    try:
+        logger.info("Generating document summary ...")
+        # By default, use the markdown document to generate the summary
+        await run_in_thread(generate_document_summary, file_path, embedding_folder, md_document)
+        return None
+    except Exception as e:
+        logger.exception(f"Error generating document summary: {e}")
+        return e
+    finally:
+        time_tracking['generate_document_summary'] = time.time() - generate_document_summary_start_time
+
+
+async def _build_page_text_index(document_handle, embedding_folder, time_tracking):
+    """
+    Ingestion stage for source annotation: build and save the page text index of the
+    document in a worker thread. Errors are logged, answers then build it on first use.
+    """
+    page_text_index_start_time = time.time()
+    try:
+        await asyncio.to_thread(build_page_text_index, document_handle, embedding_folder)
+    except Exception as e:
+        logger.exception(f"Error building page text index for {document_handle.file_id}: {e}")
+    finally:
+        time_tracking['page_text_index'] = time.time() - page_text_index_start_time
+
+
 async def embeddings_agent(
     _mode: ChatMode,
     _document: list,
@@ -59,8 +144,17 @@ async def embeddings_agent(
     Generate and save document summary using the texts we created
     """
     # yield "\n\n**Loading embeddings ...**"
-    file_id = generate_file_id(file_path)
+    # file_path may already be a DocumentHandle; either way the file is hashed at most once
+    document_handle = get_document_handle(file_path)
+    file_id = document_handle.file_id
+    file_path = document_handle.file_path
     logger.info(f"Current mode: {_mode}")
+
+    # Normalize the page texts once for source annotation (locate_chunk_in_pdf), in a worker
+    # thread while the document is extracted and chunked. LITE answers build it on first use.
+    page_text_index_task = None
+    if _mode in (ChatMode.BASIC, ChatMode.ADVANCED):
+        page_text_index_task = asyncio.create_task(_build_page_text_index(document_handle, embedding_folder, time_tracking))
     if _mode == ChatMode.ADVANCED:
         # GraphRAG is implemented in the following code
         logger.info("Mode: ChatMode.ADVANCED. Generating GraphRAG embeddings...")
@@ -88,7 +182,7 @@ async def embeddings_agent(
     else:
         raise ValueError("Invalid mode")
 
-    config = load_config()
+    config = get_config()
     para = config['llm']
     embeddings = get_embedding_models('default', para)
     embeddings_small = get_embedding_models('small', para)
@@ -98,20 +192,18 @@ async def embeddings_agent(
     # Define the default filenames used by FAISS when saving
     # yield "\n\n**Initializing file paths ...**"
     logger.info("Initializing file paths ...")
-    faiss_path = os.path.join(embedding_folder, "index.faiss")
-    pkl_path = os.path.join(embedding_folder, "index.pkl")
     document_summary_path = os.path.join(embedding_folder, "documents_summary.txt")
-
     markdown_embedding_folder = os.path.join(embedding_folder, "markdown")
-    markdown_faiss_path = os.path.join(markdown_embedding_folder, "index.faiss")
-    markdown_pkl_path = os.path.join(markdown_embedding_folder, "index.pkl")
 
     # Check if all necessary files exist to load the embeddings
-    if os.path.exists(faiss_path) and os.path.exists(pkl_path) and os.path.exists(document_summary_path) \
-        and os.path.exists(markdown_faiss_path) and os.path.exists(markdown_pkl_path):
+    if vector_store_exists(embedding_folder) and os.path.exists(document_summary_path) \
+        and vector_store_exists(markdown_embedding_folder):
         logger.info("Embedding already exists. We can load existing embeddings...")
         yield "\n\n**🔍 Embedding already exists. We can load existing embeddings...**"
     else:
+        pipeline_config = get_ingestion_pipeline_config()
+        # Whether the image upload and analysis are left to the ingestion pipeline
+        images_pending = False
         try:
             yield "\n\n**📝 Extracting markdown from the document ...**"
             markdown_extraction_start_time = time.time()
@@ -132,7 +224,9 @@ async def embeddings_agent(
                 
                 try:
                     # Use the async streaming version that both yields progress and returns the final result
-                    async for progress_update in extract_pdf_content_to_markdown_via_api_streaming(file_path, markdown_dir):
+                    async for progress_update in extract_pdf_content_to_markdown_via_api_streaming(
+                        file_path, markdown_dir, process_images=not pipeline_config["enabled"]
+                    ):
                         if isinstance(progress_update, tuple) and len(progress_update) == 3:
                             # This is the final return value - a tuple with (md_path, saved_images, md_document)
                             md_path, saved_images, md_document = progress_update
@@ -153,6 +247,7 @@ async def embeddings_agent(
                     
                     logger.info(f"PDF extraction completed. MD document length: {len(md_document) if md_document else 0}")
                     doc_processor.set_md_document(md_document)
+                    images_pending = pipeline_config["enabled"]
                     yield "\n\n**📝 PDF extraction completed successfully ...**"
                 except Exception as e:
                     logger.exception(f"Error during streaming PDF extraction: {str(e)}")
@@ -160,7 +255,7 @@ async def embeddings_agent(
                     
                     # Fall back to non-streaming version
                     yield "\n\n**❌ Falling back to standard extraction method...**"
-                    md_path, saved_images, md_document = extract_pdf_content_to_markdown_via_api(file_path, markdown_dir)
+                    md_path, saved_images, md_document = await aextract_pdf_content_to_markdown_via_api(file_path, markdown_dir)
                     doc_processor.set_md_document(md_document)
                     yield "\n\n**📝 PDF extraction completed with fallback method**"
             else:
@@ -179,21 +274,14 @@ async def embeddings_agent(
             yield "\n\n**🔍 Using PDF loader to extract searchable content as save as markdown file...**"
             doc_processor.set_md_document("")
             texts = []
-            # Process each page in the PDF document
-            for page_num in range(len(_doc)):
-                yield f"\n\n**📑 Processing page {page_num + 1} of {len(_doc)}...**"
-                page = _doc[page_num]
-                # Get all text blocks that can be found via search
-                text_blocks = []
-                for block in page.get_text("blocks"):
-                    text = block[4]  # The text content is at index 4
-                    # Verify the text can be found via search
-                    search_results = page.search_for(text.strip())
-                    if search_results:
-                        text_blocks.append(text)
-
-                # Join the searchable text blocks
-                page_content = "\n".join(text_blocks)
+            # Extract the searchable text of every page off the event loop, in parallel for large documents
+            page_texts = []
+            async for progress_update in aextract_searchable_page_texts(file_path):
+                if isinstance(progress_update, list):
+                    page_texts = progress_update
+                else:
+                    yield progress_update
+            for page_num, page_content in enumerate(page_texts):
                 doc_processor.append_md_document(page_content)
                 texts.append(Document(
                     page_content=page_content,
@@ -205,7 +293,6 @@ async def embeddings_agent(
             logger.info("Saving markdown to file...")
             markdown_dir = os.path.join(embedding_folder, "markdown")
             os.makedirs(markdown_dir, exist_ok=True)
-            file_id = generate_file_id(file_path)
             md_path = os.path.join(markdown_dir, f"{file_id}.md")
             # yield f"\n\n**Saving markdown to file: {md_path}...**"
             logger.info(f"Saving markdown to file: {md_path}...")
@@ -217,21 +304,34 @@ async def embeddings_agent(
             # yield f"\n\n**Number of pages processed: {len(texts)}**"
             time_tracking['fake_markdown_extraction'] = time.time() - fake_markdown_extraction_start_time
             logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
+            texts_ready = texts
         else:
-            # Split the document into chunks when markdown extraction succeeded
+            texts_ready = None
+
+        # The markdown is available from here on: start the document summary (unless it
+        # needs the markdown embeddings), and chunk and embed the text while the images
+        # are uploaded and analyzed.
+        md_document = doc_processor.get_md_document()
+        summary_task = None
+        if not summary_needs_embeddings(md_document):
+            summary_task = asyncio.create_task(_generate_document_summary(file_path, embedding_folder, md_document, time_tracking))
+        if texts_ready is None:
             yield "\n\n**📑 Splitting document into chunks ...**"
-            create_searchable_chunks_start_time = time.time()
-            average_page_length = sum(len(doc.page_content) for doc in _document) / len(_document)
-            chunk_size = int(average_page_length // 3)
-            logger.info(f"Average page length: {average_page_length}")
-            # yield f"\n\n**Average page length: {int(average_page_length)}**"
-            logger.info(f"Chunk size: {chunk_size}")
-            # yield f"\n\n**Chunk size: {int(chunk_size)}**"
-            texts = create_searchable_chunks(_doc, chunk_size)
-            # yield f"\n\n**length of document chunks generated for get_response_source: {len(texts)}**"
-            logger.info(f"length of document chunks generated for get_response_source: {len(texts)}")
-            time_tracking['create_searchable_chunks'] = time.time() - create_searchable_chunks_start_time
-            logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
+        shared_vectors = {}
+        text_task = asyncio.create_task(_chunk_and_embed(file_path, _document, texts_ready, md_document, embeddings, shared_vectors, time_tracking))
+        if images_pending:
+            yield "\n\n**🖼️ Uploading and analyzing images while embedding the text ...**"
+            messages = asyncio.Queue()
+            image_task = asyncio.create_task(process_images_pipeline(markdown_embedding_folder, file_path, messages, time_tracking))
+            async for message in stream_messages(messages, [image_task, text_task]):
+                yield message
+            try:
+                await image_task
+            except Exception as e:
+                logger.exception(f"Error in the image pipeline: {e}")
+                yield f"\n\n**❌ Error processing images: {e}**"
+        texts = await text_task
+        logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
 
         # Initialize image files and try to append image context to texts with error handling
         process_image_files_start_time = time.time()
@@ -247,29 +347,36 @@ async def embeddings_agent(
                 # yield f"\n\n**Found {len(image_context)} images with context**"
 
                 # Create a temporary FAISS index for similarity search
+                temp_db_embeddings = embeddings
                 try:
-                    temp_db = FAISS.from_documents(texts, embeddings)
+                    temp_db = await abuild_faiss_from_documents(texts, embeddings, vector_map=shared_vectors)
                 except Exception as e:
                     try:
                         logger.exception(f"Error creating temporary FAISS index: {e}")
                         yield "\n\n**❌ Error creating temporary FAISS index: {e}**"
                         logger.info("Continuing with small embeddings...")
                         yield "\n\n**🔍 Continuing with small embeddings...**"
-                        temp_db = FAISS.from_documents(texts, embeddings_small)
+                        temp_db = await abuild_faiss_from_documents(texts, embeddings_small)
+                        temp_db_embeddings = embeddings_small
                     except Exception as e:
                         logger.exception(f"Error creating temporary FAISS index with small embeddings: {e}")
                         yield "\n\n**❌ Error creating temporary FAISS index with small embeddings: {e}**"
                         logger.info("Continuing with lite embeddings...")
                         yield "\n\n**🔍 Continuing with lite embeddings...**"
-                        temp_db = FAISS.from_documents(texts, embeddings_lite)
+                        temp_db = await abuild_faiss_from_documents(texts, embeddings_lite)
+                        temp_db_embeddings = embeddings_lite
 
-                for image, context in image_context.items():
-                    for c in context:
-                        # Clean the context text for comparison
-                        clean_context = c.replace(" <markdown>", "").strip()
+                # Embed every context once, as a document: the same vectors find the page
+                # of each context here and go into the vector store below
+                context_vectors = shared_vectors if temp_db_embeddings is embeddings else {}
+                await aembed_unique_texts(
+                    [c for context in image_context.values() for c in context], temp_db_embeddings, context_vectors
+                )
 
+                for image, context in image_context.items():
+                    for context_index, c in enumerate(context):
                         # Use similarity search to find the most relevant chunk
-                        similar_chunks = temp_db.similarity_search_with_score(clean_context, k=1)
+                        similar_chunks = temp_db.similarity_search_with_score_by_vector(context_vectors[c], k=1)
 
                         if similar_chunks:
                             best_match_chunk, score = similar_chunks[0]
@@ -283,7 +390,8 @@ async def embeddings_agent(
                             page_content=c, 
                             metadata={
                                 "source": image,
-                                "page": best_match_page
+                                "page": best_match_page,
+                                "chunk_id": image_context_chunk_id(file_id, image, context_index)
                             }
                         ))
 
@@ -301,38 +409,40 @@ async def embeddings_agent(
         # Create the vector store to use as the index
         create_vector_store_start_time = time.time()
         yield "\n\n**🗂️ Creating vector store ...**"
-        db = FAISS.from_documents(texts, embeddings)
+        db = await abuild_faiss_from_documents(texts, embeddings, vector_map=shared_vectors)
         # Save the embeddings to the specified folder
         # yield "\n\n**Saving vector store to file...**"
         logger.info("Saving vector store to file...")
-        db.save_local(embedding_folder)
+        save_vector_store(db, embedding_folder)
         time_tracking['vectorrag_create_vector_store'] = time.time() - create_vector_store_start_time
         logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
 
         # Save the markdown embeddings to the specified folder
         create_markdown_embeddings_start_time = time.time()
         yield "\n\n**📝 Creating markdown embeddings ...**"
-        create_markdown_embeddings(doc_processor.get_md_document(), markdown_embedding_folder, chunk_size=2000, chunk_overlap=50)
+        await create_markdown_embeddings(doc_processor.get_md_document(), markdown_embedding_folder, chunk_size=2000, chunk_overlap=50, vector_map=shared_vectors)
         time_tracking['vectorrag_create_markdown_embeddings'] = time.time() - create_markdown_embeddings_start_time
         logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
+        logger.info(f"Embedding cache stats: {get_embedding_cache_stats()}")
 
-        try:
-            # Generate and save document summary using the texts we created
-            logger.info("Generating document summary ...")
+        # Long documents are summarized with RAG over the markdown embeddings saved above
+        if summary_task is None:
+            summary_task = asyncio.create_task(_generate_document_summary(file_path, embedding_folder, md_document, time_tracking))
+        if not summary_task.done():
             yield "\n\n**📚 Loading document summary ...**"
-            generate_document_summary_start_time = time.time()
-            # By default, use the markdown document to generate the summary
-            await generate_document_summary(texts, embedding_folder, doc_processor.get_md_document())
-            time_tracking['generate_document_summary'] = time.time() - generate_document_summary_start_time
-            logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
+        summary_error = await summary_task
+        logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
+        if summary_error is None:
             logger.info("Document summary generated and saved successfully ...")
             yield "\n\n**📚 Document summary generated and saved successfully ...**"
-        except Exception as e:
-            logger.exception(f"Error generating document summary: {e}")
-            yield f"\n\n**❌ Error generating document summary: {e}**"
+        else:
+            yield f"\n\n**❌ Error generating document summary: {summary_error}**"
             logger.info("Continuing without document summary...")
             yield "\n\n**❌ Continuing without document summary...**"
 
+    if page_text_index_task is not None:
+        await page_text_index_task
+
     graphrag_start_time = time.time()
     if _mode == ChatMode.ADVANCED:
         # GraphRAG_embedding_generator = await generate_GraphRAG_embedding(embedding_folder, time_tracking)
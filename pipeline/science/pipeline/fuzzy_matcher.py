@@ -0,0 +1,160 @@
+import re
+import time
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from pipeline.science.pipeline.config import get_config
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.fuzzy_matcher")
+
+_WORD_PATTERN = re.compile(r'\S+')
+
+
+def get_fuzzy_matcher_config() -> dict:
+    matcher_config = get_config().get('source_locator', {})
+    return {
+        "shingle_size": int(matcher_config.get('shingle_size', 3)),
+        "max_postings": int(matcher_config.get('max_postings', 200)),
+        "max_candidates": int(matcher_config.get('max_candidates', 5)),
+        "time_budget_ms": float(matcher_config.get('time_budget_ms', 50)),
+    }
+
+
+def _words_with_offsets(text: str) -> tuple[list[str], list[int]]:
+    words = []
+    starts = []
+    for match in _WORD_PATTERN.finditer(text):
+        words.append(match.group().lower())
+        starts.append(match.start())
+    return words, starts
+
+
+class ShingleIndex:
+    """
+    Inverted index from word shingles (k consecutive words) to their positions in
+    a set of page texts, used to find the few places a chunk can plausibly come
+    from before any character-level alignment is done.
+    """
+    def __init__(self, pages: list[str], shingle_size: int = 3):
+        self.pages = pages
+        self.shingle_size = shingle_size
+        self.page_words = []
+        self.page_word_starts = []
+        self.postings = defaultdict(list)
+        for page_num, text in enumerate(pages):
+            words, starts = _words_with_offsets(text)
+            self.page_words.append(words)
+            self.page_word_starts.append(starts)
+            for word_index in range(len(words) - shingle_size + 1):
+                shingle = tuple(words[word_index:word_index + shingle_size])
+                self.postings[shingle].append((page_num, word_index))
+
+    def candidates(self, chunk_words: list[str], max_postings: int) -> list[tuple[int, int, int]]:
+        """
+        Rank alignments of the chunk against the pages by shared shingles.
+
+        Every shared shingle votes for the page and the word offset at which the chunk
+        would start ("diagonal"); votes of nearby diagonals are pooled so small
+        insertions and deletions do not split a match.
+
+        Args:
+            chunk_words: Lowercased words of the normalized chunk
+            max_postings: Shingles occurring more often than this are too common to vote
+
+        Returns:
+            list: (votes, page_num, start_word) tuples, best first
+        """
+        k = self.shingle_size
+        votes = Counter()
+        for query_index in range(len(chunk_words) - k + 1):
+            postings = self.postings.get(tuple(chunk_words[query_index:query_index + k]))
+            if not postings or len(postings) > max_postings:
+                continue
+            for page_num, word_index in postings:
+                votes[(page_num, word_index - query_index)] += 1
+        if not votes:
+            return []
+
+        tolerance = max(2, len(chunk_words) // 10)
+        pooled = []
+        for (page_num, diagonal), count in votes.items():
+            total = sum(votes.get((page_num, diagonal + shift), 0) for shift in range(-tolerance, tolerance + 1))
+            pooled.append((total, count, page_num, diagonal))
+        pooled.sort(key=lambda item: (-item[0], -item[1], item[2], item[3]))
+
+        ranked = []
+        seen = set()
+        for total, _, page_num, diagonal in pooled:
+            # Keep one candidate per neighbourhood of diagonals
+            bucket = (page_num, diagonal // (tolerance + 1))
+            if bucket in seen:
+                continue
+            seen.add(bucket)
+            ranked.append((total, page_num, max(0, diagonal)))
+        return ranked
+
+
+def fuzzy_locate(
+    normalized_chunk: str,
+    shingle_index: ShingleIndex,
+    similarity_threshold: float = 0.8,
+    max_candidates: int = None,
+    time_budget_ms: float = None,
+    max_postings: int = None,
+) -> dict | None:
+    """
+    Find the most similar window to a chunk in the indexed pages.
+
+    Candidate windows come from the shingle index; only the best few are aligned
+    with SequenceMatcher, and alignment stops once the time budget is spent.
+
+    Args:
+        normalized_chunk: Chunk text normalized like the page texts
+        shingle_index: ShingleIndex over the normalized page texts
+        similarity_threshold: Minimum SequenceMatcher ratio of a match
+        max_candidates: Maximum number of windows to align
+        time_budget_ms: Stop aligning candidates after this many milliseconds
+        max_postings: Ignore shingles occurring more often than this
+
+    Returns:
+        dict: page_num, start_char, end_char and similarity of the best match, or None
+    """
+    matcher_config = get_fuzzy_matcher_config()
+    max_candidates = max_candidates or matcher_config["max_candidates"]
+    time_budget_ms = time_budget_ms or matcher_config["time_budget_ms"]
+    max_postings = max_postings or matcher_config["max_postings"]
+    deadline = time.perf_counter() + time_budget_ms / 1000
+
+    chunk_words, _ = _words_with_offsets(normalized_chunk)
+    if len(chunk_words) < shingle_index.shingle_size:
+        return None
+
+    best = None
+    candidates = shingle_index.candidates(chunk_words, max_postings)[:max_candidates]
+    for votes, page_num, start_word in candidates:
+        if votes < candidates[0][0] / 2:
+            # Far fewer shared shingles than the best candidate, cannot be the source
+            break
+        page_text = shingle_index.pages[page_num]
+        word_starts = shingle_index.page_word_starts[page_num]
+        if start_word >= len(word_starts):
+            continue
+        start_char = word_starts[start_word]
+        window_text = page_text[start_char:start_char + len(normalized_chunk)]
+        matcher = SequenceMatcher(None, normalized_chunk, window_text, autojunk=False)
+        if matcher.quick_ratio() > similarity_threshold:
+            similarity = matcher.ratio()
+            if similarity > similarity_threshold and (best is None or similarity > best["similarity"]):
+                best = {
+                    "page_num": page_num,
+                    "start_char": start_char,
+                    "end_char": start_char + len(window_text),
+                    "similarity": similarity,
+                }
+        if best is not None and best["similarity"] >= 0.95:
+            break
+        if time.perf_counter() > deadline:
+            logger.info(f"Fuzzy matching budget of {time_budget_ms} ms spent")
+            break
+    return best
@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain.output_parsers import OutputFixingParser
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.utils import (
     truncate_document,
     get_llm,
@@ -53,6 +53,24 @@ def refine_document_summary(markdown_summary, llm):
     return refined_markdown_summary
 
 
+def get_summary_token_limit() -> int:
+    """
+    Documents up to this many tokens are summarized from their full content; longer
+    ones are summarized with RAG over the markdown embeddings.
+    """
+    para = get_config()['llm']
+    api = ApiHandler(para)
+    return int(api.models['advanced']['context_window']/2)
+
+
+def summary_needs_embeddings(md_document) -> bool:
+    """
+    Whether generate_document_summary will query the embeddings of the document, so it
+    can only run once they are saved.
+    """
+    return not md_document or count_tokens(md_document) >= get_summary_token_limit()
+
+
 async def generate_document_summary(file_path, embedding_folder, md_document=None):
     """
     Given a file path, generate a comprehensive markdown-formatted summary of the document using multiple LLM calls.
@@ -60,11 +78,10 @@ async def generate_document_summary(file_path, embedding_folder, md_document=Non
     If the document is a PDF file, the content will be extracted from the PDF file embedded in the embedding folder.
     If the document is a markdown file, the content will be read from the markdown file.
     """
-    config = load_config()
+    config = get_config()
     para = config['llm']
     llm = get_llm(para["level"], para)  # Using Advanced model for better quality
-    api = ApiHandler(para)
-    max_tokens = int(api.models['advanced']['context_window']/2)
+    max_tokens = get_summary_token_limit()
     # max_tokens = int(65536/3)
     default_topics = config['default_topics']
 
@@ -22,7 +22,7 @@ from pipeline.science.pipeline.utils import (
     responses_refine,
     Question
 )
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.rag_agent import get_rag_context
 
 import logging
@@ -31,7 +31,7 @@ logger = logging.getLogger("tutorpipeline.science.get_graphrag_response")
 
 async def get_GraphRAG_global_response(question: Question, chat_history, file_path_list, embedding_folder_list, deep_thinking = True, chat_session: ChatSession = None, stream: bool = False):
     user_input=question.text + "\n\n" + question.special_context
-    config = load_config()
+    config = get_config()
     token_limit = config["inference_token_limit"]
     map_symbol_to_index = config["map_symbol_to_index"]
     # Get the first 3 keys from map_symbol_to_index for examples in the prompt
@@ -41,7 +41,7 @@ async def get_GraphRAG_global_response(question: Question, chat_history, file_pa
     embedding_folder = embedding_folder_list[0]
 
     # Chat history and user input
-    chat_history_text = truncate_chat_history(chat_history)
+    chat_history_text = truncate_chat_history(chat_history, history_window=chat_session.history_window if chat_session is not None else None)
     if chat_session is not None and chat_session.question is not None:
         user_input_text = chat_session.question.text + "\n\n" + str(chat_session.question.special_context)
         rag_user_input_text = user_input_text   # + "\n\n" + str(chat_session.question.answer_planning)
@@ -15,7 +15,7 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain.output_parsers import OutputFixingParser
 
 # Import from within the package structure
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.utils import (
     truncate_chat_history,
     get_llm,
@@ -54,7 +54,7 @@ async def get_db_rag_response(
         logger.info("Session not specified, creating new chat session")
         chat_session = ChatSession()
 
-    config = load_config()
+    config = get_config()
     para = config["llm"]
 
     if chat_session.mode == ChatMode.LITE:
@@ -172,7 +172,7 @@ async def get_embedding_folder_rag_response(
     Returns:
         str: The generated response
     """
-    config = load_config()
+    config = get_config()
     
     if chat_session is None:
         chat_session = ChatSession()
@@ -280,7 +280,7 @@ async def get_embedding_folder_rag_response_string(
     Returns:
         str: The complete generated response as a string
     """
-    config = load_config()
+    config = get_config()
     
     if chat_session is None:
         chat_session = ChatSession()
@@ -352,7 +352,7 @@ async def get_basic_rag_response(
     Returns:
         str: The generated response
     """
-    config = load_config()
+    config = get_config()
     
     if chat_session is None:
         chat_session = ChatSession()
@@ -413,7 +413,7 @@ async def get_rag_response(
     Returns:
         str: The generated response
     """
-    config = load_config()
+    config = get_config()
     para = config["llm"]
     llm = get_llm("basic", para)
     parser = StrOutputParser()
@@ -1,5 +1,7 @@
 import os
 import re
+import time
+import asyncio
 from langchain_community.vectorstores import FAISS
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import ChatPromptTemplate
@@ -8,7 +10,7 @@ from langchain.output_parsers import OutputFixingParser
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import json
 
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.utils import (
     truncate_chat_history,
     get_llm,
@@ -46,7 +48,7 @@ logger = logging.getLogger("tutorpipeline.science.get_response")
 
 async def get_response(chat_session: ChatSession, file_path_list, question: Question, chat_history, embedding_folder_list, deep_thinking = True, stream=False):
     generators_list = []
-    config = load_config()
+    config = get_config()
     user_input = question.text
     user_input_string = str(user_input + "\n\n" + question.special_context)
     # Handle Lite mode first
@@ -86,7 +88,7 @@ async def get_response(chat_session: ChatSession, file_path_list, question: Ques
         # else:
         #     return answer
 
-        config = load_config()
+        config = get_config()
         token_limit = config["inference_token_limit"]
         map_symbol_to_index = config["map_symbol_to_index"]
         # Get the first 3 keys from map_symbol_to_index for examples in the prompt
@@ -209,13 +211,13 @@ async def get_response(chat_session: ChatSession, file_path_list, question: Ques
         logger.info("deep thinking ...")
 
         # Load config for deep thinking mode
-        config = load_config()
+        config = get_config()
         token_limit = config["inference_token_limit"]
         map_symbol_to_index = config["map_symbol_to_index"]
         # Get the first 3 keys from map_symbol_to_index for examples in the prompt
         first_keys = list(map_symbol_to_index.keys())[:3]
         example_keys = ", or ".join(first_keys)
-        chat_history_string = truncate_chat_history(chat_history, token_limit=token_limit)
+        chat_history_string = truncate_chat_history(chat_history, token_limit=token_limit, history_window=chat_session.history_window)
         # user_input_string = str(user_input + "\n\n" + question.special_context)
         
         formatted_context = await get_rag_context(chat_session=chat_session,
@@ -317,33 +319,9 @@ async def get_response(chat_session: ChatSession, file_path_list, question: Ques
             return answer
 
 
-async def get_query_helper(chat_session: ChatSession, user_input, context_chat_history, embedding_folder_list):
-    # Replace LaTeX formulas in the format \( formula \) with $ formula $
-    user_input = replace_latex_formulas(user_input)
-
-    logger.info(f"TEST: user_input: {user_input}")
-    # yield f"\n\n**💬 User input: {user_input}**"
-    # If we have "documents_summary" in the embedding folder, we can use it to speed up the search
-    document_summary_path_list = [os.path.join(embedding_folder, "documents_summary.txt") for embedding_folder in embedding_folder_list]
-    documents_summary_list = []
-    for document_summary_path in document_summary_path_list:
-        if os.path.exists(document_summary_path):
-            with open(document_summary_path, "r") as f:
-                documents_summary_list.append(f.read())
-        else:
-            documents_summary_list.append(" ")
-
-    # Join all the documents summaries into one string
-    # FIXME: Add a function to combine the initial messages into a single summary message
-    documents_summary = "\n".join(documents_summary_list)
-
-    # Load languages from config
-    config = load_config()
-    llm = get_llm('basic', config['llm'])
-    parser = JsonOutputParser()
-    error_parser = OutputFixingParser.from_llm(parser=parser, llm=llm)
+QUERY_UNDERSTANDING_MODES = ("sequential", "concurrent", "merged")
 
-    system_prompt = (
+QUERY_REPHRASE_SYSTEM_PROMPT = (
         """
         You are a educational professor helping a student reading a document {context}.
         The goals are:
@@ -362,49 +340,15 @@ async def get_query_helper(chat_session: ChatSession, user_input, context_chat_h
         }}
         ```
         """
-    )
-    human_prompt = (
+)
+QUERY_REPHRASE_HUMAN_PROMPT = (
         """
         The student asked the following question:
         ```{input}```
         """
-    )
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_prompt),
-            ("human", human_prompt),
-        ]
-    )
-    chain = prompt | llm | error_parser
-    try:
-        parsed_result = chain.invoke({"input": user_input,
-                                    "context": documents_summary,
-                                    "chat_history": truncate_chat_history(context_chat_history)})
-        question = parsed_result['question']
-        question_type = parsed_result['question_type']
-    except Exception as e:
-        try:
-            logger.exception(f"Error in get_query_helper: {e}")
-            parsed_result = chain.invoke({"input": user_input,
-                                        "context": documents_summary,
-                                        "chat_history": truncate_chat_history(context_chat_history)})
-            question = parsed_result['question']
-            question_type = parsed_result['question_type']
-        except Exception as e:
-            logger.exception(f"Error again in get_query_helper: {e}")
-            question = user_input
-            question_type = "local"
-    try:
-        language = detect_language(user_input)
-        logger.info(f"language detected: {language}")
-    except Exception as e:
-        logger.info(f"Error detecting language: {e}")
-        language = "English"
-
-    chat_session.set_language(language)
-
-    # Create the answer planning using an additional LLM call
-    planning_system_prompt = (
+)
+# Create the answer planning using an additional LLM call
+ANSWER_PLANNING_SYSTEM_PROMPT = (
         """
         You are an educational AI assistant tasked with deeply analyzing a student's question and planning a comprehensive answer.
 
@@ -436,9 +380,8 @@ async def get_query_helper(chat_session: ChatSession, user_input, context_chat_h
         }}
         ```
         """
-    )
-
-    planning_human_prompt = (
+)
+ANSWER_PLANNING_HUMAN_PROMPT = (
         """
         The student's current question:
         ```{input}```
@@ -450,24 +393,238 @@ async def get_query_helper(chat_session: ChatSession, user_input, context_chat_h
 
         Based on the conversation history, document summary, and the current question, create a detailed plan for constructing the answer.
         """
-    )
+)
+# Planning over the raw question, so it does not wait for the rephrased one
+ANSWER_PLANNING_RAW_HUMAN_PROMPT = (
+        """
+        The student's current question:
+        ```{input}```
 
-    planning_prompt = ChatPromptTemplate.from_messages(
+        Based on the conversation history, document summary, and the current question, create a detailed plan for constructing the answer.
+        """
+)
+# Rephrasing, question type and answer planning in one call
+QUERY_UNDERSTANDING_SYSTEM_PROMPT = (
+        """
+        You are a educational professor helping a student reading a document {context}.
+        The goals are:
+        1. to ask questions in a better way to make sure it's optimized to query a Vector Database for RAG (Retrieval Augmented Generation).
+        2. to identify the question is about local or global context of the document.
+        3. refer to the previous conversation history when generating the question.
+
+        Previous conversation history:
+        ```{chat_history}```
+
+        4. to deeply analyze the question and plan a comprehensive answer: what the student truly wants to know,
+        what should be included, and what should NOT be included (e.g., repeated information, information the student already knows).
+        Do not make up or assume anything or guess without any evidence. If the query is about a specific figure, include the figure number.
+
+        Organize final response in the following JSON format:
+        ```json
+        {{
+            "question": "<question try to understand what the user really mean by the question and rephrase it in a better way>",
+            "question_type": "local" or "global" or "image", (if the question is like "what is fig. 1 mainly about?", the question_type should be "image")
+            "answer_planning": {{
+                "user_intent": "<detailed analysis of what the user truly wants to know>",
+                "things_explained_already": ["<things explained in the previous conversation that should not be repeated in detail>"],
+                "key_focus_areas": ["<specific topics/concepts that should be explained>"],
+                "information_to_include": ["<specific information points that should be included>"],
+                "information_to_exclude": ["<information that should be excluded - already known/redundant>"],
+                "answer_structure": ["<outline of how the answer should be structured>"],
+                "explanation_depth": "<basic/intermediate/advanced>",
+                "misconceptions_to_address": ["<potential misconceptions that should be corrected>"]
+            }}
+        }}
+        ```
+        """
+)
+
+
+def get_query_understanding_config() -> dict:
+    query_config = get_config().get('query_understanding', {})
+    mode = query_config.get('mode', 'concurrent')
+    if mode not in QUERY_UNDERSTANDING_MODES:
+        logger.warning(f"Unknown query understanding mode {mode}, using concurrent")
+        mode = 'concurrent'
+    return {"mode": mode}
+
+
+async def _timed(name: str, awaitable, latencies: dict):
+    start = time.time()
+    try:
+        return await awaitable
+    finally:
+        latencies[name] = time.time() - start
+
+
+async def _detect_query_language(user_input: str) -> str:
+    try:
+        language = await asyncio.to_thread(detect_language, user_input)
+        logger.info(f"language detected: {language}")
+    except Exception as e:
+        logger.info(f"Error detecting language: {e}")
+        language = "English"
+    return language
+
+
+async def _rephrase_query(llm, user_input: str, documents_summary: str, chat_history_string: str):
+    """
+    Rephrase the question for retrieval and classify it as local, global or image.
+    Retried once; falls back to the raw question as a local one.
+    """
+    parser = JsonOutputParser()
+    error_parser = OutputFixingParser.from_llm(parser=parser, llm=llm)
+    prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", planning_system_prompt),
-            ("human", planning_human_prompt),
+            ("system", QUERY_REPHRASE_SYSTEM_PROMPT),
+            ("human", QUERY_REPHRASE_HUMAN_PROMPT),
         ]
     )
+    chain = prompt | llm | error_parser
+    inputs = {"input": user_input, "context": documents_summary, "chat_history": chat_history_string}
+    try:
+        parsed_result = await chain.ainvoke(inputs)
+        return parsed_result['question'], parsed_result['question_type']
+    except Exception as e:
+        try:
+            logger.exception(f"Error in get_query_helper: {e}")
+            parsed_result = await chain.ainvoke(inputs)
+            return parsed_result['question'], parsed_result['question_type']
+        except Exception as e:
+            logger.exception(f"Error again in get_query_helper: {e}")
+            return user_input, "local"
+
+
+async def _plan_answer(llm, user_input: str, documents_summary: str, chat_history_string: str, question: str = None, question_type: str = None) -> str:
+    """
+    Plan the answer, over the rephrased question and its type when given, else over
+    the raw question only.
+    """
     parser_string = StrOutputParser()
     error_parser_string = OutputFixingParser.from_llm(parser=parser_string, llm=llm)
+    human_prompt = ANSWER_PLANNING_HUMAN_PROMPT if question is not None else ANSWER_PLANNING_RAW_HUMAN_PROMPT
+    planning_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", ANSWER_PLANNING_SYSTEM_PROMPT),
+            ("human", human_prompt),
+        ]
+    )
     planning_chain = planning_prompt | llm | error_parser_string
-    answer_planning = planning_chain.invoke({
-        "input": user_input,
-        "rephrased_question": question,
-        "question_type": question_type,
-        "context": documents_summary,
-        "chat_history": truncate_chat_history(context_chat_history)
-    })
+    inputs = {"input": user_input, "context": documents_summary, "chat_history": chat_history_string}
+    if question is not None:
+        inputs.update({"rephrased_question": question, "question_type": question_type})
+    return await planning_chain.ainvoke(inputs)
+
+
+async def _understand_query_merged(llm, user_input: str, documents_summary: str, chat_history_string: str):
+    parser = JsonOutputParser()
+    error_parser = OutputFixingParser.from_llm(parser=parser, llm=llm)
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", QUERY_UNDERSTANDING_SYSTEM_PROMPT),
+            ("human", QUERY_REPHRASE_HUMAN_PROMPT),
+        ]
+    )
+    chain = prompt | llm | error_parser
+    parsed_result = await chain.ainvoke({"input": user_input, "context": documents_summary, "chat_history": chat_history_string})
+    answer_planning = parsed_result['answer_planning']
+    if not isinstance(answer_planning, str):
+        answer_planning = json.dumps(answer_planning, indent=2, ensure_ascii=False)
+    return parsed_result['question'], parsed_result['question_type'], answer_planning
+
+
+async def understand_query(user_input: str, documents_summary: str, chat_history_string: str, time_tracking: dict = None):
+    """
+    Query understanding stage: rephrased question, question type, answer planning and
+    language of the user input, in the mode of the query_understanding config:
+    - sequential: rephrase, then plan over the rephrased question (two round trips)
+    - concurrent: rephrase and plan over the raw question at the same time
+    - merged: one call returning the rephrased question, its type and the planning,
+      falling back to concurrent if its output cannot be parsed
+    Language detection runs alongside the LLM calls in every mode.
+
+    Args:
+        user_input: The user input
+        documents_summary: Summaries of the documents
+        chat_history_string: Truncated chat history
+        time_tracking: Optional timings of the turn. Gets query_understanding (wall time),
+            the latency of each LLM call (query_rephrase, query_planning, query_merged), and
+            query_understanding_saved: the latency of the calls minus the wall time, i.e.
+            what overlapping the calls saved over running them one after the other
+
+    Returns:
+        tuple: (question, question_type, answer_planning, language)
+    """
+    mode = get_query_understanding_config()["mode"]
+    llm = get_llm('basic', get_config()['llm'])
+    latencies = {}
+    start = time.time()
+    language_task = asyncio.create_task(_detect_query_language(user_input))
+
+    try:
+        if mode == "merged":
+            try:
+                question, question_type, answer_planning = await _timed(
+                    "query_merged", _understand_query_merged(llm, user_input, documents_summary, chat_history_string), latencies
+                )
+            except Exception as e:
+                logger.exception(f"Error in merged query understanding, running the calls separately: {e}")
+                mode = "concurrent"
+
+        if mode == "concurrent":
+            (question, question_type), answer_planning = await asyncio.gather(
+                _timed("query_rephrase", _rephrase_query(llm, user_input, documents_summary, chat_history_string), latencies),
+                _timed("query_planning", _plan_answer(llm, user_input, documents_summary, chat_history_string), latencies),
+            )
+        elif mode == "sequential":
+            question, question_type = await _timed(
+                "query_rephrase", _rephrase_query(llm, user_input, documents_summary, chat_history_string), latencies
+            )
+            answer_planning = await _timed(
+                "query_planning",
+                _plan_answer(llm, user_input, documents_summary, chat_history_string, question, question_type),
+                latencies,
+            )
+    except BaseException:
+        language_task.cancel()
+        raise
+
+    language = await language_task
+    elapsed = time.time() - start
+    logger.info(f"Query understanding ({mode}) took {elapsed:.2f}s, LLM calls: {latencies}")
+    if time_tracking is not None:
+        time_tracking.update(latencies)
+        time_tracking["query_understanding"] = elapsed
+        time_tracking["query_understanding_saved"] = max(0.0, sum(latencies.values()) - elapsed)
+    return question, question_type, answer_planning, language
+
+
+async def get_query_helper(chat_session: ChatSession, user_input, context_chat_history, embedding_folder_list, time_tracking=None):
+    # Replace LaTeX formulas in the format \( formula \) with $ formula $
+    user_input = replace_latex_formulas(user_input)
+
+    logger.info(f"TEST: user_input: {user_input}")
+    # yield f"\n\n**💬 User input: {user_input}**"
+    # If we have "documents_summary" in the embedding folder, we can use it to speed up the search
+    document_summary_path_list = [os.path.join(embedding_folder, "documents_summary.txt") for embedding_folder in embedding_folder_list]
+    documents_summary_list = []
+    for document_summary_path in document_summary_path_list:
+        if os.path.exists(document_summary_path):
+            with open(document_summary_path, "r") as f:
+                documents_summary_list.append(f.read())
+        else:
+            documents_summary_list.append(" ")
+
+    # Join all the documents summaries into one string
+    # FIXME: Add a function to combine the initial messages into a single summary message
+    documents_summary = "\n".join(documents_summary_list)
+    # Shared by the rephrasing and planning chains and their retries
+    chat_history_string = truncate_chat_history(context_chat_history, history_window=chat_session.history_window)
+
+    question, question_type, answer_planning, language = await understand_query(
+        user_input, documents_summary, chat_history_string, time_tracking
+    )
+    chat_session.set_language(language)
     logger.info(f"TEST: answer_planning: {answer_planning}")
 
     question = Question(
@@ -548,7 +705,7 @@ def generate_follow_up_questions(answer, chat_history):
     Generate 3 relevant follow-up questions based on the assistant's response and chat history.
     """
     logger.info("Generating follow-up questions ...")
-    config = load_config()
+    config = get_config()
     para = config['llm']
     llm = get_llm('basic', para)
     parser = JsonOutputParser()
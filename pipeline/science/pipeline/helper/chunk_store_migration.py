@@ -0,0 +1,201 @@
+import os
+import sys
+import shutil
+import argparse
+from pathlib import Path
+
+from langchain_community.vectorstores import FAISS
+
+# Add the project root to Python path for direct script execution
+project_root = Path(__file__).resolve().parents[4]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.chunk_store import (
+    CHUNK_STORE_FILE,
+    CHUNK_STORE_VERSION,
+    PICKLE_DOCSTORE_FILE,
+    SQLiteDocstore,
+    close_vector_store,
+    load_vector_store,
+    save_chunk_store,
+)
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.helper.chunk_store_migration")
+
+
+def find_index_folders(root_folder: str | Path) -> list[str]:
+    """
+    Find every folder under root_folder that holds a saved FAISS index.
+
+    Args:
+        root_folder: Usually the embedded_content folder
+
+    Returns:
+        list: Folders containing index.faiss, sorted
+    """
+    folders = []
+    for dirpath, _, filenames in os.walk(root_folder):
+        if "index.faiss" in filenames:
+            folders.append(dirpath)
+    return sorted(folders)
+
+
+def chunk_store_is_current(folder_path: str | Path) -> bool:
+    chunk_store_path = os.path.join(folder_path, CHUNK_STORE_FILE)
+    if not os.path.exists(chunk_store_path):
+        return False
+    docstore = SQLiteDocstore(chunk_store_path)
+    try:
+        return docstore.version == CHUNK_STORE_VERSION
+    finally:
+        docstore.close()
+
+
+def _comparable(value):
+    """
+    Metadata value as it reads back from the chunk store: JSON turns tuples into lists.
+    """
+    if isinstance(value, (tuple, list)):
+        return [_comparable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _comparable(item) for key, item in value.items()}
+    return value
+
+
+def chunk_differences(source_doc, migrated_doc) -> list[str]:
+    """
+    Describe how a chunk read back from the chunk store differs from its source.
+
+    Args:
+        source_doc: Document of the source docstore
+        migrated_doc: The same chunk read from the chunk store
+
+    Returns:
+        list: One message per difference, empty if the chunk is unchanged
+    """
+    if isinstance(migrated_doc, str):
+        # The docstore returns an error message for unknown ids
+        return [migrated_doc]
+    differences = []
+    if migrated_doc.page_content != source_doc.page_content:
+        differences.append("page_content differs")
+    source_metadata = source_doc.metadata or {}
+    migrated_metadata = migrated_doc.metadata or {}
+    for key in sorted(set(source_metadata) | set(migrated_metadata), key=str):
+        if key not in migrated_metadata:
+            differences.append(f"metadata {key!r} is missing")
+        elif key not in source_metadata:
+            differences.append(f"metadata {key!r} was added")
+        elif _comparable(migrated_metadata[key]) != _comparable(source_metadata[key]):
+            differences.append(f"metadata {key!r} is {migrated_metadata[key]!r} instead of {source_metadata[key]!r}")
+    return differences
+
+
+def migrate_index_folder(folder_path: str | Path, keep_pickle: bool = False, dry_run: bool = False) -> str:
+    """
+    Convert the docstore of one saved index to the current chunk store format.
+    Folders with a pickle docstore or an older chunk store are rewritten; the
+    result is read back and compared with the source before the pickle is removed.
+
+    Args:
+        folder_path: Folder holding index.faiss
+        keep_pickle: Keep index.pkl next to the new chunk store
+        dry_run: Only report what would be done
+
+    Returns:
+        str: "current", "migrated", "would_migrate" or "missing"
+    """
+    pkl_path = os.path.join(folder_path, PICKLE_DOCSTORE_FILE)
+    if chunk_store_is_current(folder_path):
+        if not keep_pickle and not dry_run and os.path.exists(pkl_path):
+            os.remove(pkl_path)
+        return "current"
+    if not os.path.exists(pkl_path) and not os.path.exists(os.path.join(folder_path, CHUNK_STORE_FILE)):
+        logger.info(f"No docstore found in {folder_path}")
+        return "missing"
+    if dry_run:
+        return "would_migrate"
+
+    chunk_store_path = os.path.join(folder_path, CHUNK_STORE_FILE)
+    previous_path = chunk_store_path + ".previous"
+    # The embedding model is only needed for queries, not to convert the docstore
+    if os.path.exists(chunk_store_path):
+        db = load_vector_store(folder_path, None, mmap=False)
+    else:
+        db = FAISS.load_local(folder_path, None, allow_dangerous_deserialization=True)
+    expected_ids = [db.index_to_docstore_id[i] for i in range(len(db.index_to_docstore_id))]
+    # Read every source chunk before an older chunk store is replaced
+    source_docs = {doc_id: db.docstore.search(doc_id) for doc_id in expected_ids}
+    if os.path.exists(chunk_store_path):
+        shutil.copy2(chunk_store_path, previous_path)
+    save_chunk_store(db, folder_path)
+    close_vector_store(db)
+
+    migrated = None
+    try:
+        migrated = SQLiteDocstore(chunk_store_path)
+        if migrated.load_ids() != expected_ids:
+            raise ValueError(f"Chunk store of {folder_path} does not match the source docstore ids")
+        for doc_id in expected_ids:
+            differences = chunk_differences(source_docs[doc_id], migrated.search(doc_id))
+            if differences:
+                raise ValueError(f"Chunk {doc_id} of {folder_path} differs after migration: {'; '.join(differences)}")
+    except Exception:
+        # Keep the source docstore in use
+        if os.path.exists(previous_path):
+            os.replace(previous_path, chunk_store_path)
+        elif os.path.exists(chunk_store_path):
+            os.remove(chunk_store_path)
+        raise
+    finally:
+        if migrated is not None:
+            migrated.close()
+    if os.path.exists(previous_path):
+        os.remove(previous_path)
+
+    if not keep_pickle and os.path.exists(pkl_path):
+        os.remove(pkl_path)
+    logger.info(f"Migrated {len(expected_ids)} chunks in {folder_path}")
+    return "migrated"
+
+
+def migrate_embedded_content(root_folder: str | Path, keep_pickle: bool = False, dry_run: bool = False, backup: bool = False) -> dict:
+    """
+    Migrate every saved index under root_folder to the current chunk store format.
+
+    Args:
+        root_folder: Usually the embedded_content folder
+        keep_pickle: Keep index.pkl next to the new chunk stores
+        dry_run: Only report what would be done
+        backup: Copy index.pkl to index.pkl.bak before migrating
+
+    Returns:
+        dict: Number of folders per migration status, plus "failed"
+    """
+    summary = {"current": 0, "migrated": 0, "would_migrate": 0, "missing": 0, "failed": 0}
+    for folder_path in find_index_folders(root_folder):
+        try:
+            pkl_path = os.path.join(folder_path, PICKLE_DOCSTORE_FILE)
+            if backup and not dry_run and os.path.exists(pkl_path):
+                shutil.copy2(pkl_path, pkl_path + ".bak")
+            status = migrate_index_folder(folder_path, keep_pickle=keep_pickle, dry_run=dry_run)
+        except Exception as e:
+            logger.exception(f"Failed to migrate {folder_path}: {e}")
+            status = "failed"
+        summary[status] += 1
+        logger.info(f"{status}: {folder_path}")
+    logger.info(f"Chunk store migration summary: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Migrate saved FAISS docstores (index.pkl) to the versioned chunk store")
+    parser.add_argument("root_folder", help="Folder to scan, e.g. embedded_content")
+    parser.add_argument("--keep-pickle", action="store_true", help="Keep index.pkl next to the new chunk store")
+    parser.add_argument("--backup", action="store_true", help="Copy index.pkl to index.pkl.bak before migrating")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which folders would be migrated")
+    args = parser.parse_args()
+    migrate_embedded_content(args.root_folder, keep_pickle=args.keep_pickle, dry_run=args.dry_run, backup=args.backup)
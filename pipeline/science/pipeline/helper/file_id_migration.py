@@ -0,0 +1,59 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# Add the project root to Python path for direct script execution
+project_root = Path(__file__).resolve().parents[4]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from pipeline.science.pipeline.document_handle import BLAKE2B_ID_PREFIX, register_legacy_file_id
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.helper.file_id_migration")
+
+
+def find_documents(paths: list[str]) -> list[str]:
+    """
+    The PDF files given, and the PDF files under the folders given, sorted.
+    """
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                documents.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith(".pdf"))
+        else:
+            documents.append(path)
+    return sorted(documents)
+
+
+def register_legacy_file_ids(paths: list[str], check_blobs: bool = True) -> dict:
+    """
+    Record the file id of every document before a switch to a non-md5 id scheme, so
+    documents indexed under their md5 id (locally or in Azure Blob Storage) keep it.
+
+    Returns:
+        dict: Number of documents keeping their legacy id, using the new id, or failed
+    """
+    summary = {"legacy": 0, "new": 0, "failed": 0}
+    for document in find_documents(paths):
+        try:
+            file_id = register_legacy_file_id(document, check_blobs=check_blobs)
+            status = "new" if file_id.startswith(BLAKE2B_ID_PREFIX) else "legacy"
+        except Exception as e:
+            logger.exception(f"Failed to register the file id of {document}: {e}")
+            status = "failed"
+        summary[status] += 1
+        logger.info(f"{status}: {document}")
+    logger.info(f"File id registration summary: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Record which uploads keep their legacy md5 file id before switching to BLAKE2b ids")
+    parser.add_argument("paths", nargs="+", help="PDF files or folders of uploaded PDFs")
+    parser.add_argument("--skip-blobs", action="store_true", help="Only look for local embedded_content folders")
+    args = parser.parse_args()
+    register_legacy_file_ids(args.paths, check_blobs=not args.skip_blobs)
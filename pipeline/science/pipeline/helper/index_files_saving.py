@@ -2,6 +2,11 @@ import os
 import shutil
 from pipeline.science.pipeline.helper.azure_blob import AzureBlobHelper
 from pipeline.science.pipeline.utils import file_check_list
+from pipeline.science.pipeline.chunk_store import (
+    CHUNK_STORE_FILE,
+    PICKLE_DOCSTORE_FILE,
+    vector_store_docstore_path,
+)
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.helper.index_files_saving")
@@ -15,7 +20,8 @@ def literag_index_files_decompress(embedding_folder):
     """
     lite_embedding_folder = os.path.join(embedding_folder, "lite_embedding")
     faiss_path = os.path.join(lite_embedding_folder, "index.faiss")
-    pkl_path = os.path.join(lite_embedding_folder, "index.pkl")
+    # Either the chunk store or the legacy pickle docstore
+    pkl_path = vector_store_docstore_path(lite_embedding_folder)
     path_list = [faiss_path, pkl_path]
     all_files_exist = True
     for path in path_list:
@@ -36,7 +42,7 @@ def graphrag_index_files_check(embedding_folder):
 
     # Define the index files path for VectorRAG embedding
     faiss_path = os.path.join(embedding_folder, "index.faiss")
-    pkl_path = os.path.join(embedding_folder, "index.pkl")
+    pkl_path = vector_store_docstore_path(embedding_folder)
     document_summary_path = os.path.join(embedding_folder, "documents_summary.txt")
 
     path_list.extend([
@@ -176,11 +182,12 @@ def vectorrag_index_files_check(embedding_folder):
     markdown_embedding_folder = os.path.join(embedding_folder, "markdown")
 
     # Define the index files path for VectorRAG embedding
+    # Docstores are either the chunk store or the legacy pickle
     faiss_path = os.path.join(embedding_folder, "index.faiss")
-    pkl_path = os.path.join(embedding_folder, "index.pkl")
+    pkl_path = vector_store_docstore_path(embedding_folder)
     document_summary_path = os.path.join(embedding_folder, "documents_summary.txt")
     markdown_faiss_path = os.path.join(markdown_embedding_folder, "index.faiss")
-    markdown_pkl_path = os.path.join(markdown_embedding_folder, "index.pkl")
+    markdown_pkl_path = vector_store_docstore_path(markdown_embedding_folder)
 
     path_list = [
         faiss_path,
@@ -273,12 +280,15 @@ def vectorrag_index_files_decompress(embedding_folder):
     else:
         # CLEANUP: Clear the existing files if they're not complete
         faiss_path = os.path.join(embedding_folder, "index.faiss")
-        pkl_path = os.path.join(embedding_folder, "index.pkl")
+        pkl_path = os.path.join(embedding_folder, PICKLE_DOCSTORE_FILE)
+        chunk_store_path = os.path.join(embedding_folder, CHUNK_STORE_FILE)
         document_summary_path = os.path.join(embedding_folder, "documents_summary.txt")
         markdown_faiss_path = os.path.join(markdown_embedding_folder, "index.faiss")
-        markdown_pkl_path = os.path.join(markdown_embedding_folder, "index.pkl")
+        markdown_pkl_path = os.path.join(markdown_embedding_folder, PICKLE_DOCSTORE_FILE)
+        markdown_chunk_store_path = os.path.join(markdown_embedding_folder, CHUNK_STORE_FILE)
 
-        for path in [faiss_path, pkl_path, document_summary_path, markdown_faiss_path, markdown_pkl_path]:
+        for path in [faiss_path, pkl_path, chunk_store_path, document_summary_path,
+                     markdown_faiss_path, markdown_pkl_path, markdown_chunk_store_path]:
             if os.path.exists(path):
                 os.remove(path)
         logger.info("VectorRAG index files are not locally ready yet!")
@@ -0,0 +1,222 @@
+import os
+import time
+import asyncio
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from dotenv import load_dotenv
+
+from pipeline.science.pipeline.config import get_config
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.helper.marker_client")
+
+load_dotenv()
+
+MARKER_API_URL = "https://www.datalab.to/api/v1/marker"
+
+# Form fields sent with every conversion request
+MARKER_FORM_FIELDS = {
+    "langs": "English",
+    "force_ocr": False,
+    "paginate": False,
+    "output_format": "markdown",
+    "use_llm": False,
+    "strip_existing_ocr": False,
+    "disable_image_extraction": False,
+}
+
+
+class MarkerAPIError(Exception):
+    pass
+
+
+def get_marker_config() -> dict:
+    marker_config = get_config().get('marker_api', {})
+    return {
+        "api_url": marker_config.get('api_url', MARKER_API_URL),
+        "initial_poll_interval": float(marker_config.get('initial_poll_interval', 0.5)),
+        "fast_polls": int(marker_config.get('fast_polls', 4)),
+        "backoff_factor": float(marker_config.get('backoff_factor', 1.6)),
+        "max_poll_interval": float(marker_config.get('max_poll_interval', 10)),
+        "timeout_seconds": float(marker_config.get('timeout_seconds', 600)),
+        "max_poll_errors": int(marker_config.get('max_poll_errors', 5)),
+    }
+
+
+def new_marker_session() -> aiohttp.ClientSession:
+    """
+    A session for Marker API requests: no total timeout, since uploads of large PDFs
+    and long polls are expected, but bounded connect and read times.
+    """
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300),
+    )
+
+
+def next_poll_delay(poll_index: int, previous_delay: float, elapsed: float, progress: float, marker_config: dict) -> float:
+    """
+    Delay before the next poll: the first few polls are fast, then the delay grows
+    exponentially up to max_poll_interval. Once the API reports progress, the delay
+    is also capped by half of the remaining time estimated from it, so a request
+    about to finish is not waited on for a full backoff interval.
+
+    Args:
+        poll_index: Number of polls done so far
+        previous_delay: Delay before the last poll
+        elapsed: Seconds since the request was submitted
+        progress: Progress percentage reported by the last poll (0 if unknown)
+        marker_config: get_marker_config()
+
+    Returns:
+        float: Seconds to wait
+    """
+    initial = marker_config["initial_poll_interval"]
+    if poll_index < marker_config["fast_polls"]:
+        return initial
+    delay = min(max(previous_delay, initial) * marker_config["backoff_factor"], marker_config["max_poll_interval"])
+    if 0 < progress < 100 and elapsed > 0:
+        remaining = elapsed * (100 - progress) / progress
+        delay = min(delay, max(initial, remaining / 2))
+    return delay
+
+
+class MarkerClient:
+    """
+    Async client of the Marker PDF-to-markdown API: the PDF is uploaded as a streamed
+    multipart form and the result is polled with adaptive intervals.
+
+    Use it as an async context manager. Without a session argument, the client opens
+    its own session on first use and closes it on exit.
+    """
+    def __init__(self, api_key: str = None, session: aiohttp.ClientSession = None, marker_config: dict = None):
+        self.api_key = api_key or os.getenv("MARKER_API_KEY")
+        if not self.api_key:
+            raise ValueError("MARKER_API_KEY not found in environment variables")
+        self.marker_config = marker_config or get_marker_config()
+        self._session = session
+        self._owns_session = session is None
+
+    @property
+    def headers(self) -> dict:
+        return {"X-Api-Key": self.api_key}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = new_marker_session()
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close the session opened by the client; a session passed in is left open.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def submit(self, file_path: str | Path) -> str:
+        """
+        Upload a PDF for conversion.
+
+        Returns:
+            str: URL to poll for the result
+        """
+        file_path = Path(file_path)
+        form = aiohttp.FormData()
+        for name, value in MARKER_FORM_FIELDS.items():
+            form.add_field(name, str(value))
+        with open(file_path, "rb") as f:
+            # aiohttp reads the file in chunks off the event loop while sending
+            form.add_field("file", f, filename=str(file_path), content_type="application/pdf")
+            async with self.session.post(self.marker_config["api_url"], data=form, headers=self.headers) as response:
+                data = await response.json(content_type=None)
+        if not data.get("success"):
+            raise MarkerAPIError(f"API request failed: {data.get('error')}")
+        return data["request_check_url"]
+
+    async def poll(self, request_check_url: str):
+        """
+        Poll a submitted request until it completes.
+
+        This is an async generator yielding every poll result; the last one has
+        status "complete".
+
+        Raises:
+            MarkerAPIError: If the request does not complete within timeout_seconds,
+                or polling fails max_poll_errors times in a row
+        """
+        marker_config = self.marker_config
+        started = time.monotonic()
+        delay = marker_config["initial_poll_interval"]
+        progress = 0
+        errors = 0
+        poll_index = 0
+        while True:
+            elapsed = time.monotonic() - started
+            delay = next_poll_delay(poll_index, delay, elapsed, progress, marker_config)
+            if elapsed + delay > marker_config["timeout_seconds"]:
+                raise MarkerAPIError("The request did not complete within the expected time.")
+            await asyncio.sleep(delay)
+            poll_index += 1
+            try:
+                async with self.session.get(request_check_url, headers=self.headers) as response:
+                    if response.status != 200:
+                        raise MarkerAPIError(f"Status {response.status}, {await response.text()}")
+                    result = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, MarkerAPIError) as e:
+                errors += 1
+                logger.error(f"Marker polling error {errors}/{marker_config['max_poll_errors']}: {e}")
+                if errors >= marker_config["max_poll_errors"]:
+                    raise MarkerAPIError(f"Polling failed: {e}") from e
+                continue
+            errors = 0
+            progress = float(result.get("progress") or 0)
+            logger.info(f"Poll {poll_index}: status = {result.get('status')}, progress = {progress}%, waited {delay:.1f}s")
+            yield result
+            if result.get("status") == "complete":
+                return
+
+    async def convert(self, file_path: str | Path) -> dict:
+        """
+        Upload a PDF and wait for its conversion.
+
+        Returns:
+            dict: The final API result with markdown and images
+
+        Raises:
+            MarkerAPIError: If the API reports a failure
+        """
+        request_check_url = await self.submit(file_path)
+        logger.info("Submitted request. Polling for results...")
+        result = None
+        async for result in self.poll(request_check_url):
+            pass
+        if not result.get("success"):
+            raise MarkerAPIError(f"Processing failed: {result.get('error')}")
+        return result
+
+
+def convert_pdf_sync(file_path: str | Path) -> dict:
+    """
+    Blocking MarkerClient.convert for synchronous callers, on its own event loop and
+    session. Async callers await MarkerClient.convert instead.
+    """
+    async def run():
+        async with MarkerClient() as marker_client:
+            return await marker_client.convert(file_path)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
+    # Called from a coroutine: do not nest event loops, run in a worker thread instead
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, run()).result()
@@ -0,0 +1,117 @@
+"""Module for selecting the part of a chat history that fits a token budget."""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from pipeline.science.pipeline.token_counter import DEFAULT_MODEL, count_tokens_batch
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.history_window")
+
+# Only these messages are sent to the LLM as chat history
+HISTORY_ROLES = ('user', 'assistant')
+
+
+def format_history_message(message: Dict) -> Optional[str]:
+    """Format a message the way it is sent as chat history.
+
+    Args:
+        message: Chat message with role and content
+
+    Returns:
+        str of its role and content, or None if the message is not part of the history
+    """
+    if message['role'] not in HISTORY_ROLES:
+        return None
+    return str({'role': message['role'], 'content': message['content']})
+
+
+class ChatHistoryWindow:
+    """Token counts of the messages of a chat history, for truncation without re-tokenizing.
+
+    Every message is formatted and tokenized once, when the window first sees it, and
+    prefix sums of the counts are kept, so the newest messages fitting a budget are
+    found with a binary search and returned in O(k). The window follows the history
+    list it is given: appended messages are counted on the next call, and if earlier
+    messages were changed or removed, the counts are rebuilt from the first difference.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        # (role, content) of every message seen, to detect changes of the history
+        self._keys: List[tuple] = []
+        self._formatted: List[Optional[str]] = []
+        # _prefix_tokens[i] is the number of tokens of the first i messages
+        self._prefix_tokens: List[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _common_prefix(self, chat_history: List[Dict]) -> int:
+        # Every cached message is compared, so an edit anywhere in the history is seen.
+        # Unchanged messages are usually the same string objects, which compare in O(1).
+        common = 0
+        for key, message in zip(self._keys, chat_history):
+            if key != (message.get('role'), message.get('content')):
+                break
+            common += 1
+        if common < len(self._keys):
+            # The history was edited: keep the counts of the unchanged messages only
+            logger.info(f"Chat history changed, recounting {len(chat_history) - common} messages")
+        return common
+
+    def sync(self, chat_history: List[Dict]) -> None:
+        """Count the tokens of the messages not seen yet.
+
+        Args:
+            chat_history: The chat history, oldest message first
+        """
+        with self._lock:
+            common = self._common_prefix(chat_history)
+            del self._keys[common:]
+            del self._formatted[common:]
+            del self._prefix_tokens[common + 1:]
+            new_messages = chat_history[common:]
+            if not new_messages:
+                return
+            formatted = [format_history_message(message) for message in new_messages]
+            texts = [text for text in formatted if text is not None]
+            counts = iter(count_tokens_batch(texts, self.model_name))
+            total = self._prefix_tokens[-1]
+            for message, text in zip(new_messages, formatted):
+                self._keys.append((message.get('role'), message.get('content')))
+                self._formatted.append(text)
+                if text is not None:
+                    total += next(counts)
+                self._prefix_tokens.append(total)
+
+    def truncate(self, chat_history: List[Dict], max_tokens: int) -> List[str]:
+        """The newest messages fitting in max_tokens, like truncate_chat_history.
+
+        The latest message (the question being answered) is left out, and the window
+        stops at the first older message that does not fit.
+
+        Args:
+            chat_history: The chat history, oldest message first
+            max_tokens: Token budget of the returned messages
+
+        Returns:
+            List of formatted messages, oldest first
+        """
+        self.sync(chat_history)
+        with self._lock:
+            end = len(chat_history) - 1
+            if end <= 0:
+                return []
+            # The window starts at the first message from which the suffix sum fits
+            start = bisect_left(self._prefix_tokens, self._prefix_tokens[end] - max_tokens, 0, end)
+            return [text for text in self._formatted[start:end] if text is not None]
+
+    def clear(self) -> None:
+        """Forget all counted messages."""
+        with self._lock:
+            self._keys = []
+            self._formatted = []
+            self._prefix_tokens = [0]
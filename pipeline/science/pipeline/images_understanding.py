@@ -4,7 +4,7 @@ import sys
 import openai
 import requests
 import base64
-from typing import Dict, List, Set, Union
+from typing import Dict, FrozenSet, List, Set, Union
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import AzureOpenAI
@@ -21,20 +21,24 @@ if project_root not in sys.path:
 try:
     # Try importing as a module first
     from pipeline.science.pipeline.utils import generate_file_id, create_truncated_db
-    from pipeline.science.pipeline.config import load_config
-    from pipeline.science.pipeline.embeddings import get_embedding_models
+    from pipeline.science.pipeline.config import get_config, get_image_extensions
+    from pipeline.science.pipeline.embeddings import (
+        get_embedding_models,
+        image_context_chunk_id,
+        update_image_context_embeddings,
+    )
 except ImportError:
     # If that fails, try relative imports
     try:
         from .utils import generate_file_id, create_truncated_db
-        from .config import load_config
-        from .embeddings import get_embedding_models
+        from .config import get_config, get_image_extensions
+        from .embeddings import get_embedding_models, image_context_chunk_id, update_image_context_embeddings
     except ImportError:
         # Last resort, try direct import from current directory or parent
         sys.path.append(os.path.dirname(current_dir))
         from utils import generate_file_id, create_truncated_db
-        from config import load_config
-        from embeddings import get_embedding_models
+        from config import get_config, get_image_extensions
+        from embeddings import get_embedding_models, image_context_chunk_id, update_image_context_embeddings
 
 load_dotenv()
 
@@ -128,6 +132,39 @@ def initialize_image_files(folder_dir: str | Path) -> tuple[str, str]:
     return str(image_context_path), str(image_urls_path)
 
 
+def upload_image_to_azure(azure_blob, folder_path: Path, image_file: str, file_id: str, container_name: str = "knowhiztutorrag") -> str | None:
+    """
+    Upload one image to Azure Blob storage unless it is already there.
+
+    Parameters:
+        azure_blob (AzureBlobHelper): Blob storage helper
+        folder_path (Path): The folder containing the image
+        image_file (str): Image file name
+        file_id (str): Id of the document the image belongs to
+
+    Returns:
+        str | None: The image URL, or None if the upload failed
+    """
+    local_path = Path(folder_path) / image_file
+    blob_name = f"file_appendix/{file_id}/images/{image_file}"
+    url = f"https://{azure_blob.blob_service_client.account_name}.blob.core.windows.net/{container_name}/{blob_name}"
+
+    try:
+        # Check if blob already exists
+        blob_client = azure_blob.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        if blob_client.exists():
+            logger.info(f"Skipping {image_file} - already exists in Azure storage")
+            return url
+
+        # Upload only if doesn't exist
+        azure_blob.upload(str(local_path), blob_name, container_name)
+        logger.info(f"Uploaded {image_file}")
+        return url
+    except Exception as e:
+        logger.info(f"Error processing {image_file}: {e}")
+        return None
+
+
 def upload_images_to_azure(folder_dir: str | Path, file_path) -> None:
     """
     Upload images from the given folder to Azure Blob storage and create a mapping file.
@@ -144,8 +181,7 @@ def upload_images_to_azure(folder_dir: str | Path, file_path) -> None:
     _, output_path = initialize_image_files(folder_path)
 
     # Define the image file extensions we care about
-    config = load_config()
-    image_extensions: Set[str] = set(config["image_extensions"])
+    image_extensions: FrozenSet[str] = get_image_extensions()
 
     # Extract file_id from the folder path
     file_id = generate_file_id(file_path)
@@ -172,26 +208,9 @@ def upload_images_to_azure(folder_dir: str | Path, file_path) -> None:
             logger.info(f"Skipping {image_file} - already uploaded")
             continue
 
-        local_path = folder_path / image_file
-        blob_name = f"file_appendix/{file_id}/images/{image_file}"
-
-        try:
-            # Check if blob already exists
-            blob_client = azure_blob.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-            if blob_client.exists():
-                url = f"https://{azure_blob.blob_service_client.account_name}.blob.core.windows.net/{container_name}/{blob_name}"
-                image_urls[image_file] = url
-                logger.info(f"Skipping {image_file} - already exists in Azure storage")
-                continue
-
-            # Upload only if doesn't exist
-            azure_blob.upload(str(local_path), blob_name, container_name)
-            url = f"https://{azure_blob.blob_service_client.account_name}.blob.core.windows.net/{container_name}/{blob_name}"
+        url = upload_image_to_azure(azure_blob, folder_path, image_file, file_id, container_name)
+        if url:
             image_urls[image_file] = url
-            logger.info(f"Uploaded {image_file}")
-        except Exception as e:
-            logger.info(f"Error processing {image_file}: {e}")
-            continue
 
     # Write the updated URL mapping to JSON file
     with open(output_path, 'w', encoding='utf-8') as outfile:
@@ -221,49 +240,38 @@ def upload_markdown_to_azure(folder_dir: str | Path, file_path: str) -> None:
     logger.info(f"Uploaded {(md_files)} markdown files to Azure Blob storage")
 
 
-def extract_image_context(folder_dir: str | Path, file_path: str = "", context_tokens: int = 1000) -> None:
+def build_image_context(folder_dir: str | Path, file_path: str = "") -> Dict[str, List[str]] | None:
     """
-    Extract context for each image in a folder and save to JSON.
+    Collect the markdown context of each image in a folder, in the order the images
+    show up in the markdown file.
 
     Parameters:
-        folder_dir (str | Path): Directory containing the images
-        context_tokens (int): Maximum number of tokens for context per image
+        folder_dir (str | Path): Directory containing the images and the markdown file
+        file_path (str): Path of the document the markdown was extracted from
+
+    Returns:
+        Dict[str, List[str]] | None: Image file name -> context windows, or None if there are no images
     """
     folder_dir = Path(folder_dir)
-    logger.info(f"Current markdown folder: {folder_dir}")
-    # yield f"Current markdown folder: {folder_dir}"
-
-    # Initialize both JSON files
-    image_context_path, _ = initialize_image_files(folder_dir)
 
     # Define the image file extensions we care about
-    config = load_config()
-    image_extensions: Set[str] = set(config["image_extensions"])
+    image_extensions: FrozenSet[str] = get_image_extensions()
 
     # List all image files in the folder (case-insensitive match)
     image_files = [f for f in os.listdir(folder_dir) if os.path.splitext(f.lower())[1] in image_extensions]
     if not image_files:
         logger.info("No image files found in the folder.")
-        yield "\n\n**❌ No image files found in the folder.**"
-        return
+        return None
 
     # Find the markdown file (with file_id.md file name)
     file_id = generate_file_id(file_path)
-    md_files = [os.path.join(folder_dir, f"{file_id}.md")]
-    if not md_files:
-        logger.info("No markdown file found in the folder.")
-        yield "\n\n**❌ No markdown file found in the folder.**"
-        return
-
-    md_file = md_files[0]
-    md_path = md_file
+    md_path = os.path.join(folder_dir, f"{file_id}.md")
 
     # Read the content of the markdown file
     with open(md_path, 'r', encoding='utf-8') as f:
         md_lines = f.read().splitlines()
 
     # If there are images_files and md_files, re-order the list image_files to match the order that images show up in md_files
-    # yield "\n\n**Re-ordering image files to match the order that images show up in md_files...**"
     logger.info("Re-ordering image files to match the order that images show up in md_files...")
     image_order = []
     for line in md_lines:
@@ -271,7 +279,6 @@ def extract_image_context(folder_dir: str | Path, file_path: str = "", context_t
             if image in line and image not in image_order:
                 image_order.append(image)
     # Add any images that weren't found in the markdown file to the end of the order list
-    # yield "\n\n**Adding any images that weren't found in the markdown file to the end of the order list...**"
     logger.info("Adding any images that weren't found in the markdown file to the end of the order list...")
     for image in image_files:
         if image not in image_order:
@@ -280,13 +287,10 @@ def extract_image_context(folder_dir: str | Path, file_path: str = "", context_t
     image_files = image_order
 
     # Create a dictionary to store image filename vs. list of context windows
-    # yield "\n\n**Creating a dictionary to store image filename vs. list of context windows...**"
     logger.info("Creating a dictionary to store image filename vs. list of context windows...")
     image_context: Dict[str, List[str]] = {}
 
     for i, image in enumerate(image_files):
-        # yield f"\n\n**Processing image {i+1} of {len(image_files)}: {image}**"
-        # yield f"\n\n**Processing image {i+1}/{len(image_files)}**"
         # Find all lines in the markdown file that mention the image filename
         contexts = []
         for idx, line in enumerate(md_lines):
@@ -299,6 +303,29 @@ def extract_image_context(folder_dir: str | Path, file_path: str = "", context_t
         if contexts:
             image_context[image] = contexts
 
+    return image_context
+
+
+def extract_image_context(folder_dir: str | Path, file_path: str = "", context_tokens: int = 1000) -> None:
+    """
+    Extract context for each image in a folder and save to JSON.
+
+    Parameters:
+        folder_dir (str | Path): Directory containing the images
+        context_tokens (int): Maximum number of tokens for context per image
+    """
+    folder_dir = Path(folder_dir)
+    logger.info(f"Current markdown folder: {folder_dir}")
+    # yield f"Current markdown folder: {folder_dir}"
+
+    # Initialize both JSON files
+    image_context_path, _ = initialize_image_files(folder_dir)
+
+    image_context = build_image_context(folder_dir, file_path)
+    if image_context is None:
+        yield "\n\n**❌ No image files found in the folder.**"
+        return
+
     # Write the dictionary to a JSON file in the same folder
     # yield "\n\n**Writing the dictionary to a JSON file in the same folder...**"
     logger.info(f"Writing the dictionary to a JSON file in the same folder: {image_context_path}")
@@ -457,6 +484,8 @@ def process_folder_images(folder_path):
     """
     Process all images in a folder that have contexts ending with <markdown>.
     Updates the image_context.json file with analysis results.
+    If the page index of the document already exists, only the image-context
+    documents of the analyzed images are replaced in it.
 
     Args:
         folder_path (str): Path to the folder containing image_context.json and image_urls.json
@@ -477,10 +506,12 @@ def process_folder_images(folder_path):
 
         # Process each image that has context ending with <markdown>
         img_count = len(contexts.items())
+        updated_images = set()
         for image_name, context_list in contexts.items():
             if image_name in urls:
                 for i, context in enumerate(context_list):
                     if context.strip().endswith('<markdown>'):
+                        updated_images.add(image_name)
                         # Get image analysis
                         yield "\n\n**📊 Getting image analysis for saved image ...**"
                         image_url = urls[image_name]
@@ -517,6 +548,14 @@ def process_folder_images(folder_path):
         with open(context_file, 'w') as f:
             json.dump(contexts, f, indent=2)
 
+        # Update the saved page index in place instead of rebuilding it
+        embedding_folder = os.path.dirname(os.path.normpath(folder_path))
+        if updated_images and os.path.exists(os.path.join(embedding_folder, "index.faiss")):
+            try:
+                update_image_context_embeddings(embedding_folder, image_names=sorted(updated_images))
+            except Exception as e:
+                logger.exception(f"Error updating image-context embeddings in {embedding_folder}: {e}")
+
         # return contexts
         return
 
@@ -712,7 +751,7 @@ def create_image_context_embeddings_text(folder_list: List[Union[str, Path]]) ->
                                 "file_id": file_id,
                                 "image_name": image_name,
                                 "image_url": image_url,
-                                "chunk_id": f"{file_id}_{image_name}_{i}",
+                                "chunk_id": image_context_chunk_id(file_id, image_name, i),
                                 "context_index": i
                             }
                         }
@@ -739,7 +778,7 @@ def create_image_context_embeddings_db(folder_list: List[Union[str, Path]], embe
         FAISS: A FAISS vector database containing the image context embeddings
     """
     # Initialize required components
-    config = load_config()
+    config = get_config()
     para = config["llm"]
     embeddings = get_embedding_models(embedding_type, para)
 
@@ -793,7 +832,7 @@ def create_image_context_embeddings_db(folder_list: List[Union[str, Path]], embe
                                 "file_id": file_id,
                                 "image_name": image_name,
                                 "image_url": image_url,
-                                "chunk_id": f"{file_id}_{image_name}_{i}",
+                                "chunk_id": image_context_chunk_id(file_id, image_name, i),
                                 "context_index": i,
                                 "source": "image"  # For compatibility with other document sources
                             }
@@ -15,15 +15,15 @@ from langchain_sambanova import ChatSambaNovaCloud
 # Handle imports for both direct execution and external import cases
 try:
     # When imported as a module from elsewhere
-    from pipeline.science.pipeline.config import load_config
+    from pipeline.science.pipeline.config import get_config
 except ModuleNotFoundError:
     try:
         # When run directly
-        from config import load_config
+        from config import get_config
     except ModuleNotFoundError:
         # If in the pipeline directory and running the script
         sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
-        from science.pipeline.config import load_config
+        from science.pipeline.config import get_config
 
 load_dotenv()
 
@@ -311,7 +311,7 @@ def deepseek_langchain_inference(
     if chat_session is None:
         chat_session = ChatSession()
 
-    config = load_config()
+    config = get_config()
     max_tokens = config["inference_token_limit"]
     
     # Adjust max_tokens based on the model
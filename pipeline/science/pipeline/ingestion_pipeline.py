@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Dict
+
+from pipeline.science.pipeline.config import get_config, get_image_extensions
+from pipeline.science.pipeline.utils import generate_file_id
+from pipeline.science.pipeline.doc_processor import clean_unused_images
+from pipeline.science.pipeline.helper.azure_blob import AzureBlobHelper
+from pipeline.science.pipeline.images_understanding import (
+    initialize_image_files,
+    build_image_context,
+    upload_image_to_azure,
+    upload_markdown_to_azure,
+    analyze_image,
+)
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.ingestion_pipeline")
+
+# Marks the end of the items of a stage queue
+QUEUE_DONE = object()
+
+
+def get_ingestion_pipeline_config() -> dict:
+    pipeline_config = get_config().get('ingestion_pipeline', {})
+    return {
+        "enabled": bool(pipeline_config.get('enabled', True)),
+        "queue_size": int(pipeline_config.get('queue_size', 8)),
+        "upload_workers": int(pipeline_config.get('upload_workers', 4)),
+        "analysis_workers": int(pipeline_config.get('analysis_workers', 4)),
+    }
+
+
+async def run_stage(name: str, handler, in_queue: asyncio.Queue, out_queue: asyncio.Queue | None, workers: int, time_tracking: Dict[str, float]) -> None:
+    """
+    Run a pipeline stage: workers take items from in_queue until QUEUE_DONE, pass them
+    to handler and put its results (unless None) on out_queue, which gets QUEUE_DONE
+    once every worker is finished. The time from the first item to the last result is
+    recorded in time_tracking[name].
+
+    Args:
+        name: Stage name, the time_tracking key
+        handler: Coroutine function handling one item
+        in_queue: Bounded queue the stage reads from
+        out_queue: Bounded queue of the next stage, or None for the last stage
+        workers: Number of items handled concurrently
+        time_tracking: Timings of the ingestion
+    """
+    started = None
+
+    async def work():
+        nonlocal started
+        while True:
+            item = await in_queue.get()
+            if item is QUEUE_DONE:
+                # Leave the marker for the other workers
+                await in_queue.put(QUEUE_DONE)
+                return
+            if started is None:
+                started = time.time()
+            try:
+                result = await handler(item)
+            except Exception as e:
+                logger.exception(f"Error in ingestion stage {name}: {e}")
+                continue
+            if result is not None and out_queue is not None:
+                await out_queue.put(result)
+
+    await asyncio.gather(*[work() for _ in range(max(1, workers))])
+    if out_queue is not None:
+        await out_queue.put(QUEUE_DONE)
+    time_tracking[name] = time.time() - started if started is not None else 0.0
+
+
+async def feed_queue(queue: asyncio.Queue, items) -> None:
+    for item in items:
+        await queue.put(item)
+    await queue.put(QUEUE_DONE)
+
+
+async def stream_messages(messages: asyncio.Queue, tasks):
+    """
+    Yield progress messages put on the messages queue until all tasks are finished.
+    Exceptions of the tasks are raised when they are awaited by the caller.
+    """
+    pending = set(tasks)
+    while pending or not messages.empty():
+        get_message = asyncio.ensure_future(messages.get())
+        done, pending = await asyncio.wait(pending | {get_message}, return_when=asyncio.FIRST_COMPLETED)
+        if get_message.done():
+            yield get_message.result()
+        else:
+            get_message.cancel()
+        pending.discard(get_message)
+
+
+async def run_in_thread(coroutine_function, *args, **kwargs):
+    """
+    Run a coroutine on its own event loop in a worker thread. Used for steps, like the
+    document summary, that call blocking LLM APIs inside async functions and would
+    otherwise stall every other stage.
+    """
+    return await asyncio.to_thread(lambda: asyncio.run(coroutine_function(*args, **kwargs)))
+
+
+async def process_images_pipeline(markdown_dir: str | Path, file_path, messages: asyncio.Queue, time_tracking: Dict[str, float]) -> None:
+    """
+    Upload the markdown and images of a document and analyze its images, with uploads
+    and analyses connected by a bounded queue: an image is analyzed as soon as its
+    upload is done, while the next images are still uploading. Writes image_urls.json
+    and image_context.json like upload_images_to_azure and extract_image_context.
+
+    Args:
+        markdown_dir: Folder with the markdown file and the images saved by the extraction
+        file_path: Path to the PDF file, or its DocumentHandle
+        messages: Queue the progress messages (including the analyses) are put on
+        time_tracking: Timings of the ingestion, gets image_upload and image_analysis
+    """
+    pipeline_config = get_ingestion_pipeline_config()
+    markdown_dir = Path(markdown_dir)
+    file_id = generate_file_id(file_path)
+    image_context_path, image_urls_path = initialize_image_files(markdown_dir)
+
+    await asyncio.to_thread(clean_unused_images, markdown_dir)
+    markdown_upload = asyncio.create_task(asyncio.to_thread(upload_markdown_to_azure, markdown_dir, file_path))
+
+    image_context = await asyncio.to_thread(build_image_context, markdown_dir, file_path)
+    if image_context is None:
+        await messages.put("\n\n**❌ No image files found in the folder.**")
+        image_context = {}
+    with open(image_context_path, 'w', encoding='utf-8') as outfile:
+        json.dump(image_context, outfile, indent=2, ensure_ascii=False)
+
+    image_extensions = get_image_extensions()
+    image_files = [f for f in os.listdir(markdown_dir) if os.path.splitext(f.lower())[1] in image_extensions]
+    # Images with context first, in the order they show up in the markdown
+    image_files = list(image_context) + [f for f in image_files if f not in image_context]
+
+    with open(image_urls_path, 'r', encoding='utf-8') as infile:
+        image_urls = json.load(infile)
+
+    azure_blob = await asyncio.to_thread(AzureBlobHelper) if image_files else None
+    upload_queue = asyncio.Queue(maxsize=pipeline_config["queue_size"])
+    analysis_queue = asyncio.Queue(maxsize=pipeline_config["queue_size"])
+
+    async def upload(image_file: str):
+        if image_file not in image_urls:
+            url = await asyncio.to_thread(upload_image_to_azure, azure_blob, markdown_dir, image_file, file_id)
+            if not url:
+                return None
+            image_urls[image_file] = url
+        else:
+            logger.info(f"Skipping {image_file} - already uploaded")
+        return image_file if image_file in image_context else None
+
+    async def analyze(image_file: str):
+        image_url = image_urls[image_file]
+        for i, context in enumerate(image_context[image_file]):
+            if not context.strip().endswith('<markdown>'):
+                continue
+            analysis = await asyncio.to_thread(analyze_image, image_url, context=context, stream=False)
+            image_context[image_file][i] = f"{context}\nImage Analysis: {analysis}"
+            await messages.put(f"\n\n![{image_file}]({image_url})\n\n{analysis}\n\n")
+
+    await asyncio.gather(
+        feed_queue(upload_queue, image_files),
+        run_stage('image_upload', upload, upload_queue, analysis_queue, pipeline_config["upload_workers"], time_tracking),
+        run_stage('image_analysis', analyze, analysis_queue, None, pipeline_config["analysis_workers"], time_tracking),
+    )
+
+    with open(image_urls_path, 'w', encoding='utf-8') as outfile:
+        json.dump(image_urls, outfile, indent=2, ensure_ascii=False)
+    with open(image_context_path, 'w') as f:
+        json.dump(image_context, f, indent=2)
+
+    try:
+        await markdown_upload
+    except Exception as e:
+        logger.exception(f"Error uploading markdown to Azure Blob Storage: {e}")
+    logger.info(f"Image context data saved to: {image_context_path}")
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import bisect
+import threading
+from collections import OrderedDict
+
+from pipeline.science.pipeline.config import get_config
+from pipeline.science.pipeline.doc_processor import get_parsed_document
+from pipeline.science.pipeline.fuzzy_matcher import ShingleIndex
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.page_text_index")
+
+PAGE_TEXT_INDEX_FILE = "page_text_index.json"
+PAGE_TEXT_INDEX_VERSION = 1
+
+# The same steps, in the same order, as utils.normalize_text
+_NORMALIZATION_STEPS = [
+    (re.compile(r'\s+'), ' '),
+    (re.compile('−'), '-'),
+    (re.compile('∼'), '~'),
+    (re.compile(r'\|\s*↓\s*⟩'), '|↓⟩'),
+    (re.compile(r'\|\s*↑\s*⟩'), '|↑⟩'),
+    (re.compile(r'\s*\[\s*(\d+)\s*\]'), r'[\1]'),
+]
+
+
+def _sub_with_offsets(pattern: re.Pattern, repl: str, text: str, offsets: list[int]) -> tuple[str, list[int]]:
+    """
+    re.sub that also carries the raw-text offset of every character. A replacement
+    character maps to the same character inside the match when there is one (e.g.
+    the digits of "[ 39 ]"), otherwise to the start of the match.
+    """
+    pieces = []
+    new_offsets = []
+    last = 0
+    for match in pattern.finditer(text):
+        pieces.append(text[last:match.start()])
+        new_offsets.extend(offsets[last:match.start()])
+        replacement = match.expand(repl)
+        search_from = match.start()
+        for char in replacement:
+            position = text.find(char, search_from, match.end())
+            if position == -1:
+                new_offsets.append(offsets[match.start()])
+            else:
+                new_offsets.append(offsets[position])
+                search_from = position + 1
+        pieces.append(replacement)
+        last = match.end()
+    pieces.append(text[last:])
+    new_offsets.extend(offsets[last:])
+    return "".join(pieces), new_offsets
+
+
+def normalize_text_with_offsets(text: str) -> tuple[str, list[int]]:
+    """
+    Normalize text exactly like utils.normalize_text and map every character of the
+    result back to its position in the raw text.
+
+    Args:
+        text: Raw page text
+
+    Returns:
+        tuple: (normalized text, raw offset of each normalized character)
+    """
+    offsets = list(range(len(text)))
+    for pattern, repl in _NORMALIZATION_STEPS:
+        text, offsets = _sub_with_offsets(pattern, repl, text, offsets)
+    leading = len(text) - len(text.lstrip())
+    trailing = len(text) - len(text.rstrip())
+    end = len(text) - trailing
+    return text[leading:end], offsets[leading:end]
+
+
+def compress_offsets(offsets: list[int]) -> list[list[int]]:
+    """
+    Store an offset map as the points where raw - normalized changes, which is
+    a handful of entries per page instead of one per character.
+    """
+    breakpoints = []
+    previous_delta = None
+    for i, raw in enumerate(offsets):
+        delta = raw - i
+        if delta != previous_delta:
+            breakpoints.append([i, raw])
+            previous_delta = delta
+    return breakpoints
+
+
+class PageTextIndex:
+    """
+    Normalized text of every page of a PDF with offset maps back to the raw page text
+    (fitz page.get_text()), built once at ingest and saved next to the embeddings.
+    """
+    def __init__(self, pages: list[str], offset_maps: list[list[list[int]]], file_id: str = None):
+        self.pages = pages
+        self.offset_maps = offset_maps
+        self.file_id = file_id
+        self._breakpoint_starts = [[point[0] for point in offset_map] for offset_map in offset_maps]
+        self._shingle_indexes = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_page_texts(cls, page_texts: list[str], file_id: str = None) -> "PageTextIndex":
+        pages = []
+        offset_maps = []
+        for page_text in page_texts:
+            normalized_text, offsets = normalize_text_with_offsets(page_text)
+            pages.append(normalized_text)
+            offset_maps.append(compress_offsets(offsets))
+        return cls(pages, offset_maps, file_id)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def shingle_index(self, shingle_size: int = 3) -> ShingleIndex:
+        """
+        Shingle inverted index over the normalized pages, built on first use.
+        """
+        with self._lock:
+            if shingle_size not in self._shingle_indexes:
+                self._shingle_indexes[shingle_size] = ShingleIndex(self.pages, shingle_size)
+            return self._shingle_indexes[shingle_size]
+
+    def to_raw_offset(self, page_num: int, position: int) -> int:
+        """
+        Position in the raw page text of the character at position in the normalized page text.
+        """
+        starts = self._breakpoint_starts[page_num]
+        if not starts:
+            return position
+        point = self.offset_maps[page_num][max(0, bisect.bisect_right(starts, position) - 1)]
+        return point[1] + (position - point[0])
+
+    def raw_span(self, page_num: int, start: int, end: int) -> tuple[int, int]:
+        """
+        Map a [start, end) span of the normalized page text to a span of the raw page text.
+        """
+        if end <= start:
+            raw_start = self.to_raw_offset(page_num, start)
+            return raw_start, raw_start
+        return self.to_raw_offset(page_num, start), self.to_raw_offset(page_num, end - 1) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PAGE_TEXT_INDEX_VERSION,
+            "file_id": self.file_id,
+            "pages": [
+                {"text": text, "offsets": offset_map}
+                for text, offset_map in zip(self.pages, self.offset_maps)
+            ],
+        }
+
+    def save(self, folder: str) -> str:
+        path = os.path.join(folder, PAGE_TEXT_INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, folder: str, file_id: str = None) -> "PageTextIndex | None":
+        """
+        Load a saved index, or None if it is missing, outdated or belongs to another file.
+        """
+        path = os.path.join(folder, PAGE_TEXT_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read page text index {path}: {e}")
+            return None
+        if data.get("version") != PAGE_TEXT_INDEX_VERSION or (file_id and data.get("file_id") != file_id):
+            return None
+        return cls(
+            [page["text"] for page in data["pages"]],
+            [page["offsets"] for page in data["pages"]],
+            data.get("file_id"),
+        )
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _remember(page_text_index: PageTextIndex) -> None:
+    max_documents = get_config().get('parsed_document_cache', {}).get('max_documents', 8)
+    with _indexes_lock:
+        _indexes[page_text_index.file_id] = page_text_index
+        _indexes.move_to_end(page_text_index.file_id)
+        while len(_indexes) > max_documents:
+            _indexes.popitem(last=False)
+
+
+def build_page_text_index(file_path, embedding_folder: str = None) -> PageTextIndex:
+    """
+    Normalize every page of a PDF once and save the result in embedding_folder.
+
+    Args:
+        file_path: Path to the PDF file, or its DocumentHandle
+        embedding_folder: Folder to save page_text_index.json in, if given
+
+    Returns:
+        PageTextIndex: The new index
+    """
+    parsed_document = get_parsed_document(file_path)
+    page_text_index = PageTextIndex.from_page_texts(
+        [parsed_document.page_text(page_num) for page_num in range(parsed_document.page_count)],
+        parsed_document.file_id,
+    )
+    if embedding_folder:
+        os.makedirs(embedding_folder, exist_ok=True)
+        page_text_index.save(embedding_folder)
+        logger.info(f"Saved page text index of {page_text_index.page_count} pages to {embedding_folder}")
+    _remember(page_text_index)
+    return page_text_index
+
+
+def get_page_text_index(file_path, embedding_folder: str = None) -> PageTextIndex:
+    """
+    Return the page text index of a PDF from memory, from embedding_folder, or by
+    building (and saving) it when neither has it.
+
+    Args:
+        file_path: Path to the PDF file, or its DocumentHandle
+        embedding_folder: Folder of the file's embeddings, where the index is saved at ingest
+
+    Returns:
+        PageTextIndex: Normalized page texts with offset maps
+    """
+    file_id = get_parsed_document(file_path).file_id
+    with _indexes_lock:
+        page_text_index = _indexes.get(file_id)
+        if page_text_index is not None:
+            _indexes.move_to_end(file_id)
+            return page_text_index
+    if embedding_folder:
+        page_text_index = PageTextIndex.load(embedding_folder, file_id)
+        if page_text_index is not None:
+            _remember(page_text_index)
+            return page_text_index
+    return build_page_text_index(file_path, embedding_folder)
@@ -0,0 +1,352 @@
+import os
+import time
+import fitz
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+
+from pipeline.science.pipeline.config import get_config
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.pdf_chunker")
+
+# Replace special characters that might cause issues
+REPLACEMENTS = {
+    # "−": "-",  # Replace unicode minus with hyphen
+    # "⊥": "_|_",  # Replace perpendicular symbol
+    # "≫": ">>",  # Replace much greater than
+    # "%": "",     # Remove percentage signs that might be formatting artifacts
+    # "→": "->",   # Replace arrow
+}
+
+
+def get_chunking_config() -> dict:
+    chunking_config = get_config().get('searchable_chunks', {})
+    return {
+        "max_workers": int(chunking_config.get('max_workers', 4)),
+        "min_pages_for_parallel": int(chunking_config.get('min_pages_for_parallel', 64)),
+        "pages_per_task": int(chunking_config.get('pages_per_task', 16)),
+        "start_method": chunking_config.get('start_method', 'spawn'),
+    }
+
+
+def get_fallback_extraction_config() -> dict:
+    extraction_config = get_config().get('fallback_extraction', {})
+    return {
+        "progress_step_percent": float(extraction_config.get('progress_step_percent', 10)),
+        "progress_min_interval_seconds": float(extraction_config.get('progress_min_interval_seconds', 1.0)),
+    }
+
+
+def _page_ranges(page_count: int, max_workers: int, pages_per_task: int) -> list[tuple[int, int]]:
+    pages_per_task = max(1, min(pages_per_task, -(-page_count // max_workers)))
+    return [
+        (start_page, min(start_page + pages_per_task, page_count))
+        for start_page in range(0, page_count, pages_per_task)
+    ]
+
+
+def _document_file(doc) -> str | None:
+    file_path = getattr(doc, "name", None)
+    return file_path if file_path and os.path.isfile(file_path) else None
+
+
+def _use_process_pool(file_path: str | None, page_count: int, max_workers: int, chunking_config: dict) -> bool:
+    return (
+        max_workers > 1
+        and page_count >= chunking_config["min_pages_for_parallel"]
+        and file_path is not None
+    )
+
+
+def _process_pool(max_workers: int, chunking_config: dict) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context(chunking_config["start_method"]),
+    )
+
+
+def clean_block_text(text: str) -> str:
+    """
+    Clean the text of a block the way search_for sees it: no hyphenation at line
+    breaks and single spaces.
+    """
+    clean_text = text.strip()
+    if not clean_text:
+        return ""
+    # Remove hyphenation at line breaks
+    clean_text = clean_text.replace("-\n", "")
+    # Normalize spaces
+    clean_text = " ".join(clean_text.split())
+    for old, new in REPLACEMENTS.items():
+        clean_text = clean_text.replace(old, new)
+    return clean_text
+
+
+def split_block_text(clean_text: str, chunk_size: int) -> list[str]:
+    """
+    Split the clean text of a block into chunks of at most chunk_size characters,
+    breaking after a sentence when possible, otherwise at a space.
+
+    Args:
+        clean_text: Block text from clean_block_text
+        chunk_size: Maximum size of each text chunk in characters
+
+    Returns:
+        list: The chunk texts in order
+    """
+    pieces = []
+    start = 0
+    length = len(clean_text)
+    while start < length:
+        # Find a good break point near chunk_size characters
+        end = min(start + chunk_size, length)
+        if end < length:
+            # Try to break at a sentence or period
+            last_period = clean_text.rfind(". ", start, end)
+            if last_period > start:
+                end = last_period + 1
+            else:
+                # If no period, try to break at a space
+                last_space = clean_text.rfind(" ", start, end)
+                if last_space > start:
+                    end = last_space
+
+        chunk_text = clean_text[start:end].strip()
+        if chunk_text:
+            pieces.append(chunk_text)
+        start = end
+        while start < length and clean_text[start] == " ":
+            start += 1
+    return pieces
+
+
+def chunk_page(page, page_num: int, chunk_size: int) -> list[tuple[str, dict]]:
+    """
+    Chunks of one page as (text, metadata) pairs. The page blocks are extracted once.
+    """
+    blocks = page.get_text("blocks")
+    total_blocks = len(blocks)
+    page_chunks = []
+    for block in blocks:
+        clean_text = clean_block_text(block[4])  # The text content is at index 4
+        for chunk_text in split_block_text(clean_text, chunk_size):
+            chunk_index = len(page_chunks)
+            page_chunks.append((chunk_text, {
+                "page": page_num,
+                "source": f"page_{page_num + 1}",
+                "chunk_index": chunk_index,  # Track position within page
+                "block_bbox": block[:4],  # Store block bounding box coordinates
+                "total_blocks_in_page": total_blocks,
+                "relative_position": chunk_index / total_blocks,
+            }))
+    return page_chunks
+
+
+def _chunk_page_range(file_path: str, start_page: int, end_page: int, chunk_size: int) -> list[tuple[str, dict]]:
+    """
+    Process pool task: chunk pages [start_page, end_page) with the worker's own fitz handle.
+    """
+    doc = fitz.open(file_path)
+    try:
+        chunks = []
+        for page_num in range(start_page, end_page):
+            chunks.extend(chunk_page(doc[page_num], page_num, chunk_size))
+        return chunks
+    finally:
+        doc.close()
+
+
+def create_searchable_chunks(doc, chunk_size: int, max_workers: int = None) -> list:
+    """
+    Create searchable chunks from a PDF document.
+
+    Large documents are chunked in page ranges on a process pool, each worker opening
+    the file itself. Ranges are collected in page order, so the result is the same as
+    a serial run.
+
+    Args:
+        doc: The PDF document object, or the path of the PDF to open in the calling
+            thread (a fitz.Document must not be shared across threads)
+        chunk_size: Maximum size of each text chunk in characters
+        max_workers: Worker processes to use, 1 to chunk serially (defaults to the config)
+
+    Returns:
+        list: A list of Document objects containing the chunks
+    """
+    if isinstance(doc, (str, os.PathLike)):
+        doc = fitz.open(os.fspath(doc))
+        try:
+            return create_searchable_chunks(doc, chunk_size, max_workers)
+        finally:
+            doc.close()
+
+    chunking_config = get_chunking_config()
+    if max_workers is None:
+        max_workers = chunking_config["max_workers"]
+    page_count = len(doc)
+
+    page_chunks = None
+    file_path = _document_file(doc)
+    if _use_process_pool(file_path, page_count, max_workers, chunking_config):
+        page_ranges = _page_ranges(page_count, max_workers, chunking_config["pages_per_task"])
+        try:
+            with _process_pool(min(max_workers, len(page_ranges)), chunking_config) as executor:
+                futures = [
+                    executor.submit(_chunk_page_range, file_path, start_page, end_page, chunk_size)
+                    for start_page, end_page in page_ranges
+                ]
+                page_chunks = [chunk for future in futures for chunk in future.result()]
+        except Exception as e:
+            logger.exception(f"Parallel chunking of {file_path} failed, chunking serially: {e}")
+            page_chunks = None
+
+    if page_chunks is None:
+        page_chunks = []
+        for page_num in range(page_count):
+            page_chunks.extend(chunk_page(doc[page_num], page_num, chunk_size))
+
+    # Chunks are already ordered by page number and then by chunk index
+    return [Document(page_content=text, metadata=metadata) for text, metadata in page_chunks]
+
+
+def searchable_page_text(page) -> str:
+    """
+    Text of a page rebuilt from its characters (get_text("rawdict")), one entry per
+    text block in the layout of get_text("blocks"). The characters are the ones
+    search_for matches against, so every block is searchable by construction and
+    no per-block search is needed. Image blocks are skipped.
+    """
+    text_blocks = []
+    for block in page.get_text("rawdict")["blocks"]:
+        if block.get("type", 0) != 0:
+            continue
+        block_text = "".join(
+            "".join(char["c"] for span in line["spans"] for char in span["chars"]) + "\n"
+            for line in block["lines"]
+        )
+        if block_text.strip():
+            text_blocks.append(block_text)
+    return "\n".join(text_blocks)
+
+
+def _page_count(file_path: str) -> int:
+    doc = fitz.open(file_path)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def _extract_page_range_text(file_path: str, start_page: int, end_page: int) -> list[str]:
+    """
+    Process pool or thread task: searchable text of pages [start_page, end_page) with the worker's own fitz handle.
+    """
+    doc = fitz.open(file_path)
+    try:
+        return [searchable_page_text(doc[page_num]) for page_num in range(start_page, end_page)]
+    finally:
+        doc.close()
+
+
+def _document_range_text(doc, start_page: int, end_page: int) -> list[str]:
+    return [searchable_page_text(doc[page_num]) for page_num in range(start_page, end_page)]
+
+
+class _ProgressReporter:
+    """
+    Turns page counts into percentage messages, at most one per progress step and interval.
+    """
+    def __init__(self, total_pages: int, step_percent: float, min_interval_seconds: float):
+        self.total_pages = max(1, total_pages)
+        self.step_percent = step_percent
+        self.min_interval_seconds = min_interval_seconds
+        self.last_percent = 0.0
+        self.last_time = time.monotonic()
+
+    def update(self, done_pages: int) -> str | None:
+        percent = 100.0 * done_pages / self.total_pages
+        now = time.monotonic()
+        if percent < 100 and (
+            percent - self.last_percent < self.step_percent
+            or now - self.last_time < self.min_interval_seconds
+        ):
+            return None
+        self.last_percent = percent
+        self.last_time = now
+        return f"\n\n**📑 Extracting searchable text: {int(percent)}% ({done_pages}/{self.total_pages} pages)**"
+
+
+async def aextract_searchable_page_texts(doc, max_workers: int = None):
+    """
+    Extract the searchable text of every page, on a process pool for large documents
+    and in worker threads otherwise, so the event loop is never blocked.
+
+    This is an async generator: it yields rate-limited progress messages (str), then
+    the list of page texts in page order as its last item.
+
+    Args:
+        doc: The PDF document object, or the path of the PDF. Workers open the file
+            themselves; a document without a file is read in one worker thread at a
+            time and must not be used by the caller meanwhile.
+        max_workers: Worker processes to use, 1 to extract serially (defaults to the config)
+    """
+    chunking_config = get_chunking_config()
+    extraction_config = get_fallback_extraction_config()
+    if max_workers is None:
+        max_workers = chunking_config["max_workers"]
+    if isinstance(doc, (str, os.PathLike)):
+        file_path = os.fspath(doc)
+        page_count = await asyncio.to_thread(_page_count, file_path)
+    else:
+        file_path = _document_file(doc)
+        page_count = len(doc)
+    progress = _ProgressReporter(
+        page_count,
+        extraction_config["progress_step_percent"],
+        extraction_config["progress_min_interval_seconds"],
+    )
+
+    page_texts = None
+    if _use_process_pool(file_path, page_count, max_workers, chunking_config):
+        page_ranges = _page_ranges(page_count, max_workers, chunking_config["pages_per_task"])
+        loop = asyncio.get_running_loop()
+        try:
+            with _process_pool(min(max_workers, len(page_ranges)), chunking_config) as executor:
+
+                async def run(range_index: int, start_page: int, end_page: int):
+                    texts = await loop.run_in_executor(executor, _extract_page_range_text, file_path, start_page, end_page)
+                    return range_index, texts
+
+                results = [None] * len(page_ranges)
+                done_pages = 0
+                for finished in asyncio.as_completed([
+                    run(range_index, start_page, end_page)
+                    for range_index, (start_page, end_page) in enumerate(page_ranges)
+                ]):
+                    range_index, texts = await finished
+                    results[range_index] = texts
+                    done_pages += len(texts)
+                    message = progress.update(done_pages)
+                    if message:
+                        yield message
+            page_texts = [text for texts in results for text in texts]
+        except Exception as e:
+            logger.exception(f"Parallel text extraction of {file_path} failed, extracting serially: {e}")
+            page_texts = None
+
+    if page_texts is None:
+        # One page range at a time in a worker thread, reporting progress in between
+        page_texts = []
+        for start_page, end_page in _page_ranges(page_count, 1, chunking_config["pages_per_task"]):
+            if file_path is not None:
+                texts = await asyncio.to_thread(_extract_page_range_text, file_path, start_page, end_page)
+            else:
+                texts = await asyncio.to_thread(_document_range_text, doc, start_page, end_page)
+            page_texts.extend(texts)
+            message = progress.update(end_page)
+            if message:
+                yield message
+
+    yield page_texts
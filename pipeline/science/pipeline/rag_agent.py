@@ -8,7 +8,7 @@ from langchain.output_parsers import OutputFixingParser
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import json
 
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config, get_map_index_to_symbol
 from pipeline.science.pipeline.utils import (
     truncate_chat_history,
     get_llm,
@@ -27,6 +27,7 @@ from pipeline.science.pipeline.content_translator import (
     translate_content
 )
 from pipeline.science.pipeline.inference import deep_inference_agent
+from pipeline.science.pipeline.token_counter import count_document_tokens
 from pipeline.science.pipeline.session_manager import ChatSession, ChatMode
 from pipeline.science.pipeline.get_rag_response import (
     get_embedding_folder_rag_response, 
@@ -43,7 +44,7 @@ logger = logging.getLogger("tutorpipeline.science.rag_agent")
 
 
 async def get_rag_context(chat_session: ChatSession, file_path_list, question: Question, chat_history, embedding_folder_list, deep_thinking = True, stream=False, context=""):
-    config = load_config()
+    config = get_config()
     # Add the context to the user input to improve the retrieval quality
     user_input = question.text + "\n\n" + context
 
@@ -65,10 +66,10 @@ async def get_rag_context(chat_session: ChatSession, file_path_list, question: Q
         db = load_embeddings(actual_embedding_folder_list, 'lite')
 
     # Load config for deep thinking mode
-    config = load_config()
+    config = get_config()
     token_limit = config["inference_token_limit"]
 
-    chat_history_string = truncate_chat_history(chat_history, token_limit=token_limit)
+    chat_history_string = truncate_chat_history(chat_history, token_limit=token_limit, history_window=chat_session.history_window)
     user_input_string = str(user_input + "\n\n" + question.special_context)
     rag_user_input_string = str(user_input + "\n\n" + question.special_context + "\n\n" + str(question.answer_planning))
     logger.info(f"rag_user_input_string: {rag_user_input_string}")
@@ -99,20 +100,23 @@ async def get_rag_context(chat_session: ChatSession, file_path_list, question: Q
     total_tokens = 0
     context_chunks = []
     context_scores = []
+    context_tokens = []
     context_dict = {}
     map_symbol_to_index = config["map_symbol_to_index"]
-    # Reverse the key and value of the map_symbol_to_index
-    map_index_to_symbol = {v: k for k, v in map_symbol_to_index.items()}
+    map_index_to_symbol = get_map_index_to_symbol()
     # Get the first 3 keys from map_symbol_to_index for examples in the prompt
     first_keys = list(map_symbol_to_index.keys())[:3]
     example_keys = ", or ".join(first_keys)
-    for index, chunk in enumerate(question_chunks_with_scores):
-        if total_tokens + count_tokens(chunk[0].page_content) > token_limit:
+    # Token counts stored with the chunks at ingest, tokenized here only for older indexes
+    chunk_token_counts = count_document_tokens([chunk for chunk, _ in question_chunks_with_scores])
+    for index, (chunk, chunk_tokens) in enumerate(zip(question_chunks_with_scores, chunk_token_counts)):
+        if total_tokens + chunk_tokens > token_limit:
             break
         sources_chunks.append(chunk[0])
-        total_tokens += count_tokens(chunk[0].page_content)
+        total_tokens += chunk_tokens
         context_chunks.append(chunk[0].page_content)
         context_scores.append(chunk[1])
+        context_tokens.append(chunk_tokens)
         context_dict[map_index_to_symbol[index]] = {"content": chunk[0].page_content, "score": float(chunk[1])}
     
     # Format context as a JSON dictionary instead of a string
@@ -123,10 +127,10 @@ async def get_rag_context(chat_session: ChatSession, file_path_list, question: Q
     logger.info(f"For inference model, chat_history_string: {chat_history_string}")
     logger.info(f"For inference model, chat_history_string tokens: {count_tokens(chat_history_string)}")
     logger.info(f"For inference model, context: {str(formatted_context)}")
-    for index, (chunk, score) in enumerate(zip(context_chunks, context_scores)):
+    for index, (chunk, score, chunk_tokens) in enumerate(zip(context_chunks, context_scores, context_tokens)):
         logger.info(f"For inference model, context chunk number: {index}")
         # logger.info(f"For inference model, context chunk: {chunk}")
-        logger.info(f"For inference model, context chunk tokens: {count_tokens(chunk)}")
+        logger.info(f"For inference model, context chunk tokens: {chunk_tokens}")
         logger.info(f"For inference model, context chunk score: {score}")
     logger.info(f"For inference model, context tokens: {count_tokens(str(formatted_context))}")
     logger.info("before deep_inference_agent ...")
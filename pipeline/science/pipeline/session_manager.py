@@ -13,6 +13,7 @@ from .chat_history_manager import (
     delete_chat_history
 )
 from pipeline.science.pipeline.utils import Question
+from pipeline.science.pipeline.history_window import ChatHistoryWindow
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.session_manager")
@@ -40,6 +41,7 @@ class ChatSession:
         current_language: Current programming language context
         is_initialized: Whether the session has been initialized
         accumulated_cost: Total accumulated cost for the current session
+        history_window: Token counts of the chat history messages, for truncate_chat_history
     """
 
     session_id: str = field(default_factory=create_session_id)
@@ -53,6 +55,7 @@ class ChatSession:
     question: Optional[Question] = None # Question object
     formatted_context: Optional[Dict] = None # Formatted context for the question
     accumulated_cost: float = 0.0 # Total accumulated cost for the current session
+    history_window: ChatHistoryWindow = field(default_factory=ChatHistoryWindow, repr=False, compare=False)
 
     def initialize(self) -> None:
         """Initialize the chat session if not already initialized."""
@@ -73,11 +76,14 @@ class ChatSession:
             message: Dictionary containing message data
         """
         self.chat_history.append(message)
+        # Count the tokens of the message now, not on every truncation
+        self.history_window.sync(self.chat_history)
         save_chat_history(self.session_id, self.chat_history)
 
     def clear_history(self) -> None:
         """Clear the chat history."""
         self.chat_history = []
+        self.history_window.clear()
         delete_chat_history(self.session_id)
         self.accumulated_cost = 0.0  # Reset accumulated cost when history is cleared
 
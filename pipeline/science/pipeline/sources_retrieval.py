@@ -4,8 +4,11 @@ import re
 import fitz
 # import pprint
 import json
+import numpy as np
+import faiss
 
 from difflib import SequenceMatcher
+from contextlib import ExitStack
 
 from langchain_community.vectorstores import FAISS
 from langchain_core.runnables import RunnablePassthrough
@@ -15,62 +18,44 @@ from langchain.output_parsers import OutputFixingParser
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.utils import (
     get_llm,
     robust_search_for,
+    normalize_text,
 )
 from pipeline.science.pipeline.embeddings import (
     load_embeddings,
 )
 from pipeline.science.pipeline.embeddings_agent import embeddings_agent
-from pipeline.science.pipeline.doc_processor import process_pdf_file
+from pipeline.science.pipeline.doc_processor import process_pdf_file, get_parsed_document
+from pipeline.science.pipeline.page_text_index import get_page_text_index
+from pipeline.science.pipeline.fuzzy_matcher import fuzzy_locate, get_fuzzy_matcher_config
+from pipeline.science.pipeline.text_matcher import AhoCorasickMatcher
 from pipeline.science.pipeline.session_manager import ChatSession
 import logging
 logger = logging.getLogger("tutorpipeline.science.sources_retrieval")
 
-def normalize_text(text):
-    """
-    Normalize text by removing excessive whitespace and standardizing common special characters.
-    
-    Args:
-        text: Text to normalize
-        
-    Returns:
-        Normalized text
-    """
-    # Replace multiple whitespaces with a single space
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Standardize special characters that might appear differently in PDFs
-    text = text.replace('−', '-')  # Replace Unicode minus with hyphen
-    text = text.replace('∼', '~')  # Replace tilde approximation
-    
-    # Handle commonly misrecognized math symbols
-    text = re.sub(r'\|\s*↓\s*⟩', '|↓⟩', text)
-    text = re.sub(r'\|\s*↑\s*⟩', '|↑⟩', text)
-    
-    # Clean up spaces around symbols
-    text = re.sub(r'\s*\[\s*(\d+)\s*\]', r'[\1]', text)  # [39] -> [39]
-    
-    return text.strip()
 
-
-def locate_chunk_in_pdf(chunk: str, pdf_path: str, similarity_threshold: float = 0.8) -> dict:
+def locate_chunk_in_pdf(chunk: str, pdf_path: str, similarity_threshold: float = 0.8, embedding_folder: str = None) -> dict:
     """
     Locates a text chunk within a PDF file and returns its position information.
     Uses both exact matching and fuzzy matching for robustness.
+    Matching runs against the normalized page texts saved at ingest (page_text_index.json).
     
     Args:
         chunk: A string of text to locate within the PDF
         pdf_path: Path to the PDF file
         similarity_threshold: Threshold for fuzzy matching (0.0-1.0)
+        embedding_folder: Embedding folder of the PDF holding its page text index
     
     Returns:
         Dictionary containing:
             - page_num: The page number where the chunk was found (0-indexed)
-            - start_char: The starting character position in the page
-            - end_char: The ending character position in the page
+            - start_char: The starting character position in the normalized page text
+            - end_char: The ending character position in the normalized page text
+            - raw_start_char: The starting character position in the raw page text
+            - raw_end_char: The ending character position in the raw page text
             - success: Boolean indicating if the chunk was found
             - similarity: Similarity score if found by fuzzy matching
     """
@@ -78,6 +63,8 @@ def locate_chunk_in_pdf(chunk: str, pdf_path: str, similarity_threshold: float =
         "page_num": -1,
         "start_char": -1,
         "end_char": -1,
+        "raw_start_char": -1,
+        "raw_end_char": -1,
         "success": False,
         "similarity": 0.0
     }
@@ -88,14 +75,11 @@ def locate_chunk_in_pdf(chunk: str, pdf_path: str, similarity_threshold: float =
         chunk_words = normalized_chunk.split()
         min_match_length = min(100, len(normalized_chunk))  # For long chunks, we'll use word-based search
         
-        # Open the PDF file
-        doc = fitz.open(pdf_path)
+        # Page texts normalized once at ingest
+        page_text_index = get_page_text_index(pdf_path, embedding_folder)
         
         # First try exact matching
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            normalized_text = normalize_text(text)
+        for page_num, normalized_text in enumerate(page_text_index.pages):
             
             # Try exact match first
             start_pos = normalized_text.find(normalized_chunk)
@@ -130,52 +114,25 @@ def locate_chunk_in_pdf(chunk: str, pdf_path: str, similarity_threshold: float =
                             result["similarity"] = similarity
                             break
         
-        # If not found, try sliding window approach on pages
-        if not result["success"]:
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                normalized_text = normalize_text(text)
-                
-                # For very long chunks, we'll use a sliding window approach
-                # to find the most similar section
-                if len(normalized_chunk) > min_match_length:
-                    best_similarity = 0
-                    best_start = -1
-                    
-                    # Try to match beginning of chunk with sliding windows
-                    first_words = " ".join(chunk_words[:10])
-                    for match in re.finditer(re.escape(chunk_words[0]), normalized_text):
-                        start_pos = match.start()
-                        
-                        # Skip if there's not enough text left
-                        if start_pos + len(normalized_chunk) > len(normalized_text):
-                            continue
-                        
-                        # Extract a section of text of similar length
-                        window_size = min(len(normalized_chunk) + 100, len(normalized_text) - start_pos)
-                        window_text = normalized_text[start_pos:start_pos + window_size]
-                        
-                        # Compare beginning of window with beginning of chunk
-                        window_start = window_text[:len(first_words)]
-                        similarity = SequenceMatcher(None, first_words, window_start).ratio()
-                        
-                        if similarity > 0.8:  # If beginning matches well, check the whole chunk
-                            chunk_similarity = SequenceMatcher(None, normalized_chunk, 
-                                                             window_text[:len(normalized_chunk)]).ratio()
-                            if chunk_similarity > best_similarity:
-                                best_similarity = chunk_similarity
-                                best_start = start_pos
-                    
-                    if best_similarity > similarity_threshold:
-                        result["page_num"] = page_num
-                        result["start_char"] = best_start
-                        result["end_char"] = best_start + len(normalized_chunk)
-                        result["success"] = True
-                        result["similarity"] = best_similarity
-                        break
-        
-        doc.close()
+        # If not found, rank candidate windows with the shingle index and align only the best ones
+        if not result["success"] and len(normalized_chunk) > min_match_length:
+            matcher_config = get_fuzzy_matcher_config()
+            match = fuzzy_locate(
+                normalized_chunk,
+                page_text_index.shingle_index(matcher_config["shingle_size"]),
+                similarity_threshold=similarity_threshold,
+            )
+            if match is not None:
+                result["page_num"] = match["page_num"]
+                result["start_char"] = match["start_char"]
+                result["end_char"] = match["end_char"]
+                result["success"] = True
+                result["similarity"] = match["similarity"]
+
+        if result["success"]:
+            result["raw_start_char"], result["raw_end_char"] = page_text_index.raw_span(
+                result["page_num"], result["start_char"], result["end_char"]
+            )
     except Exception as e:
         print(f"Error processing PDF: {e}")
     
@@ -194,7 +151,7 @@ def get_response_source(chat_session: ChatSession, file_path_list, user_input, a
     Preserve image filenames but filter them based on context relevance using LLM
     """
     mode = chat_session.mode
-    config = load_config()
+    config = get_config()
     para = config['llm']
 
     # Load image context, mapping from image file name to image descriptions
@@ -293,10 +250,11 @@ def get_response_source(chat_session: ChatSession, file_path_list, user_input, a
     db_merged = load_embeddings(embedding_folder_list, 'default')
 
     # Get relevant chunks for both question and answer with scores
-    question_chunks_with_scores = []
-    for key, value in chat_session.formatted_context.items():
-        source_chunk = db_merged.similarity_search_with_score(str(value["content"]), k=1)
-        question_chunks_with_scores.append(source_chunk[0])
+    # All context chunks are embedded in one request and searched with one matrix query
+    context_texts = [str(value["content"]) for value in chat_session.formatted_context.values()]
+    question_chunks_with_scores = [
+        results[0] for results in batch_similarity_search_with_score(db_merged, context_texts, k=1) if results
+    ]
 
     # answer_chunks_with_scores = db_merged.similarity_search_with_score(answer, k=config['sources_retriever']['k'])
     answer_chunks_with_scores = []
@@ -381,9 +339,9 @@ def get_response_source(chat_session: ChatSession, file_path_list, user_input, a
 
     # Refine and limit sources while preserving scores
     markdown_dir_list = [os.path.join(embedding_folder, "markdown") for embedding_folder in embedding_folder_list]
-    # sources_with_scores = refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_list, user_input, image_url_mapping_merged, source_pages, source_file_index, image_url_mapping_merged_reverse)
+    # sources_with_scores = refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_list, user_input, image_url_mapping_merged, source_pages, source_file_index, image_url_mapping_merged_reverse, embedding_folder_list)
     # FIXME: Temporary use simple version and remove filtering logic
-    # sources_with_scores = refine_sources_simple(sources_with_scores, file_path_list)
+    # sources_with_scores = refine_sources_simple(sources_with_scores, file_path_list, embedding_folder_list)
 
     # Refine source pages while preserving scores
     refined_source_pages = {}
@@ -427,7 +385,102 @@ def get_response_source(chat_session: ChatSession, file_path_list, user_input, a
     return sources_with_scores, source_pages, refined_source_pages, refined_source_index
 
 
-def refine_sources_simple(sources_with_scores, file_path_list):
+def verify_sources(sources_with_scores, file_path_list, embedding_folder_list=None) -> dict:
+    """
+    Check which sources occur in the documents, scanning the text of every page once.
+
+    All sources are matched together with an Aho-Corasick automaton over the
+    normalized page texts; page.search_for is then only called on the page a source
+    was confirmed on, to get its bounding boxes. Sources the exact text match misses
+    (e.g. words hyphenated across lines) fall back to robust_search_for on the few
+    candidate pages the shingle index of each document nominates.
+
+    Args:
+        sources_with_scores: A dictionary mapping text chunks to their relevance scores
+        file_path_list: List of PDF file paths to search in
+        embedding_folder_list: Embedding folders of the files, where their page text indexes are saved
+
+    Returns:
+        dict: source -> {"file_index", "page_num", "rects", "score"} for every source found
+    """
+    sources = [source for source in sources_with_scores if source.strip()]
+    matcher = AhoCorasickMatcher([normalize_text(source) for source in sources])
+    verified_sources = {}
+
+    # Keep the documents open while their pages are searched, even if evicted meanwhile
+    with ExitStack() as open_documents:
+        parsed_documents = []
+        page_text_indexes = []
+        # (file_index, page_num) pairs already searched for each source
+        searched_pages = {}
+        for file_index, file_path in enumerate(file_path_list):
+            try:
+                parsed_document = get_parsed_document(file_path)
+                open_documents.enter_context(parsed_document.in_use())
+                parsed_documents.append(parsed_document)
+            except Exception as e:
+                logger.exception(f"Error opening document {file_path}: {e}")
+                parsed_documents.append(None)
+                page_text_indexes.append(None)
+                continue
+            embedding_folder = embedding_folder_list[file_index] if embedding_folder_list else None
+            remaining = {i for i, source in enumerate(sources) if source not in verified_sources}
+            if not remaining:
+                break
+            page_text_index = get_page_text_index(file_path, embedding_folder)
+            page_text_indexes.append(page_text_index)
+            for page_num, page_text in enumerate(page_text_index.pages):
+                for pattern_index in matcher.first_matches(page_text, remaining):
+                    source = sources[pattern_index]
+                    rects = robust_search_for(parsed_documents[file_index].page(page_num), source)
+                    if not rects:
+                        # Matched in the text but not found on the page: left for the fallback
+                        searched_pages.setdefault(source, set()).add((file_index, page_num))
+                        continue
+                    verified_sources[source] = {
+                        "file_index": file_index,
+                        "page_num": page_num,
+                        "rects": rects,
+                        "score": sources_with_scores[source],
+                    }
+                    remaining.discard(pattern_index)
+                if not remaining:
+                    break
+
+        # Text extraction and search_for do not always agree; search the rest on the
+        # pages the shingle index nominates, never on every page
+        matcher_config = get_fuzzy_matcher_config()
+        for source in sources:
+            if source in verified_sources:
+                continue
+            source_words = normalize_text(source).lower().split()
+            for file_index, page_text_index in enumerate(page_text_indexes):
+                if page_text_index is None:
+                    continue
+                candidates = page_text_index.shingle_index(matcher_config["shingle_size"]).candidates(
+                    source_words, matcher_config["max_postings"]
+                )
+                candidate_pages = list(dict.fromkeys(page_num for _, page_num, _ in candidates))
+                for page_num in candidate_pages[:matcher_config["max_candidates"]]:
+                    if (file_index, page_num) in searched_pages.get(source, ()):
+                        continue
+                    text_instances = robust_search_for(parsed_documents[file_index].page(page_num), source)
+                    if text_instances:
+                        verified_sources[source] = {
+                            "file_index": file_index,
+                            "page_num": page_num,
+                            "rects": text_instances,
+                            "score": sources_with_scores[source],
+                        }
+                        break
+                if source in verified_sources:
+                    break
+
+    logger.info(f"Verified {len(verified_sources)} of {len(sources_with_scores)} sources")
+    return verified_sources
+
+
+def refine_sources_simple(sources_with_scores, file_path_list, embedding_folder_list=None):
     """
     Simplified version of refine_sources_complex that only checks if text chunks can be found in the document.
     Returns a dictionary of refined sources with their scores.
@@ -435,33 +488,22 @@ def refine_sources_simple(sources_with_scores, file_path_list):
     Args:
         sources_with_scores: A dictionary mapping text chunks to their relevance scores
         file_path_list: List of PDF file paths to search in
+        embedding_folder_list: Embedding folders of the files, where their page text indexes are saved
         
     Returns:
         Dictionary of refined sources that were found in the original documents
     """
-    refined_sources = {}
-    
-    # Process text sources
-    _docs = []
-    for file_path in file_path_list:
-        try:
-            _, _doc = process_pdf_file(file_path)
-            _docs.append(_doc)
-        except Exception as e:
-            logger.exception(f"Error opening document {file_path}: {e}")
-    
-    # Check each source against the document pages
-    for _doc in _docs:
-        for page in _doc:
-            for source, score in sources_with_scores.items():
-                text_instances = robust_search_for(page, source)
-                if text_instances:
-                    refined_sources[source] = score
-    
+    # Check all sources against the document pages in one pass
+    verified_sources = verify_sources(sources_with_scores, file_path_list, embedding_folder_list)
+    refined_sources = {
+        source: score for source, score in sources_with_scores.items()
+        if source in verified_sources
+    }
+
     return refined_sources
 
 
-def refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_list, user_input, image_url_mapping_merged, source_pages, source_file_index, image_url_mapping_merged_reverse):
+def refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_list, user_input, image_url_mapping_merged, source_pages, source_file_index, image_url_mapping_merged_reverse, embedding_folder_list=None):
     """
     Refine sources by checking if they can be found in the document
     Only get first 20 sources
@@ -471,7 +513,7 @@ def refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_lis
     Source_file_index: a dictionary that maps each source to the file index it is found in. For images, it is mapping from the image URL to the file index.
     Sources_with_scores: a dictionary that maps each source to the score it has. For images, it is mapping from the image URL to the score.
     """
-    config = load_config()
+    config = get_config()
     refined_sources = {}
     image_sources = {}
     text_sources = {}
@@ -493,7 +535,7 @@ def refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_lis
     filtered_images = {}
     if image_sources:
         # Initialize LLM for relevance evaluation
-        config = load_config()
+        config = get_config()
         para = config['llm']
         llm = get_llm('basic', para)
         parser = JsonOutputParser()
@@ -618,20 +660,11 @@ def refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_lis
             score_threshold = highest_score * 0.9
             filtered_images = {img_url: score for img_url, score in filtered_images.items() if score >= score_threshold}
 
-    # Process text sources as before
-    _docs = []
-    for file_path in file_path_list:
-        try:
-            _, _doc = process_pdf_file(file_path)
-            _docs.append(_doc)
-        except Exception as e:
-            logger.exception(f"Error opening document {file_path}: {e}")
-    for _doc in _docs:
-        for page in _doc:
-            for source, score in text_sources.items():
-                text_instances = robust_search_for(page, source)
-                if text_instances:
-                    refined_sources[source] = score
+    # Process text sources, checking all of them against the document pages in one pass
+    verified_sources = verify_sources(text_sources, file_path_list, embedding_folder_list)
+    for source, score in text_sources.items():
+        if source in verified_sources:
+            refined_sources[source] = score
 
     # Combine filtered image sources with refined text sources
     final_sources = {**filtered_images, **refined_sources}
@@ -657,10 +690,63 @@ def refine_sources_complex(sources_with_scores, file_path_list, markdown_dir_lis
 
 def cosine_similarity(vec1, vec2):
     """Calculate cosine similarity between two vectors"""
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    norm1 = sum(a * a for a in vec1) ** 0.5
-    norm2 = sum(b * b for b in vec2) ** 0.5
-    return dot_product / (norm1 * norm2) if norm1 * norm2 != 0 else 0
+    vec1 = np.asarray(vec1, dtype=np.float32)
+    vec2 = np.asarray(vec2, dtype=np.float32)
+    norm_product = float(np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    return float(np.dot(vec1, vec2)) / norm_product if norm_product != 0 else 0
+
+
+def cosine_similarity_matrix(vectors1, vectors2) -> np.ndarray:
+    """
+    Calculate the cosine similarity between every row of vectors1 and every row of vectors2.
+
+    Args:
+        vectors1: (n, d) array-like
+        vectors2: (m, d) array-like
+
+    Returns:
+        np.ndarray: (n, m) similarities, 0 where a vector has zero norm
+    """
+    vectors1 = np.atleast_2d(np.asarray(vectors1, dtype=np.float32))
+    vectors2 = np.atleast_2d(np.asarray(vectors2, dtype=np.float32))
+    norms1 = np.linalg.norm(vectors1, axis=1, keepdims=True)
+    norms2 = np.linalg.norm(vectors2, axis=1, keepdims=True)
+    vectors1 = np.divide(vectors1, norms1, out=np.zeros_like(vectors1), where=norms1 != 0)
+    vectors2 = np.divide(vectors2, norms2, out=np.zeros_like(vectors2), where=norms2 != 0)
+    return vectors1 @ vectors2.T
+
+
+def batch_similarity_search_with_score(db: FAISS, queries: list[str], k: int = 1) -> list[list[tuple]]:
+    """
+    Batched version of db.similarity_search_with_score: all queries are embedded in
+    one request and searched with a single n x d matrix query on the index.
+
+    Args:
+        db: FAISS vector store
+        queries: Query texts
+        k: Number of results per query
+
+    Returns:
+        list: For each query, a list of (Document, score) pairs with the same scores
+        (raw index distances) as similarity_search_with_score
+    """
+    if not queries:
+        return []
+    query_vectors = np.asarray(db.embedding_function.embed_documents(queries), dtype=np.float32)
+    if db._normalize_L2:
+        faiss.normalize_L2(query_vectors)
+    scores, indices = db.index.search(query_vectors, k)
+    results = []
+    for query_scores, query_indices in zip(scores, indices):
+        query_results = []
+        for score, position in zip(query_scores, query_indices):
+            if position == -1:
+                # Fewer than k vectors in the index
+                continue
+            doc = db.docstore.search(db.index_to_docstore_id[int(position)])
+            query_results.append((doc, float(score)))
+        results.append(query_results)
+    return results
 
 
 class PageAwareTextSplitter(RecursiveCharacterTextSplitter):
@@ -0,0 +1,88 @@
+from collections import deque
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.text_matcher")
+
+
+class AhoCorasickMatcher:
+    """
+    Aho-Corasick automaton over a set of patterns: one scan of a text reports every
+    occurrence of every pattern, instead of one scan of the text per pattern.
+    """
+    def __init__(self, patterns: list[str]):
+        self.patterns = []
+        # Node 0 is the root; each node has its transitions, failure link and the
+        # indices of the patterns ending at it (including through failure links)
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        for pattern in patterns:
+            self.add(pattern)
+        self._build()
+
+    def add(self, pattern: str) -> int:
+        pattern_index = len(self.patterns)
+        self.patterns.append(pattern)
+        if not pattern:
+            return pattern_index
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append(pattern_index)
+        return pattern_index
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._outputs[next_node].extend(self._outputs[self._fail[next_node]])
+
+    def iter_matches(self, text: str):
+        """
+        Yield (pattern_index, start) for every occurrence of a pattern in text.
+        """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        patterns = self.patterns
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_index in outputs[node]:
+                yield pattern_index, position - len(patterns[pattern_index]) + 1
+
+    def first_matches(self, text: str, pattern_indices: set[int] = None) -> dict[int, int]:
+        """
+        Start of the first occurrence in text of each pattern that occurs in it.
+
+        Args:
+            text: Text to scan
+            pattern_indices: Only report these patterns, and stop scanning once all were found
+
+        Returns:
+            dict: pattern index -> start of its first occurrence
+        """
+        found = {}
+        remaining = len(pattern_indices) if pattern_indices is not None else len(self.patterns)
+        for pattern_index, start in self.iter_matches(text):
+            if pattern_index in found or (pattern_indices is not None and pattern_index not in pattern_indices):
+                continue
+            found[pattern_index] = start
+            if len(found) == remaining:
+                break
+        return found
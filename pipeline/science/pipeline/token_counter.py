@@ -0,0 +1,182 @@
+import threading
+from collections import OrderedDict
+
+import tiktoken
+
+from pipeline.science.pipeline.config import get_config
+
+import logging
+logger = logging.getLogger("tutorpipeline.science.token_counter")
+
+DEFAULT_MODEL = 'gpt-4o'
+# Metadata keys of the token count stored with every chunk at ingest
+TOKEN_COUNT_KEY = "token_count"
+TOKEN_ENCODING_KEY = "token_encoding"
+
+
+def get_token_counter_config() -> dict:
+    counter_config = get_config().get('token_counter', {})
+    return {
+        "memo_size": int(counter_config.get('memo_size', 8192)),
+        "batch_threads": int(counter_config.get('batch_threads', 4)),
+    }
+
+
+# Model name -> (encoding, disallowed special tokens), built once per process
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model_name: str = DEFAULT_MODEL):
+    """
+    The tiktoken encoding of a model and the special tokens count_tokens refuses,
+    cached per model name.
+
+    Returns:
+        tuple: (tiktoken.Encoding, frozenset of disallowed special tokens)
+    """
+    cached = _encodings.get(model_name)
+    if cached is not None:
+        return cached
+    with _encodings_lock:
+        cached = _encodings.get(model_name)
+        if cached is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                logger.warning(f"No tiktoken encoding for model {model_name}, using o200k_base")
+                encoding = tiktoken.get_encoding("o200k_base")
+            # <|endoftext|> is counted as plain text, other special tokens are refused
+            cached = (encoding, frozenset(encoding.special_tokens_set - {'<|endoftext|>'}))
+            _encodings[model_name] = cached
+    return cached
+
+
+class TokenCountMemo:
+    """
+    Bounded LRU of token counts keyed by (encoding name, text), for chunks loaded
+    from indexes built before token counts were stored in their metadata.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def put(self, key, count: int) -> None:
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+_token_count_memo = None
+_token_count_memo_lock = threading.Lock()
+
+
+def get_token_count_memo() -> TokenCountMemo:
+    global _token_count_memo
+    with _token_count_memo_lock:
+        if _token_count_memo is None:
+            _token_count_memo = TokenCountMemo(get_token_counter_config()["memo_size"])
+        return _token_count_memo
+
+
+def count_tokens(text: str, model_name: str = DEFAULT_MODEL) -> int:
+    """
+    Count the tokens of a text with the cached encoding of model_name. Texts
+    containing special tokens are counted in words instead.
+    """
+    encoding, disallowed_special = get_encoding(model_name)
+    try:
+        return len(encoding.encode(text, disallowed_special=disallowed_special))
+    except Exception as e:
+        logger.exception(f"Error counting tokens: {str(e)}")
+        return len(text.split())
+
+
+def count_tokens_batch(texts: list[str], model_name: str = DEFAULT_MODEL) -> list[int]:
+    """
+    Count the tokens of many texts with one encode_batch call, tokenized on
+    batch_threads threads.
+
+    Returns:
+        list: One count per text, in the same order
+    """
+    if not texts:
+        return []
+    encoding, disallowed_special = get_encoding(model_name)
+    try:
+        tokens = encoding.encode_batch(
+            list(texts),
+            num_threads=get_token_counter_config()["batch_threads"],
+            disallowed_special=disallowed_special,
+        )
+        return [len(text_tokens) for text_tokens in tokens]
+    except Exception:
+        # A text with special tokens fails the whole batch: count one by one
+        return [count_tokens(text, model_name) for text in texts]
+
+
+def with_token_counts(texts: list[str], metadatas: list[dict] = None, model_name: str = DEFAULT_MODEL) -> list[dict]:
+    """
+    Copies of the chunk metadatas with the token count of each text, stored at ingest
+    so retrieval never tokenizes the chunk again.
+
+    Args:
+        texts: Page contents of the chunks
+        metadatas: Optional metadata per text
+        model_name: Model whose encoding is used for the counts
+
+    Returns:
+        list: One metadata dict per text
+    """
+    encoding, _ = get_encoding(model_name)
+    metadatas = metadatas or [{} for _ in texts]
+    return [
+        {**metadata, TOKEN_COUNT_KEY: count, TOKEN_ENCODING_KEY: encoding.name}
+        for metadata, count in zip(metadatas, count_tokens_batch(texts, model_name))
+    ]
+
+
+def count_document_tokens(documents: list, model_name: str = DEFAULT_MODEL) -> list[int]:
+    """
+    Token counts of retrieved chunks: the count stored in their metadata at ingest,
+    else the memoized count, else one batch tokenization of the remaining chunks.
+
+    Args:
+        documents: Documents with page_content and metadata
+        model_name: Model whose encoding is used for the counts
+
+    Returns:
+        list: One count per document, in the same order
+    """
+    encoding, _ = get_encoding(model_name)
+    memo = get_token_count_memo()
+    counts = [None] * len(documents)
+    missing = []
+    for i, doc in enumerate(documents):
+        metadata = doc.metadata or {}
+        if metadata.get(TOKEN_ENCODING_KEY) == encoding.name and TOKEN_COUNT_KEY in metadata:
+            counts[i] = metadata[TOKEN_COUNT_KEY]
+            continue
+        counts[i] = memo.get((encoding.name, doc.page_content))
+        if counts[i] is None:
+            missing.append(i)
+    if missing:
+        texts = [documents[i].page_content for i in missing]
+        for i, text, count in zip(missing, texts, count_tokens_batch(texts, model_name)):
+            counts[i] = count
+            memo.put((encoding.name, text), count)
+    return counts
@@ -39,7 +39,7 @@ from pipeline.science.pipeline.get_response import (
     generate_follow_up_questions,
 )
 from pipeline.science.pipeline.sources_retrieval import get_response_source
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 
 # Import mode-specific implementations
 from pipeline.science.pipeline.tutor_agent_lite import tutor_agent_lite, tutor_agent_lite_streaming_tracking
@@ -63,7 +63,7 @@ async def tutor_agent(chat_session: ChatSession, file_path_list, user_input, tim
     if time_tracking is None:
         time_tracking = {}
 
-    config = load_config()
+    config = get_config()
     stream = config["stream"]
 
     if len(file_path_list) > 1:
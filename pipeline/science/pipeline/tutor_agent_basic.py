@@ -1,11 +1,11 @@
 import os
+import asyncio
 import json
 import time
 from typing import Dict, Generator
 import re
 
 from pipeline.science.pipeline.utils import (
-    generate_file_id,
     format_time_tracking,
     clean_translation_prefix,
     responses_refine,
@@ -15,6 +15,7 @@ from pipeline.science.pipeline.utils import (
     extract_advanced_mode_content,
     Question
 )
+from pipeline.science.pipeline.document_handle import aget_document_handle
 from pipeline.science.pipeline.doc_processor import (
     save_file_txt_locally,
     process_pdf_file,
@@ -39,7 +40,7 @@ from pipeline.science.pipeline.get_response import (
     generate_follow_up_questions,
 )
 from pipeline.science.pipeline.sources_retrieval import get_response_source, locate_chunk_in_pdf
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.tutor_agent_basic")
@@ -114,19 +115,19 @@ async def tutor_agent_basic_streaming(chat_session: ChatSession, file_path_list,
     if time_tracking is None:
         time_tracking = {}
 
-    config = load_config()
+    config = get_config()
     summary_wording = config["summary_wording"]
     logger.info(f"Summary wording: {summary_wording}")
 
-    file_id_list = [generate_file_id(file_path) for file_path in file_path_list]
     path_prefix = os.getenv("FILE_PATH_PREFIX")
     embedded_content_path = os.path.join(path_prefix, 'embedded_content')
-    embedding_folder_list = [os.path.join(embedded_content_path, file_id) for file_id in file_id_list]
 
     # Compute hashed ID and prepare embedding folder
     yield "<thinking>"
     hashing_start_time = time.time()
-    file_id_list = [generate_file_id(file_path) for file_path in file_path_list]
+    # Each file is hashed at most once, off the event loop; the handles carry the file id and the opened PDF through the pipeline
+    document_handle_list = await asyncio.gather(*[aget_document_handle(file_path) for file_path in file_path_list])
+    file_id_list = [document_handle.file_id for document_handle in document_handle_list]
     embedding_folder_list = [os.path.join(embedded_content_path, file_id) for file_id in file_id_list]
     logger.info(f"Embedding folder: {embedding_folder_list}")
     if not os.path.exists(embedded_content_path):
@@ -140,34 +141,34 @@ async def tutor_agent_basic_streaming(chat_session: ChatSession, file_path_list,
     # Save the file txt content locally
     save_file_start_time = time.time()
     filename_list = [os.path.basename(file_path) for file_path in file_path_list]
-    for file_path, filename in zip(file_path_list, filename_list):
-        save_file_txt_locally(file_path, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
+    for document_handle, filename in zip(document_handle_list, filename_list):
+        save_file_txt_locally(document_handle, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
     time_tracking["file_loading_save_text"] = time.time() - save_file_start_time
     logger.info(f"List of file ids: {file_id_list}\nTime tracking:\n{format_time_tracking(time_tracking)}")
 
     # Process VectorRAG embeddings
     vectorrag_start_time = time.time()
     logger.info(f"BASIC (VectorRAG) mode for list of file ids: {file_id_list}")
-    for file_id, embedding_folder, file_path in zip(file_id_list, embedding_folder_list, file_path_list):
+    for file_id, embedding_folder, document_handle in zip(file_id_list, embedding_folder_list, document_handle_list):
         # Doc processing
         if vectorrag_index_files_decompress(embedding_folder):
             logger.info(f"VectorRAG index files for {file_id} are ready.")
         else:
             # Files are missing and have been cleaned up
-            _document, _doc = process_pdf_file(file_path)
-            save_file_txt_locally(file_path, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
+            _document, _doc = process_pdf_file(document_handle)
+            save_file_txt_locally(document_handle, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
             logger.info(f"VectorRAG embedding for {file_id} ...")
-            # await embeddings_agent(chat_session.mode, _document, _doc, file_path, embedding_folder=embedding_folder, time_tracking=time_tracking)
-            async for chunk in embeddings_agent(chat_session.mode, _document, _doc, file_path, embedding_folder=embedding_folder):
+            # await embeddings_agent(chat_session.mode, _document, _doc, document_handle, embedding_folder=embedding_folder, time_tracking=time_tracking)
+            async for chunk in embeddings_agent(chat_session.mode, _document, _doc, document_handle, embedding_folder=embedding_folder):
                 yield chunk
             logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
             if vectorrag_index_files_compress(embedding_folder):
                 logger.info(f"VectorRAG index files for {file_id} are ready and uploaded to Azure Blob Storage.")
             else:
                 # Retry once if first attempt fails
-                save_file_txt_locally(file_path, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
-                # await embeddings_agent(chat_session.mode, _document, _doc, file_path, embedding_folder=embedding_folder, time_tracking=time_tracking)
-                async for chunk in embeddings_agent(chat_session.mode, _document, _doc, file_path, embedding_folder=embedding_folder):
+                save_file_txt_locally(document_handle, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
+                # await embeddings_agent(chat_session.mode, _document, _doc, document_handle, embedding_folder=embedding_folder, time_tracking=time_tracking)
+                async for chunk in embeddings_agent(chat_session.mode, _document, _doc, document_handle, embedding_folder=embedding_folder):
                     yield chunk
                 logger.info(f"File id: {file_id}\nTime tracking:\n{format_time_tracking(time_tracking)}")
                 if vectorrag_index_files_compress(embedding_folder):
@@ -256,7 +257,7 @@ async def tutor_agent_basic_streaming(chat_session: ChatSession, file_path_list,
     # Refine user input
     yield "\n\n**🧠 Understanding the user input ...**\n\n"
     query_start = time.time()
-    async for question_progress_update in get_query_helper(chat_session, user_input, context_chat_history, embedding_folder_list):
+    async for question_progress_update in get_query_helper(chat_session, user_input, context_chat_history, embedding_folder_list, time_tracking=time_tracking):
         if isinstance(question_progress_update, Question):
             # This is the final return value - a Question object
             question = question_progress_update
@@ -436,10 +437,13 @@ async def tutor_agent_basic_streaming(chat_session: ChatSession, file_path_list,
     source_annotations = {}
     i = 0
     for source, index in refined_source_index.items():
-        _doc = process_pdf_file(file_path_list[index-1])[1]
         # annotations, _ = get_highlight_info(_doc, [source])
         # logger.info(f"TEST: source: {source}, index: {index}, file_path: {file_path_list[refined_source_index[source]]}")
-        annotations = locate_chunk_in_pdf(source, file_path_list[refined_source_index[source]])
+        annotations = locate_chunk_in_pdf(
+            source,
+            file_path_list[refined_source_index[source]],
+            embedding_folder=embedding_folder_list[refined_source_index[source]],
+        )
         source_annotations[source] = annotations
         logger.info(f"For source number {i}, the annotations extraction is: {annotations}")
         i += 1
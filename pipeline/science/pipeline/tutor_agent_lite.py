@@ -1,10 +1,10 @@
 import os
+import asyncio
 import time
 from typing import Dict, Generator
 import re
 
 from pipeline.science.pipeline.utils import (
-    generate_file_id,
     format_time_tracking,
     clean_translation_prefix,
     Question
@@ -13,6 +13,7 @@ from pipeline.science.pipeline.content_translator import (
     detect_language,
     translate_content
 )
+from pipeline.science.pipeline.document_handle import aget_document_handle
 from pipeline.science.pipeline.doc_processor import (
     save_file_txt_locally,
     process_pdf_file,
@@ -27,7 +28,7 @@ from pipeline.science.pipeline.get_response import (
     get_response,
     generate_follow_up_questions,
 )
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.sources_retrieval import get_response_source, locate_chunk_in_pdf
 
 import logging
@@ -104,13 +105,15 @@ async def tutor_agent_lite_streaming(chat_session: ChatSession, file_path_list,
     if time_tracking is None:
         time_tracking = {}
 
-    config = load_config()
+    config = get_config()
 
     # Compute hashed ID and prepare embedding folder
     yield "<thinking>"
     yield "Processing documents ...\n\n"
     hashing_start_time = time.time()
-    file_id_list = [generate_file_id(file_path) for file_path in file_path_list]
+    # Each file is hashed at most once, off the event loop; the handles carry the file id and the opened PDF through the pipeline
+    document_handle_list = await asyncio.gather(*[aget_document_handle(file_path) for file_path in file_path_list])
+    file_id_list = [document_handle.file_id for document_handle in document_handle_list]
     # path_prefix = os.getenv("FILE_PATH_PREFIX")
     # if not path_prefix:
     #     path_prefix = ""
@@ -131,8 +134,8 @@ async def tutor_agent_lite_streaming(chat_session: ChatSession, file_path_list,
     # Save the file txt content locally
     save_file_start_time = time.time()
     filename_list = [os.path.basename(file_path) for file_path in file_path_list]
-    for file_path, filename in zip(file_path_list, filename_list):
-        save_file_txt_locally(file_path, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
+    for document_handle, filename in zip(document_handle_list, filename_list):
+        save_file_txt_locally(document_handle, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
     time_tracking["file_loading_save_text"] = time.time() - save_file_start_time
     logger.info(f"List of file ids: {file_id_list}\nTime tracking:\n{format_time_tracking(time_tracking)}")
     yield "\n\n**📙 Loading documents done ...**\n\n"
@@ -140,18 +143,18 @@ async def tutor_agent_lite_streaming(chat_session: ChatSession, file_path_list,
     # Process LiteRAG embeddings
     lite_embedding_start_time = time.time()
     yield "\n\n**🔍 Loading LiteRAG embeddings ...**"
-    for file_id, embedding_folder, file_path in zip(file_id_list, embedding_folder_list, file_path_list):
+    for file_id, embedding_folder, document_handle in zip(file_id_list, embedding_folder_list, document_handle_list):
         if literag_index_files_decompress(embedding_folder):
             # Check if the LiteRAG index files are ready locally
             logger.info(f"LiteRAG embedding index files for {file_id} are ready.")
             yield "\n\n**🔍 LiteRAG embedding index files are ready.**"
         else:
             # Files are missing and have been cleaned up
-            _document, _doc = process_pdf_file(file_path)
-            save_file_txt_locally(file_path, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
+            _document, _doc = process_pdf_file(document_handle)
+            save_file_txt_locally(document_handle, filename=filename, embedding_folder=embedding_folder, chat_session=chat_session)
             logger.info(f"Loading LiteRAG embedding for {file_id} ...")
             yield "\n\n**🔍 Loading LiteRAG embeddings ...**"
-            async for chunk in embeddings_agent(chat_session.mode, _document, _doc, file_path, embedding_folder=embedding_folder):
+            async for chunk in embeddings_agent(chat_session.mode, _document, _doc, document_handle, embedding_folder=embedding_folder):
                 yield chunk
     time_tracking["lite_embedding_total"] = time.time() - lite_embedding_start_time
     logger.info(f"List of file ids: {file_id_list}\nTime tracking:\n{format_time_tracking(time_tracking)}")
@@ -280,10 +283,13 @@ async def tutor_agent_lite_streaming(chat_session: ChatSession, file_path_list,
     source_annotations = {}
     i = 0
     for source, index in refined_source_index.items():
-        _doc = process_pdf_file(file_path_list[index-1])[1]
         # annotations, _ = get_highlight_info(_doc, [source])
         # logger.info(f"TEST: source: {source}, index: {index}, file_path: {file_path_list[refined_source_index[source]]}")
-        annotations = locate_chunk_in_pdf(source, file_path_list[refined_source_index[source]])
+        annotations = locate_chunk_in_pdf(
+            source,
+            file_path_list[refined_source_index[source]],
+            embedding_folder=embedding_folder_list[refined_source_index[source]],
+        )
         source_annotations[source] = annotations
         logger.info(f"For source number {i}, the annotations extraction is: {annotations}")
         i += 1
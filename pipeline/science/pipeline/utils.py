@@ -1,9 +1,7 @@
 import os
 import io
-import hashlib
 # import shutil
 import fitz
-import tiktoken
 import json
 import langid
 import requests
@@ -24,9 +22,18 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain.output_parsers import OutputFixingParser
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pipeline.science.pipeline.config import load_config
+from pipeline.science.pipeline.config import get_config
 from pipeline.science.pipeline.api_handler import ApiHandler
-from pipeline.science.pipeline.embeddings import get_embedding_models
+from pipeline.science.pipeline.embeddings import (
+    get_embedding_models,
+    build_faiss_from_documents,
+    iter_vector_store_documents,
+)
+from pipeline.science.pipeline.document_handle import DocumentHandle, get_document_handle
+from pipeline.science.pipeline.pdf_chunker import create_searchable_chunks
+# count_tokens is imported from utils by most modules
+from pipeline.science.pipeline.token_counter import count_tokens
+from pipeline.science.pipeline.history_window import ChatHistoryWindow
 
 import logging
 logger = logging.getLogger("tutorpipeline.science.utils")
@@ -206,36 +213,49 @@ def robust_search_for(page, text, chunk_size=512):
     return results
 
 
+def normalize_text(text):
+    """
+    Normalize text by removing excessive whitespace and standardizing common special characters.
+    
+    Args:
+        text: Text to normalize
+        
+    Returns:
+        Normalized text
+    """
+    # Replace multiple whitespaces with a single space
+    text = re.sub(r'\s+', ' ', text)
+    
+    # Standardize special characters that might appear differently in PDFs
+    text = text.replace('−', '-')  # Replace Unicode minus with hyphen
+    text = text.replace('∼', '~')  # Replace tilde approximation
+    
+    # Handle commonly misrecognized math symbols
+    text = re.sub(r'\|\s*↓\s*⟩', '|↓⟩', text)
+    text = re.sub(r'\|\s*↑\s*⟩', '|↑⟩', text)
+    
+    # Clean up spaces around symbols
+    text = re.sub(r'\s*\[\s*(\d+)\s*\]', r'[\1]', text)  # [39] -> [39]
+    
+    return text.strip()
+
+
 # Generate a unique course ID for the uploaded file
 def generate_file_id(file_path):
     # logger.info(f"Generating course ID for file: {file_path}")
-    with open(file_path, 'rb') as file:
-        file_bytes = file.read()
-    file_id = hashlib.md5(file_bytes).hexdigest()
-    return file_id
+    # The hash is computed once per (path, size, mtime) and cached, see DocumentHandle
+    return get_document_handle(file_path).file_id
 
 
 # Add new helper functions
-def count_tokens(text, model_name='gpt-4o'):
-    """Count tokens in text using tiktoken"""
-    try:
-        # logger.info(f"Counting tokens for text: {text}")
-        encoding = tiktoken.encoding_for_model(model_name)
-        # tokens = encoding.encode(text)
-        tokens = encoding.encode(text, disallowed_special=(encoding.special_tokens_set - {'<|endoftext|>'}))
-        length = len(tokens)
-        logger.info(f"Length of tokens: {length}")
-        return length
-    except Exception as e:
-        logger.exception(f"Error counting tokens: {str(e)}")
-        length = len(text.split())
-        logger.info(f"Length of text: {length}")
-        return length
-
+def truncate_chat_history(chat_history, model_name='gpt-4o', token_limit=None, history_window=None):
+    """
+    Only keep messages that fit within token limit.
 
-def truncate_chat_history(chat_history, model_name='gpt-4o', token_limit=None):
-    """Only keep messages that fit within token limit"""
-    config = load_config()
+    history_window: ChatHistoryWindow keeping the token counts of this history across
+    calls, e.g. ChatSession.history_window. Without it the messages are counted anew.
+    """
+    config = get_config()
     para = config['llm']
     api = ApiHandler(para)
     if model_name == 'gpt-4o':
@@ -248,30 +268,17 @@ def truncate_chat_history(chat_history, model_name='gpt-4o', token_limit=None):
         max_tokens = token_limit
 
     logger.info(f"max_tokens: {max_tokens}")
-    
-    total_tokens = 0
-    truncated_history = []
-    for message in (chat_history[::-1])[1:]:
-        if(message['role'] == 'assistant' or message['role'] == 'user'):
-            temp_message = {}
-            temp_message['role'] = message['role']
-            temp_message['content'] = message['content']
-            temp_message = str(temp_message)
-            message_tokens = count_tokens(temp_message, model_name)
-            if total_tokens + message_tokens > max_tokens:
-                break
-            truncated_history.insert(0, temp_message)
-            total_tokens += message_tokens
-    
-    # Reverse the order of the truncated history
-    # truncated_history = truncated_history[::-1]
+
+    if history_window is None or history_window.model_name != model_name:
+        history_window = ChatHistoryWindow(model_name)
+    truncated_history = history_window.truncate(chat_history, max_tokens)
     # logger.info(f"truncated_history: {truncated_history}")
     return str(truncated_history)
 
 
 def truncate_document(_document, model_name='gpt-4o'):
     """Only keep beginning of document that fits token limit"""
-    config = load_config()
+    config = get_config()
     para = config['llm']
     api = ApiHandler(para)
     if model_name == 'gpt-4o':
@@ -400,85 +407,6 @@ def extract_images_from_pdf(
             pdf_document.close()
 
 
-def create_searchable_chunks(doc, chunk_size: int) -> list:
-    """
-    Create searchable chunks from a PDF document.
-
-    Args:
-        doc: The PDF document object
-        chunk_size: Maximum size of each text chunk in characters
-
-    Returns:
-        list: A list of Document objects containing the chunks
-    """
-    chunks = []
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text_blocks = []
-
-        # Get text blocks that can be found via search
-        for block in page.get_text("blocks"):
-            text = block[4]  # The text content is at index 4
-            # Clean up the text
-            clean_text = text.strip()
-
-            if clean_text:
-                # Remove hyphenation at line breaks
-                clean_text = clean_text.replace("-\n", "")
-                # Normalize spaces
-                clean_text = " ".join(clean_text.split())
-                # Replace special characters that might cause issues
-                replacements = {
-                    # "−": "-",  # Replace unicode minus with hyphen
-                    # "⊥": "_|_",  # Replace perpendicular symbol
-                    # "≫": ">>",  # Replace much greater than
-                    # "%": "",     # Remove percentage signs that might be formatting artifacts
-                    # "→": "->",   # Replace arrow
-                }
-                for old, new in replacements.items():
-                    clean_text = clean_text.replace(old, new)
-
-                # Split into chunks of specified size
-                while len(clean_text) > 0:
-                    # Find a good break point near chunk_size characters
-                    end_pos = min(chunk_size, len(clean_text))
-                    if end_pos < len(clean_text):
-                        # Try to break at a sentence or period
-                        last_period = clean_text[:end_pos].rfind(". ")
-                        if last_period > 0:
-                            end_pos = last_period + 1
-                        else:
-                            # If no period, try to break at a space
-                            last_space = clean_text[:end_pos].rfind(" ")
-                            if last_space > 0:
-                                end_pos = last_space
-
-                    chunk_text = clean_text[:end_pos].strip()
-                    if chunk_text:
-                        text_blocks.append(Document(
-                            page_content=chunk_text,
-                            metadata={
-                                "page": page_num,
-                                "source": f"page_{page_num + 1}",
-                                "chunk_index": len(text_blocks),  # Track position within page
-                                "block_bbox": block[:4],  # Store block bounding box coordinates
-                                "total_blocks_in_page": len(page.get_text("blocks")),
-                                "relative_position": len(text_blocks) / len(page.get_text("blocks"))
-                            }
-                        ))
-                    clean_text = clean_text[end_pos:].strip()
-
-        chunks.extend(text_blocks)
-
-    # Sort chunks by page number and then by chunk index
-    chunks.sort(key=lambda x: (
-        x.metadata.get("page", 0),
-        x.metadata.get("chunk_index", 0)
-    ))
-
-    return chunks
-
-
 def replace_latex_formulas(text):
     """
     Replace LaTeX formulas in various formats with $ formula $ format
@@ -517,7 +445,7 @@ def replace_latex_formulas(text):
 
 def responses_refine(answer, reference='', stream=True):
     # return answer
-    config = load_config()
+    config = get_config()
     para = config['llm']
     llm = get_llm(para["level"], para)
     parser = StrOutputParser()
@@ -890,28 +818,13 @@ def create_truncated_db(db: FAISS, embedding_type: str = "default") -> FAISS:
     import re
     
     # Initialize required components
-    config = load_config()
+    config = get_config()
     para = config["llm"]
     embeddings = get_embedding_models(embedding_type, para)
     
-    # Get all documents from the original database - more reliable method
-    # First try using similarity_search_with_score which will return all docs
-    try:
-        documents = []
-        # Use a dummy query that should return all documents with their scores
-        all_docs = db.similarity_search_with_score("", k=10000)  # Large k to get all docs
-        for doc, _ in all_docs:
-            documents.append(doc)
-        
-        # If no documents found, try direct access as fallback
-        if not documents:
-            documents = list(db.docstore._dict.values())
-            
-        logger.info(f"Found {len(documents)} documents in the database")
-    except Exception as e:
-        # Fallback to direct access method
-        logger.warning(f"Error using similarity_search: {str(e)}. Falling back to direct access.")
-        documents = list(db.docstore._dict.values())
+    # Get all documents from the original database in index order, without a search
+    documents = list(iter_vector_store_documents(db))
+    logger.info(f"Found {len(documents)} documents in the database")
     
     # Create new documents with truncated content
     truncated_documents = []
@@ -958,7 +871,7 @@ def create_truncated_db(db: FAISS, embedding_type: str = "default") -> FAISS:
     
     try:
         # Create the FAISS database with the truncated documents
-        new_db = FAISS.from_documents(truncated_documents, embeddings)
+        new_db = build_faiss_from_documents(truncated_documents, embeddings)
         logger.info(f"Created truncated FAISS database with {len(truncated_documents)} documents")
         return new_db
     except Exception as e:
@@ -967,11 +880,11 @@ def create_truncated_db(db: FAISS, embedding_type: str = "default") -> FAISS:
         try:
             logger.info("Trying with 'small' embedding model...")
             embeddings_small = get_embedding_models("small", para)
-            new_db = FAISS.from_documents(truncated_documents, embeddings_small)
+            new_db = build_faiss_from_documents(truncated_documents, embeddings_small)
             return new_db
         except Exception as e2:
             logger.error(f"Error with small embedding model: {str(e2)}")
             logger.info("Trying with 'lite' embedding model...")
             embeddings_lite = get_embedding_models("lite", para)
-            new_db = FAISS.from_documents(truncated_documents, embeddings_lite)
+            new_db = build_faiss_from_documents(truncated_documents, embeddings_lite)
             return new_db
\ No newline at end of file